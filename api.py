@@ -0,0 +1,285 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from flask import Blueprint, current_app, request, abort
+
+import bookings
+import genres
+import models
+import pagination
+from extensions import db
+# imported by name, the shows view below would shadow the module
+from shows import parse_date_arg
+
+
+# ----------------------------------------------------------------------------#
+# Versioned JSON API.
+#
+# Every endpoint answers from a projection query (only the selected
+# columns, no ORM objects), supports ?fields=a,b,c, pages lists with an
+# opaque ?cursor= and sends an ETag so an unchanged resource comes back as
+# 304 with no body.
+# ----------------------------------------------------------------------------#
+
+api_v1 = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+# field name -> (column, optional transform of the value)
+VENUE_FIELDS = {
+    'id': (models.Venue.id, None),
+    'name': (models.Venue.name, None),
+    'genres': (models.Venue.genres, genres.parse_genres),
+    'address': (models.Venue.address, None),
+    'city': (models.Venue.city, None),
+    'state': (models.Venue.state, None),
+    'phone': (models.Venue.phone, None),
+    'website': (models.Venue.website_link, None),
+    'facebook_link': (models.Venue.facebook_link, None),
+    'seeking_talent': (models.Venue.seeking_talent, None),
+    'seeking_description': (models.Venue.seeking_description, None),
+    'image_link': (models.Venue.image_link, None),
+    'upcoming_shows_count': (models.Venue.upcoming_shows_count, None),
+    'past_shows_count': (models.Venue.past_shows_count, None),
+}
+
+ARTIST_FIELDS = {
+    'id': (models.Artist.id, None),
+    'name': (models.Artist.name, None),
+    'genres': (models.Artist.genres, genres.parse_genres),
+    'city': (models.Artist.city, None),
+    'state': (models.Artist.state, None),
+    'phone': (models.Artist.phone, None),
+    'website': (models.Artist.website_link, None),
+    'facebook_link': (models.Artist.facebook_link, None),
+    'seeking_venue': (models.Artist.seeking_venue, None),
+    'seeking_description': (models.Artist.seeking_description, None),
+    'image_link': (models.Artist.image_link, None),
+    'upcoming_shows_count': (models.Artist.upcoming_shows_count, None),
+    'past_shows_count': (models.Artist.past_shows_count, None),
+}
+
+SHOW_FIELDS = {
+    'id': (models.Show.id, None),
+    'start_time': (models.Show.start_time, _iso),
+    'end_time': (models.Show.end_time, _iso),
+    'venue_id': (models.Show.venue_id, None),
+    'venue_name': (models.Venue.name, None),
+    'artist_id': (models.Show.artist_id, None),
+    'artist_name': (models.Artist.name, None),
+    'artist_image_link': (models.Artist.image_link, None),
+}
+
+# list pages default to the short form unless ?fields= asks for more
+VENUE_LIST_FIELDS = ('id', 'name', 'city', 'state', 'upcoming_shows_count')
+ARTIST_LIST_FIELDS = ('id', 'name', 'city', 'state', 'upcoming_shows_count')
+
+
+# this function return the requested field names, 400 on unknown ones
+def selected_fields(available, default):
+    requested = request.args.get('fields')
+    if not requested:
+        return list(default)
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    if not names or any(name not in available for name in names):
+        abort(400)
+    return names
+
+
+# this function return a projection query of the named fields, the sort
+# keys are always selected (as _id / _start_time) for the cursor
+def projection(available, names, *keys):
+    columns = [available[name][0].label(name) for name in names]
+    columns += [key.label('_' + key.key) for key in keys]
+    return db.session.query(*columns)
+
+
+def serialize(row, available, names):
+    item = {}
+    for name in names:
+        value = getattr(row, name)
+        transform = available[name][1]
+        item[name] = transform(value) if transform is not None else value
+    return item
+
+
+def page_size():
+    return min(max(request.args.get('limit', current_app.config['API_PAGE_SIZE'], type=int), 1),
+               current_app.config['API_MAX_PAGE_SIZE'])
+
+
+# this function send compact json with an ETag of the body, a request whose
+# If-None-Match matches gets 304 and no body
+def json_response(payload, status=200):
+    body = json.dumps(payload, separators=(',', ':'))
+    response = current_app.response_class(body, status=status, mimetype='application/json')
+    if status == 200:
+        response.set_etag(hashlib.sha1(body.encode()).hexdigest())
+        response.make_conditional(request)
+    return response
+
+
+@api_v1.errorhandler(400)
+def bad_request(error):
+    return json_response({"error": "bad request"}, 400)
+
+
+@api_v1.errorhandler(404)
+def not_found(error):
+    return json_response({"error": "not found"}, 404)
+
+
+#  Venues ----------------------------------------------------------------
+
+@api_v1.route('/venues')
+def venues():
+    names = selected_fields(VENUE_FIELDS, VENUE_LIST_FIELDS)
+    try:
+        after = pagination.decode_id_cursor(request.args.get('cursor'))
+    except ValueError:
+        abort(400)
+
+    query = projection(VENUE_FIELDS, names, models.Venue.id)
+    if after is not None:
+        query = query.filter(models.Venue.id > after)
+    return id_page(query.order_by(models.Venue.id), VENUE_FIELDS, names)
+
+
+@api_v1.route('/venues/<int:venue_id>')
+def venue(venue_id):
+    names = selected_fields(VENUE_FIELDS, VENUE_FIELDS)
+    row = projection(VENUE_FIELDS, names).filter(models.Venue.id == venue_id).first()
+    if row is None:
+        abort(404)
+    return json_response({"data": serialize(row, VENUE_FIELDS, names)})
+
+
+# this function parse a ?from= / ?to= bound, a date (midnight) or a local
+# date and time like 2035-04-01T20:00
+def _instant(value):
+    instant = datetime.fromisoformat(value)
+    if instant.tzinfo is not None:
+        raise ValueError('times are local to the venue')
+    return instant
+
+
+# busy and free intervals of a venue between ?from= and ?to=, at most
+# bookings.MAX_AVAILABILITY_WINDOW apart
+@api_v1.route('/venues/<int:venue_id>/availability')
+def venue_availability(venue_id):
+    try:
+        start = _instant(request.args['from'])
+        end = _instant(request.args['to'])
+    except (KeyError, ValueError):
+        abort(400)
+    if not timedelta(0) < end - start <= bookings.MAX_AVAILABILITY_WINDOW:
+        abort(400)
+    if db.session.query(models.Venue.id).filter(models.Venue.id == venue_id).first() is None:
+        abort(404)
+
+    busy, free = bookings.availability(venue_id, start, end)
+    return json_response({
+        "data": {
+            "venue_id": venue_id,
+            "from": _iso(start),
+            "to": _iso(end),
+            "busy": [{"start_time": _iso(busy_start), "end_time": _iso(busy_end), "show_id": show_id}
+                     for busy_start, busy_end, show_id in busy],
+            "free": [{"start_time": _iso(free_start), "end_time": _iso(free_end)}
+                     for free_start, free_end in free],
+        }
+    })
+
+
+#  Artists ----------------------------------------------------------------
+
+@api_v1.route('/artists')
+def artists():
+    names = selected_fields(ARTIST_FIELDS, ARTIST_LIST_FIELDS)
+    try:
+        after = pagination.decode_id_cursor(request.args.get('cursor'))
+    except ValueError:
+        abort(400)
+
+    query = projection(ARTIST_FIELDS, names, models.Artist.id)
+    if after is not None:
+        query = query.filter(models.Artist.id > after)
+    return id_page(query.order_by(models.Artist.id), ARTIST_FIELDS, names)
+
+
+@api_v1.route('/artists/<int:artist_id>')
+def artist(artist_id):
+    names = selected_fields(ARTIST_FIELDS, ARTIST_FIELDS)
+    row = projection(ARTIST_FIELDS, names).filter(models.Artist.id == artist_id).first()
+    if row is None:
+        abort(404)
+    return json_response({"data": serialize(row, ARTIST_FIELDS, names)})
+
+
+# this function return one page of an id ordered list
+def id_page(query, available, names):
+    limit = page_size()
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = pagination.encode_id_cursor(rows[-1]._id)
+
+    return json_response({
+        "data": [serialize(row, available, names) for row in rows],
+        "next_cursor": next_cursor
+    })
+
+
+#  Shows ----------------------------------------------------------------
+
+def show_projection(names):
+    return projection(SHOW_FIELDS, names, models.Show.id, models.Show.start_time) \
+        .join(models.Venue, models.Show.venue_id == models.Venue.id) \
+        .join(models.Artist, models.Show.artist_id == models.Artist.id)
+
+
+@api_v1.route('/shows')
+def shows():
+    names = selected_fields(SHOW_FIELDS, SHOW_FIELDS)
+    try:
+        after = pagination.decode_show_cursor(request.args.get('cursor'))
+        date_from = parse_date_arg('from')
+        date_to = parse_date_arg('to')
+    except ValueError:
+        abort(400)
+
+    query = show_projection(names)
+    if date_from is not None:
+        query = query.filter(models.Show.start_time >= date_from)
+    if date_to is not None:
+        query = query.filter(models.Show.start_time < date_to + timedelta(days=1))
+    query = pagination.shows_after(query, after)
+
+    limit = page_size()
+    rows = query.order_by(*pagination.SHOW_ORDER).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = pagination.encode_show_cursor(rows[-1]._start_time, rows[-1]._id)
+
+    return json_response({
+        "data": [serialize(row, SHOW_FIELDS, names) for row in rows],
+        "next_cursor": next_cursor
+    })
+
+
+@api_v1.route('/shows/<int:show_id>')
+def show(show_id):
+    names = selected_fields(SHOW_FIELDS, SHOW_FIELDS)
+    row = show_projection(names).filter(models.Show.id == show_id).first()
+    if row is None:
+        abort(404)
+    return json_response({"data": serialize(row, SHOW_FIELDS, names)})
+
@@ -2,811 +2,86 @@
 # Imports
 # ----------------------------------------------------------------------------#
 
-import datetime
-import logging
-from logging import Formatter, FileHandler
-
-import babel
-import dateutil.parser
-from flask import Flask, render_template, request, flash, redirect, url_for
-from flask_migrate import Migrate
-from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-
-from forms import *
-
-# ----------------------------------------------------------------------------#
-# App Config.
-# ----------------------------------------------------------------------------#
-
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
-
-# TODO: DONE: connect to a local postgresql database
-migrate = Migrate(app, db)
-
-# import after create the db
-import models
+import click
+from flask import Flask
+
+import api
+import artists
+import assets
+import cache
+import counters
+import export
+import genres
+import images
+import logs
+import main
+import metrics
+import routing
+import search
+import shows
+import venues
+from extensions import db, moment
 
 
 # ----------------------------------------------------------------------------#
-# Filters.
+# App Factory.
+#
+# create_app() builds the app and registers the blueprints. The state of
+# the extensions (page cache, search indexes, image cache, log pipeline)
+# lives in app.extensions, so every app gets its own. Everything a web
+# worker does not need right away is imported late: Flask-Migrate and the
+# CLI-only commands when the app is loaded by the flask command, forms,
+# babel and dateutil by the views that use them.
 # ----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
-
-
-app.jinja_env.filters['datetime'] = format_datetime
-
-
-# ----------------------------------------------------------------------------#
-# Controllers.
-# ----------------------------------------------------------------------------#
-
-@app.route('/')
-def index():
-    return render_template('pages/home.html')
-
-
-#  Venues ----------------------------------------------------------------
-
-@app.route('/venues')
-def venues():
-    # TODO: replace with real venues data.
-    #       num_shows should be aggregated based on number of upcoming shows per venue.
-    # data = [{
-    #     "city": "San Francisco",
-    #     "state": "CA",
-    #     "venues": [{
-    #         "id": 1,
-    #         "name": "The Musical Hop",
-    #         "num_upcoming_shows": 0,
-    #     }, {
-    #         "id": 3,
-    #         "name": "Park Square Live Music & Coffee",
-    #         "num_upcoming_shows": 1,
-    #     }]
-    # }, {
-    #     "city": "New York",
-    #     "state": "NY",
-    #     "venues": [{
-    #         "id": 2,
-    #         "name": "The Dueling Pianos Bar",
-    #         "num_upcoming_shows": 0,
-    #     }]
-    # }]
-
-    # add all state and city to list
-    areas = []
-    all_venues = models.Venue.query.order_by('state').order_by('city').all()
-    for venue in all_venues:
-        areas.append((venue.state, venue.city))
-
-    # convert to set to avoid duplicates
-    my_areas = set(areas)
-    data = []
-    for area in my_areas:
-        temp_venues = []
-        for venue in all_venues:
-            if venue.state == area[0] and venue.city == area[1]:
-                temp_venues.append({
-                    "id": venue.id,
-                    "name": venue.name,
-                    "num_upcoming_shows": venue.upcoming_shows_count,
-                })
-        data.append({
-            "city": area[1],
-            "state": area[0],
-            "venues": temp_venues
-        })
-
-    return render_template('pages/venues.html', areas=data)
-
-
-@app.route('/venues/search', methods=['POST'])
-def search_venues():
-    # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
-    # seach for Hop should return "The Musical Hop".
-    # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-
-    data = []
-    tag = request.form["search_term"]
-    search = "%{}%".format(tag.strip())
-    all_venues = models.Venue.query.filter(models.Venue.name.ilike(search)).all()
-
-    count = 0
-    for venue in all_venues:
-        data.append({
-            "id": venue.id,
-            "name": venue.name,
-            "num_upcoming_shows": venue.upcoming_shows_count,
-        })
-        count += 1
-
-    response = {
-        "count": count,
-        "data": data
-    }
-
-    return render_template('pages/search_venues.html', results=response,
-                           search_term=request.form.get('search_term', ''))
-
-
-@app.route('/venues/<int:venue_id>')
-def show_venue(venue_id):
-    # shows the venue page with the given venue_id
-    # TODO: replace with real venue data from the venues table, using venue_id
-    # data1 = {
-    #     "id": 1,
-    #     "name": "The Musical Hop",
-    #     "genres": ["Jazz", "Reggae", "Swing", "Classical", "Folk"],
-    #     "address": "1015 Folsom Street",
-    #     "city": "San Francisco",
-    #     "state": "CA",
-    #     "phone": "123-123-1234",
-    #     "website": "https://www.themusicalhop.com",
-    #     "facebook_link": "https://www.facebook.com/TheMusicalHop",
-    #     "seeking_talent": True,
-    #     "seeking_description": "We are on the lookout for a local artist to play every two weeks. Please call us.",
-    #     "image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60",
-    #     "past_shows": [{
-    #         "artist_id": 4,
-    #         "artist_name": "Guns N Petals",
-    #         "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-    #         "start_time": "2019-05-21T21:30:00.000Z"
-    #     }],
-    #     "upcoming_shows": [],
-    #     "past_shows_count": 1,
-    #     "upcoming_shows_count": 0,
-    # }
-    # data2 = {
-    #     "id": 2,
-    #     "name": "The Dueling Pianos Bar",
-    #     "genres": ["Classical", "R&B", "Hip-Hop"],
-    #     "address": "335 Delancey Street",
-    #     "city": "New York",
-    #     "state": "NY",
-    #     "phone": "914-003-1132",
-    #     "website": "https://www.theduelingpianos.com",
-    #     "facebook_link": "https://www.facebook.com/theduelingpianos",
-    #     "seeking_talent": False,
-    #     "image_link": "https://images.unsplash.com/photo-1497032205916-ac775f0649ae?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=750&q=80",
-    #     "past_shows": [],
-    #     "upcoming_shows": [],
-    #     "past_shows_count": 0,
-    #     "upcoming_shows_count": 0,
-    # }
-    # data3 = {
-    #     "id": 3,
-    #     "name": "Park Square Live Music & Coffee",
-    #     "genres": ["Rock n Roll", "Jazz", "Classical", "Folk"],
-    #     "address": "34 Whiskey Moore Ave",
-    #     "city": "San Francisco",
-    #     "state": "CA",
-    #     "phone": "415-000-1234",
-    #     "website": "https://www.parksquarelivemusicandcoffee.com",
-    #     "facebook_link": "https://www.facebook.com/ParkSquareLiveMusicAndCoffee",
-    #     "seeking_talent": False,
-    #     "image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-    #     "past_shows": [{
-    #         "artist_id": 5,
-    #         "artist_name": "Matt Quevedo",
-    #         "artist_image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
-    #         "start_time": "2019-06-15T23:00:00.000Z"
-    #     }],
-    #     "upcoming_shows": [{
-    #         "artist_id": 6,
-    #         "artist_name": "The Wild Sax Band",
-    #         "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    #         "start_time": "2035-04-01T20:00:00.000Z"
-    #     }, {
-    #         "artist_id": 6,
-    #         "artist_name": "The Wild Sax Band",
-    #         "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    #         "start_time": "2035-04-08T20:00:00.000Z"
-    #     }, {
-    #         "artist_id": 6,
-    #         "artist_name": "The Wild Sax Band",
-    #         "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    #         "start_time": "2035-04-15T20:00:00.000Z"
-    #     }],
-    #     "past_shows_count": 1,
-    #     "upcoming_shows_count": 1,
-    # }
-    # data = list(filter(lambda d: d['id'] ==
-    #                              venue_id, [data1, data2, data3]))[0]
-
-    past_shows = []
-    upcoming_shows = []
-    venue = models.Venue.query.get(venue_id)
-
-    res = db.session.query(models.Show, models.Artist).join(models.Venue) \
-        .filter(models.Venue.id == venue_id) \
-        .filter(models.Show.artist_id == models.Artist.id) \
-        .all()
-
-    for show, artist in res:
-
-        temp_show = artist_info(artist, show)
-
-        if show.start_time.date() < datetime.today().date():
-            past_shows.append(temp_show)
-        else:
-            upcoming_shows.append(temp_show)
-
-    data = venue_data(venue, past_shows, upcoming_shows)
-    return render_template('pages/show_venue.html', venue=data)
-
-
-# this function return show info that needed for the artist page
-def artist_info(artist, show):
-    return {
-        "artist_id": artist.id,
-        "artist_name": artist.name,
-        "artist_image_link": artist.image_link,
-        "start_time": format_datetime(str(show.start_time))
-    }
-
-
-# this function return venue data
-def venue_data(venue, past_shows, upcoming_shows):
-    return {
-        "id": venue.id,
-        "name": venue.name,
-        "genres": venue.genres.split(","),
-        "city": venue.city,
-        "address": venue.address,
-        "state": venue.state,
-        "phone": venue.phone,
-        "website": venue.website_link,
-        "facebook_link": venue.facebook_link,
-        "seeking_talent": venue.seeking_talent,
-        "seeking_description": venue.seeking_description,
-        "image_link": venue.image_link,
-        "past_shows": past_shows,
-        "upcoming_shows": upcoming_shows,
-        "past_shows_count": venue.past_shows_count,
-        "upcoming_shows_count": venue.upcoming_shows_count,
-    }
-
-
-#  Create Venue ----------------------------------------------------------------
-@app.route('/venues/create', methods=['GET'])
-def create_venue_form():
-    form = VenueForm()
-    return render_template('forms/new_venue.html', form=form)
-
-
-@app.route('/venues/create', methods=['POST'])
-def create_venue_submission():
-    # TODO: insert form data as a new Venue record in the db, instead
-    # TODO: modify data to be the data object returned from db insertion
-
-    form = VenueForm()
-
-    try:
-        name = form.name.data
-        genres = form.genres.data
-        city = form.city.data
-        state = form.state.data
-        phone = form.phone.data
-        website_link = form.website_link.data
-        facebook_link = form.facebook_link.data
-        address = form.address.data
-        seeking_talent = True if form.seeking_talent.data == 'Yes' else False
-        seeking_description = form.seeking_description.data
-        image_link = form.image_link.data
-
-        venue = models.Venue(
-            name=name,
-            genres=genres,
-            city=city,
-            state=state,
-            phone=phone,
-            website_link=website_link,
-            facebook_link=facebook_link,
-            seeking_talent=seeking_talent,
-            seeking_description=seeking_description,
-            image_link=image_link,
-            address=address,
-            upcoming_shows_count=0,  # default for new venue
-            past_shows_count=0  # default for new venue
-        )
-
-        db.session.add(venue)
-        db.session.commit()
-
-        flash('Venue ' + name + ' was successfully listed!')
-    except:
-        flash('An error occurred. Venue ' + form.name.data + ' could not be listed.')
-        db.session.rollback()
-    finally:
-        db.session.close()
-
-    return render_template('pages/home.html')
-
-
-@app.route('/venues/<venue_id>', methods=['DELETE'])
-def delete_venue(venue_id):
-    # TODO: Complete this endpoint for taking a venue_id, and using
-    # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
-    name = models.Venue.query.get(venue_id).name
-    try:
-        models.Venue.query.filter_by(id=venue_id).delete()
-        db.session.commit()
-        flash('Venue ' + name + ' was successfully deleted!')
-    except:
-        db.session.rollback()
-        flash('An error occurred. Venue ' + name + ' could not be deleted.')
-    finally:
-        db.session.close()
-
-    # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
-    # clicking that button delete it from the db then redirect the user to the homepage
-    return redirect(url_for('/venues'))
-
-
-#  Artists ----------------------------------------------------------------
-@app.route('/artists')
-def artists():
-    # DONE TODO: replace with real data returned from querying the database
-    data = models.Artist.query.all()
-    return render_template('pages/artists.html', artists=data)
-
-
-@app.route('/artists/search', methods=['POST'])
-def search_artists():
-    # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
-    # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
-    # search for "band" should return "The Wild Sax Band".
-
-    data = []
-
-    tag = request.form["search_term"]
-    search = "%{}%".format(tag.strip())
-    all_artists = models.Artist.query.filter(models.Artist.name.ilike(search)).all()
-
-    count = 0
-    for artist in all_artists:
-        data.append({
-            "id": artist.id,
-            "name": artist.name,
-            "num_upcoming_shows": artist.upcoming_shows_count,
-        })
-        count += 1
-
-    response = {
-        "count": count,
-        "data": data
-    }
-
-    return render_template('pages/search_artists.html', results=response,
-                           search_term=request.form.get('search_term', ''))
-
-
-@app.route('/artists/<int:artist_id>')
-def show_artist(artist_id):
-    # TODO: replace with real venue data from the venues table, using venue_id
-    # data2 = {
-    #     "id": 5,
-    #     "name": "Matt Quevedo",
-    #     "genres": ["Jazz"],
-    #     "city": "New York",
-    #     "state": "NY",
-    #     "phone": "300-400-5000",
-    #     "facebook_link": "https://www.facebook.com/mattquevedo923251523",
-    #     "seeking_venue": False,
-    #     "image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
-    #     "past_shows": [{
-    #         "venue_id": 3,
-    #         "venue_name": "Park Square Live Music & Coffee",
-    #         "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-    #         "start_time": "2019-06-15T23:00:00.000Z"
-    #     }],
-    #     "upcoming_shows": [],
-    #     "past_shows_count": 1,
-    #     "upcoming_shows_count": 0,
-    # }
-    # data3 = {
-    #     "id": 6,
-    #     "name": "The Wild Sax Band",
-    #     "genres": ["Jazz", "Classical"],
-    #     "city": "San Francisco",
-    #     "state": "CA",
-    #     "phone": "432-325-5432",
-    #     "seeking_venue": False,
-    #     "image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    #     "past_shows": [],
-    #     "upcoming_shows": [{
-    #         "venue_id": 3,
-    #         "venue_name": "Park Square Live Music & Coffee",
-    #         "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-    #         "start_time": "2035-04-01T20:00:00.000Z"
-    #     }, {
-    #         "venue_id": 3,
-    #         "venue_name": "Park Square Live Music & Coffee",
-    #         "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-    #         "start_time": "2035-04-08T20:00:00.000Z"
-    #     }, {
-    #         "venue_id": 3,
-    #         "venue_name": "Park Square Live Music & Coffee",
-    #         "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-    #         "start_time": "2035-04-15T20:00:00.000Z"
-    #     }],
-    #     "past_shows_count": 0,
-    #     "upcoming_shows_count": 3,
-    # }
-
-    past_shows = []
-    upcoming_shows = []
-
-    artist = models.Artist.query.get(artist_id)
-
-    res = db.session.query(models.Show, models.Venue).join(models.Artist) \
-        .filter(models.Artist.id == artist_id) \
-        .filter(models.Show.venue_id == models.Venue.id) \
-        .all()
-
-    for show, venue in res:
-
-        temp_show = show_info(venue, show)
-
-        if show.start_time.date() < datetime.today().date():
-            past_shows.append(temp_show)
-        else:
-            upcoming_shows.append(temp_show)
-
-    data = artist_data(artist, past_shows, upcoming_shows)
-    return render_template('pages/show_artist.html', artist=data)
-
-
-# this function return show info that needed for the artist page
-def show_info(venue, show):
-    return {
-        "venue_id": venue.id,
-        "venue_name": venue.name,
-        "venue_image_link": venue.image_link,
-        "start_time": format_datetime(str(show.start_time))
-    }
-
-
-# this function return artist data
-def artist_data(artist, past_shows, upcoming_shows):
-    return {
-        "id": artist.id,
-        "name": artist.name,
-        "genres": artist.genres.split(","),
-        "city": artist.city,
-        "state": artist.state,
-        "phone": artist.phone,
-        "website": artist.website_link,
-        "facebook_link": artist.facebook_link,
-        "seeking_venue": artist.seeking_venue,
-        "seeking_description": artist.seeking_description,
-        "image_link": artist.image_link,
-        "past_shows": past_shows,
-        "upcoming_shows": upcoming_shows,
-        "past_shows_count": artist.past_shows_count,
-        "upcoming_shows_count": artist.upcoming_shows_count,
-    }
-
-
-#  Update ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
-def edit_artist(artist_id):
-    form = ArtistForm()
-
-    artist = models.Artist.query.get(artist_id)
-
-    artist = {
-        "id": artist.id,
-        "name": artist.name,
-        "genres": artist.genres,
-        "city": artist.city,
-        "state": artist.state,
-        "phone": artist.phone,
-        "website": artist.website_link,
-        "facebook_link": artist.facebook_link,
-        "seeking_venue": artist.seeking_venue,
-        "seeking_description": artist.seeking_description,
-        "image_link": artist.image_link
-    }
-    # TODO: populate form with fields from artist with ID <artist_id>
-    return render_template('forms/edit_artist.html', form=form, artist=artist)
-
-
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
-def edit_artist_submission(artist_id):
-    # TODO: take values from the form submitted, and update existing
-    artist = models.Artist.query.get(artist_id)
-
-    try:
-        # get data from the form
-        name = request.form.name.data
-        genres = request.form.genres.data
-        city = request.form.city.data
-        state = request.form.state.data
-        phone = request.form.phone.data
-        website_link = request.form.website_link.data
-        facebook_link = request.form.facebook_link.data
-        seeking_venue = True if request.form.seeking_venue.data == 'Yes' else False
-        seeking_description = request.form.seeking_description.data
-        image_link = request.form.image_link.data
-
-        artist.name = name
-        artist.genres = genres
-        artist.city = city
-        artist.state = state
-        artist.phone = phone
-        artist.website_link = website_link
-        artist.facebook_link = facebook_link
-        artist.seeking_venue = seeking_venue
-        artist.seeking_description = seeking_description
-        artist.image_link = image_link
-
-        db.session.commit()
-        flash('Artist ' + name + ' was successfully updated!')
-    except:
-        db.session.rollback()
-        flash('An error occurred. Artist ' + artist.name + ' could not be updated.')
-    finally:
-        db.session.close()
-
-    return redirect(url_for('show_artist', artist_id=artist_id))
-
-
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
-def edit_venue(venue_id):
-    form = VenueForm()
-
-    venue = models.Venue.query.get(venue_id)
-    venue = {
-        "id": venue.id,
-        "name": venue.name,
-        "genres": venue.genres,
-        "address": venue.address,
-        "city": venue.city,
-        "state": venue.state,
-        "phone": venue.phone,
-        "website": venue.website_link,
-        "facebook_link": venue.facebook_link,
-        "seeking_talent": venue.seeking_talent,
-        "seeking_description": venue.seeking_description,
-        "image_link": venue.image_link
-    }
-    # TODO: populate form with values from venue with ID <venue_id>
-    return render_template('forms/edit_venue.html', form=form, venue=venue)
-
-
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
-def edit_venue_submission(venue_id):
-    # TODO: take values from the form submitted, and update existing
-    venue = models.Venue.query.get(venue_id)
-
-    try:
-        venue.name = request.form.name.data
-        venue.genres = request.form.genres.data
-        venue.city = request.form.city.data
-        venue.state = request.form.state.data
-        venue.phone = request.form.phone.data
-        venue.website_link = request.form.website_link.data
-        venue.facebook_link = request.form.facebook_link.data
-        venue.address = request.form.address.data
-        venue.seeking_talent = True if request.form.seeking_talent.data == 'Yes' else False
-        venue.seeking_description = request.form.seeking_description.data
-        venue.image_link = request.form.image_link.data
-
-        db.session.add(venue)
-        db.session.commit()
-
-        flash('Venue ' + venue.name + ' was successfully updated!')
-    except:
-        flash('An error occurred. Venue ' + venue.name + ' could not be updated.')
-        db.session.rollback()
-    finally:
-        db.session.close()
-    return redirect(url_for('show_venue', venue_id=venue_id))
-
-
-#  Create Artist ----------------------------------------------------------------
-
-@app.route('/artists/create', methods=['GET'])
-def create_artist_form():
-    form = ArtistForm()
-    return render_template('forms/new_artist.html', form=form)
-
-
-@app.route('/artists/create', methods=['POST'])
-def create_artist_submission():
-    form = ArtistForm()
-
-    try:
-        name = form.name.data
-        genres = form.genres.data
-        city = form.city.data
-        state = form.state.data
-        phone = form.phone.data
-        website_link = form.website_link.data
-        facebook_link = form.facebook_link.data
-        seeking_venue = True if form.seeking_venue.data == 'Yes' else False
-        seeking_description = form.seeking_description.data
-        image_link = form.image_link.data
-
-        artist = models.Artist(
-            name=name,
-            genres=genres,
-            city=city,
-            state=state,
-            phone=phone,
-            website_link=website_link,
-            facebook_link=facebook_link,
-            seeking_venue=seeking_venue,
-            seeking_description=seeking_description,
-            image_link=image_link,
-            upcoming_shows_count=0,  # default for new artist
-            past_shows_count=0  # default for new artist
-        )
-
-        db.session.add(artist)
-        db.session.commit()
-
-        flash('Artist ' + name + ' was successfully listed!')
-    except:
-        flash('An error occurred. Artist ' + form.name.data + ' could not be listed.')
-        db.session.rollback()
-    finally:
-        db.session.close()
-
-    return render_template('pages/home.html')
-
-
-#  Shows ----------------------------------------------------------------
-
-@app.route('/shows')
-def shows():
-    # displays list of shows at /shows
-    # TODO: replace with real venues data.
-    #       num_shows should be aggregated based on number of upcoming shows per venue.
-    # data = [
-    # {
-    #     "venue_id": 1,
-    #     "venue_name": "The Musical Hop",
-    #     "artist_id": 4,
-    #     "artist_name": "Guns N Petals",
-    #     "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-    #     "start_time": "2019-05-21T21:30:00.000Z"
-    # },
-    # {
-    #     "venue_id": 3,
-    #     "venue_name": "Park Square Live Music & Coffee",
-    #     "artist_id": 5,
-    #     "artist_name": "Matt Quevedo",
-    #     "artist_image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
-    #     "start_time": "2019-06-15T23:00:00.000Z"
-    # },
-    # {
-    #     "venue_id": 3,
-    #     "venue_name": "Park Square Live Music & Coffee",
-    #     "artist_id": 6,
-    #     "artist_name": "The Wild Sax Band",
-    #     "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    #     "start_time": "2035-04-01T20:00:00.000Z"
-    # },
-    # {
-    #     "venue_id": 3,
-    #     "venue_name": "Park Square Live Music & Coffee",
-    #     "artist_id": 6,
-    #     "artist_name": "The Wild Sax Band",
-    #     "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    #     "start_time": "2035-04-08T20:00:00.000Z"
-    # },
-    # {
-    #     "venue_id": 3,
-    #     "venue_name": "Park Square Live Music & Coffee",
-    #     "artist_id": 6,
-    #     "artist_name": "The Wild Sax Band",
-    #     "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    #     "start_time": "2035-04-15T20:00:00.000Z"
-    # }]
-
-    data = []
-    all_show = models.Show.query.all()
-    for show in all_show:
-        data.append(
-            {
-                "venue_id": show.venue_id,
-                "venue_name": models.Venue.query.get(show.venue_id).name,
-                "artist_id": show.artist_id,
-                "artist_name": show.artist.name,
-                "artist_image_link": show.artist.image_link,
-                "start_time": format_datetime(str(show.start_time))
-            }
-        )
-    return render_template('pages/shows.html', shows=data)
-
-
-@app.route('/shows/create')
-def create_shows():
-    # renders form. do not touch.
-    form = ShowForm()
-    return render_template('forms/new_show.html', form=form)
-
-
-@app.route('/shows/create', methods=['POST'])
-def create_show_submission():
-    # TODO: insert form data as a new Show record in the db, instead
-
-    form = ShowForm()
-
-    try:
-        venue_id = form.venue_id.data
-        artist_id = form.artist_id.data
-        start_time = form.start_time.data
-
-        show = models.Show(
-            venue_id=venue_id,
-            artist_id=artist_id,
-            start_time=start_time
-        )
-
-        # update shows count in artist and venue db
-        venue = models.Venue.query.get(venue_id)
-        artist = models.Artist.query.get(artist_id)
-
-        if start_time.date() > datetime.today().date():
-            up_count = venue.upcoming_shows_count
-            venue.upcoming_shows_count = up_count + 1
-
-            up_count = artist.upcoming_shows_count
-            artist.upcoming_shows_count = up_count + 1
-        else:
-            past_count = venue.past_shows_count
-            venue.past_shows_count = past_count + 1
-
-            past_count = artist.past_shows_count
-            artist.past_shows_count = past_count + 1
-
-        db.session.add(show)
-        db.session.commit()
-
-        flash('Show was successfully listed!')
-    except:
-        flash('An error occurred. Show could not be listed.')
-        db.session.rollback()
-    finally:
-        db.session.close()
-
-    return render_template('pages/home.html')
-
-
-@app.errorhandler(404)
-def not_found_error(error):
-    return render_template('errors/404.html'), 404
-
-
-@app.errorhandler(500)
-def server_error(error):
-    return render_template('errors/500.html'), 500
-
+# settings passed as keyword arguments override the config object's, e.g.
+# create_app(SQLALCHEMY_DATABASE_URI='sqlite://') in tests
+def create_app(config='config', **settings):
+    app = Flask(__name__)
+    app.config.from_object(config)
+    app.config.update(settings)
+
+    moment.init_app(app)
+    # TODO: DONE: connect to a local postgresql database
+    db.init_app(app)
+    metrics.init_app(app)
+    logs.init_app(app)
+    routing.init_app(app)
+    cache.init_app(app)
+    images.init_app(app)
+    # web workers and `flask run` build the search indexes before serving,
+    # the other flask commands never search
+    cli = click.get_current_context(silent=True)
+    search.init_app(app, build=cli is None or cli.info_name == 'run')
+
+    app.register_blueprint(main.bp)
+    app.register_blueprint(venues.bp)
+    app.register_blueprint(artists.bp)
+    app.register_blueprint(shows.bp)
+    app.register_blueprint(api.api_v1)
+    app.register_blueprint(export.export)
+    app.register_blueprint(assets.static_assets)
+    app.register_blueprint(images.images)
+
+    # loaded by the flask command (flask db, flask import, flask run, ...)
+    if cli is not None:
+        from flask_migrate import Migrate
+        import importer
+        import jobs
+        import seed
+
+        Migrate(app, db)
+        app.cli.add_command(counters.rollover_counts_command)
+        app.cli.add_command(counters.reconcile_counts_command)
+        app.cli.add_command(genres.reconcile_genres_command)
+        app.cli.add_command(assets.assets_build_command)
+        app.cli.add_command(importer.import_command)
+        app.cli.add_command(seed.seed_command)
+        app.cli.add_command(jobs.worker_command)
+        app.cli.add_command(jobs.enqueue_command)
+
+    return app
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
 
 # ----------------------------------------------------------------------------#
 # Launch.
@@ -814,11 +89,11 @@ if not app.debug:
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
@@ -0,0 +1,321 @@
+from datetime import datetime
+
+from flask import Blueprint, current_app, render_template, request, flash, redirect, url_for, abort
+
+import cache
+import genres
+import http_cache
+import models
+import search
+import shows
+from extensions import db
+
+# ----------------------------------------------------------------------------#
+# Artist pages.
+#
+# The form views import forms (and with it wtforms) on first use.
+# ----------------------------------------------------------------------------#
+
+bp = Blueprint('artists', __name__)
+
+
+#  Artists ----------------------------------------------------------------
+@bp.route('/artists')
+@http_cache.conditional(http_cache.artists_version)
+def artists():
+    # DONE TODO: replace with real data returned from querying the database
+    query = db.session.query(models.Artist.id, models.Artist.name)
+
+    # optional ?genre= filter through the artist_genre index
+    genre = request.args.get('genre')
+    if genre:
+        query = query.join(models.artist_genres, models.artist_genres.c.artist_id == models.Artist.id) \
+            .filter(models.artist_genres.c.genre_id == genres.genre_id(genre))
+
+    data = query.order_by(models.Artist.id).all()
+    return render_template('pages/artists.html', artists=data, genre=genre,
+                           facets=genres.facet_counts(models.Artist))
+
+
+@bp.route('/artists/search', methods=['GET', 'POST'])
+def search_artists():
+    # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+    # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+    # search for "band" should return "The Wild Sax Band".
+
+    # relevance-ordered page of matches from the indexed search backend,
+    # the next pages are plain GET links
+    tag = request.values.get('search_term', '')
+    # page 0 or below is the first page, so next_url is page 2
+    page = max(request.values.get('page', 1, type=int), 1)
+    per_page = current_app.config['SEARCH_RESULTS_PER_PAGE']
+    total, rows = search.search(models.Artist, tag, page=page, per_page=per_page)
+
+    data = []
+    for row in rows:
+        data.append({
+            "id": row.id,
+            "name": row.name,
+            "num_upcoming_shows": row.upcoming_shows_count,
+        })
+
+    response = {
+        "count": total,
+        "data": data
+    }
+
+    next_url = None
+    if page * per_page < total:
+        next_url = url_for('artists.search_artists', search_term=tag, page=page + 1)
+
+    return render_template('pages/search_artists.html', results=response,
+                           search_term=tag, next_url=next_url)
+
+
+@bp.route('/artists/<int:artist_id>')
+@http_cache.conditional(http_cache.artist_version)
+def show_artist(artist_id):
+    # TODO: replace with real venue data from the venues table, using venue_id
+    # data2 = {
+    #     "id": 5,
+    #     "name": "Matt Quevedo",
+    #     "genres": ["Jazz"],
+    #     "city": "New York",
+    #     "state": "NY",
+    #     "phone": "300-400-5000",
+    #     "facebook_link": "https://www.facebook.com/mattquevedo923251523",
+    #     "seeking_venue": False,
+    #     "image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
+    #     "past_shows": [{
+    #         "venue_id": 3,
+    #         "venue_name": "Park Square Live Music & Coffee",
+    #         "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
+    #         "start_time": "2019-06-15T23:00:00.000Z"
+    #     }],
+    #     "upcoming_shows": [],
+    #     "past_shows_count": 1,
+    #     "upcoming_shows_count": 0,
+    # }
+    # data3 = {
+    #     "id": 6,
+    #     "name": "The Wild Sax Band",
+    #     "genres": ["Jazz", "Classical"],
+    #     "city": "San Francisco",
+    #     "state": "CA",
+    #     "phone": "432-325-5432",
+    #     "seeking_venue": False,
+    #     "image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
+    #     "past_shows": [],
+    #     "upcoming_shows": [{
+    #         "venue_id": 3,
+    #         "venue_name": "Park Square Live Music & Coffee",
+    #         "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
+    #         "start_time": "2035-04-01T20:00:00.000Z"
+    #     }, {
+    #         "venue_id": 3,
+    #         "venue_name": "Park Square Live Music & Coffee",
+    #         "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
+    #         "start_time": "2035-04-08T20:00:00.000Z"
+    #     }, {
+    #         "venue_id": 3,
+    #         "venue_name": "Park Square Live Music & Coffee",
+    #         "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
+    #         "start_time": "2035-04-15T20:00:00.000Z"
+    #     }],
+    #     "past_shows_count": 0,
+    #     "upcoming_shows_count": 3,
+    # }
+
+    data = cache.get_or_build(cache.artist_key(artist_id), lambda: build_artist_page(artist_id))
+    return render_template('pages/show_artist.html', artist=data)
+
+
+# this function return the artist page data and when it goes stale
+def build_artist_page(artist_id):
+    artist = models.Artist.query.get(artist_id)
+    if artist is None:
+        abort(404)
+
+    columns = (models.Show.venue_id,
+               models.Venue.name.label('venue_name'),
+               models.Venue.image_link.label('venue_image_link'),
+               models.Show.start_time)
+
+    now = datetime.now()
+
+    def artist_shows(upcoming, limit):
+        query = db.session.query(*columns) \
+            .join(models.Venue, models.Show.venue_id == models.Venue.id)
+        return shows.split_shows(query, models.Show.artist_id == artist_id, upcoming, now, limit)
+
+    upcoming_rows, upcoming_count = artist_shows(True, current_app.config['DETAIL_UPCOMING_SHOWS_LIMIT'])
+    past_rows, past_count = artist_shows(False, current_app.config['DETAIL_PAST_SHOWS_LIMIT'])
+
+    # the cached page is stale once its first upcoming show starts
+    expires_at = upcoming_rows[0].start_time if upcoming_rows else None
+
+    data = artist_data(artist,
+                       [show_info(row) for row in past_rows], past_count,
+                       [show_info(row) for row in upcoming_rows], upcoming_count)
+    return data, expires_at
+
+
+# this function drop the cached page of an artist and of the venues the
+# artist played at, since their pages show the artist name and image
+def invalidate_artist_pages(artist_id):
+    venue_ids = db.session.query(models.Show.venue_id) \
+        .filter(models.Show.artist_id == artist_id).distinct().all()
+    cache.invalidate(cache.artist_key(artist_id), *[cache.venue_key(row.venue_id) for row in venue_ids])
+
+
+# this function return show info that needed for the artist page
+def show_info(row):
+    return {
+        "venue_id": row.venue_id,
+        "venue_name": row.venue_name,
+        "venue_image_link": row.venue_image_link,
+        "start_time": row.start_time
+    }
+
+
+# this function return artist data
+def artist_data(artist, past_shows, past_shows_count, upcoming_shows, upcoming_shows_count):
+    return {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": [genre.name for genre in artist.genre_list],
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "website": artist.website_link,
+        "facebook_link": artist.facebook_link,
+        "seeking_venue": artist.seeking_venue,
+        "seeking_description": artist.seeking_description,
+        "image_link": artist.image_link,
+        "past_shows": past_shows,
+        "upcoming_shows": upcoming_shows,
+        "past_shows_count": past_shows_count,
+        "upcoming_shows_count": upcoming_shows_count,
+    }
+
+
+#  Update ----------------------------------------------------------------
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    from forms import ArtistForm
+    form = ArtistForm()
+
+    artist = models.Artist.query.get(artist_id)
+
+    artist = {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": artist.genres,
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "website": artist.website_link,
+        "facebook_link": artist.facebook_link,
+        "seeking_venue": artist.seeking_venue,
+        "seeking_description": artist.seeking_description,
+        "image_link": artist.image_link
+    }
+    # TODO: populate form with fields from artist with ID <artist_id>
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    # TODO: take values from the form submitted, and update existing
+    from forms import ArtistForm
+    form = ArtistForm()
+    artist = models.Artist.query.get(artist_id)
+
+    try:
+        # get data from the form
+        name = form.name.data
+        city = form.city.data
+        state = form.state.data
+        phone = form.phone.data
+        website_link = form.website_link.data
+        facebook_link = form.facebook_link.data
+        seeking_venue = True if form.seeking_venue.data == 'Yes' else False
+        seeking_description = form.seeking_description.data
+        image_link = form.image_link.data
+
+        artist.name = name
+        genres.set_genres(artist, form.genres.data)
+        artist.city = city
+        artist.state = state
+        artist.phone = phone
+        artist.website_link = website_link
+        artist.facebook_link = facebook_link
+        artist.seeking_venue = seeking_venue
+        artist.seeking_description = seeking_description
+        artist.image_link = image_link
+
+        db.session.commit()
+        search.index_entity(artist)
+        invalidate_artist_pages(artist_id)
+        flash('Artist ' + name + ' was successfully updated!')
+    except:
+        db.session.rollback()
+        flash('An error occurred. Artist ' + artist.name + ' could not be updated.')
+    finally:
+        db.session.close()
+
+    return redirect(url_for('artists.show_artist', artist_id=artist_id))
+
+
+#  Create Artist ----------------------------------------------------------------
+
+@bp.route('/artists/create', methods=['GET'])
+def create_artist_form():
+    from forms import ArtistForm
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+
+@bp.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    from forms import ArtistForm
+    form = ArtistForm()
+
+    try:
+        name = form.name.data
+        city = form.city.data
+        state = form.state.data
+        phone = form.phone.data
+        website_link = form.website_link.data
+        facebook_link = form.facebook_link.data
+        seeking_venue = True if form.seeking_venue.data == 'Yes' else False
+        seeking_description = form.seeking_description.data
+        image_link = form.image_link.data
+
+        artist = models.Artist(
+            name=name,
+            city=city,
+            state=state,
+            phone=phone,
+            website_link=website_link,
+            facebook_link=facebook_link,
+            seeking_venue=seeking_venue,
+            seeking_description=seeking_description,
+            image_link=image_link,
+            upcoming_shows_count=0,  # default for new artist
+            past_shows_count=0  # default for new artist
+        )
+
+        db.session.add(artist)
+        genres.set_genres(artist, form.genres.data)
+        db.session.commit()
+        search.index_entity(artist)
+
+        flash('Artist ' + name + ' was successfully listed!')
+    except:
+        flash('An error occurred. Artist ' + form.name.data + ' could not be listed.')
+        db.session.rollback()
+    finally:
+        db.session.close()
+
+    return render_template('pages/home.html')
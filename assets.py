@@ -0,0 +1,176 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+import click
+from flask import Blueprint, current_app, request, send_from_directory, url_for
+from flask.cli import with_appcontext
+
+
+# ----------------------------------------------------------------------------#
+# Fingerprinted, precompressed static assets.
+#
+# `flask assets-build` copies every file of static/ to static/dist/ under a
+# content-hashed name, writes gzip and brotli variants of the text files
+# next to it and records the names in static/dist/manifest.json.
+# asset_url() (a url_for('static', filename=...) drop-in available in every
+# template) then points at /assets/<hashed name>, which is served with a
+# far-future immutable Cache-Control and the best precompressed variant the
+# client accepts. Without a manifest asset_url() falls back to /static/.
+# ----------------------------------------------------------------------------#
+
+static_assets = Blueprint('assets', __name__)
+
+# files worth compressing (fonts like woff and images already are)
+COMPRESSIBLE = {'.css', '.js', '.map', '.svg', '.ttf', '.otf', '.eot', '.json', '.html', '.txt'}
+
+# encodings served in order of preference: (Accept-Encoding token, suffix)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+CSS_URL_RE = re.compile(r'''url\((['"]?)([^'")]+)\1\)''')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def dist_dir():
+    return os.path.join(current_app.static_folder, 'dist')
+
+
+def _hashed_name(path, content):
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    root, ext = posixpath.splitext(path)
+    return '{}.{}{}'.format(root, digest, ext)
+
+
+# this function point the relative url()s of a stylesheet at the hashed
+# names of the files they reference
+def _rewrite_css(path, content, manifest):
+    base = posixpath.dirname(path)
+
+    def replace(match):
+        quote, url = match.groups()
+        if url.startswith(('data:', 'http:', 'https:', '//', '/')):
+            return match.group(0)
+        target, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+        resolved = posixpath.normpath(posixpath.join(base, target))
+        if resolved not in manifest:
+            return match.group(0)
+        hashed = posixpath.relpath(manifest[resolved], base)
+        return 'url({0}{1}{2}{0})'.format(quote, hashed, suffix)
+
+    return CSS_URL_RE.sub(replace, content.decode('utf-8')).encode('utf-8')
+
+
+def _write_variants(target, content):
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    variants = [('.gz', gzip.compress(content, compresslevel=9))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(content, quality=11)))
+
+    for suffix, compressed in variants:
+        if len(compressed) < len(content):
+            with open(target + suffix, 'wb') as f:
+                f.write(compressed)
+    return brotli is not None
+
+
+# this function rebuild static/dist and its manifest, return the manifest
+def build():
+    dist = dist_dir()
+    sources = []
+    for directory, dirs, files in os.walk(current_app.static_folder):
+        dirs[:] = [name for name in dirs if os.path.join(directory, name) != dist]
+        for name in files:
+            if not name.startswith('.'):
+                full_path = os.path.join(directory, name)
+                sources.append(os.path.relpath(full_path, current_app.static_folder).replace(os.sep, '/'))
+
+    shutil.rmtree(dist, ignore_errors=True)
+
+    # stylesheets last: their url()s are rewritten to the hashed names
+    manifest = {}
+    with_brotli = True
+    for path in sorted(sources, key=lambda source: (source.endswith('.css'), source)):
+        with open(os.path.join(current_app.static_folder, path), 'rb') as f:
+            content = f.read()
+        if path.endswith('.css'):
+            content = _rewrite_css(path, content, manifest)
+
+        manifest[path] = _hashed_name(path, content)
+        target = os.path.join(dist, manifest[path])
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(content)
+        if posixpath.splitext(path)[1].lower() in COMPRESSIBLE:
+            with_brotli = _write_variants(target, content) and with_brotli
+
+    with open(os.path.join(dist, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    if not with_brotli:
+        current_app.logger.warning('brotli is not installed: only gzip variants were built')
+
+    current_app.extensions['assets_manifest'] = manifest
+    return manifest
+
+
+# this function return the manifest of the app, read from static/dist/ on
+# first use
+def get_manifest():
+    manifest = current_app.extensions.get('assets_manifest')
+    if manifest is None:
+        try:
+            with open(os.path.join(dist_dir(), 'manifest.json')) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        current_app.extensions['assets_manifest'] = manifest
+    return manifest
+
+
+# this function return the fingerprinted url of a static file, or its
+# plain /static/ url when it was not built
+@static_assets.app_template_global()
+def asset_url(filename):
+    if current_app.config['ASSETS_USE_MANIFEST']:
+        hashed = get_manifest().get(filename)
+        if hashed is not None:
+            return url_for('assets.asset', filename=hashed)
+    return url_for('static', filename=filename)
+
+
+@static_assets.route('/assets/<path:filename>')
+def asset(filename):
+    dist = dist_dir()
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    response = None
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and os.path.isfile(os.path.join(dist, filename + suffix)):
+            response = send_from_directory(dist, filename + suffix, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+            break
+    if response is None:
+        response = send_from_directory(dist, filename, mimetype=mimetype)
+
+    # the name changes with the content, so it never has to be revalidated
+    response.headers['Cache-Control'] = IMMUTABLE
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+@click.command('assets-build')
+@with_appcontext
+def assets_build_command():
+    """Build fingerprinted and precompressed copies of static/."""
+    manifest = build()
+    click.echo('{} asset(s) written to {}.'.format(len(manifest), dist_dir()))
@@ -0,0 +1,125 @@
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import click
+
+import models
+import search
+import seed
+from app import create_app
+from extensions import db
+
+
+# ----------------------------------------------------------------------------#
+# Route benchmarks.
+#
+#   python bench.py                     # 1k, 100k and 1M shows
+#   python bench.py --shows 1000 --shows 100000 --requests 50
+#
+# For every scale a fresh SQLite database is filled by `flask seed`'s
+# generator (one venue per 50 shows, one artist per 25), then each route is
+# requested through the test client. The latency percentiles come from
+# plain timed requests, the peak memory (Python allocations) from one more
+# request run under tracemalloc. The server-side page cache is off, so
+# every request renders its page.
+# ----------------------------------------------------------------------------#
+
+SCALES = (1000, 100000, 1000000)
+
+# (name, method, url, form data); {venue} and {artist} are the busiest ones
+ROUTES = (
+    ('venues', 'GET', '/venues', None),
+    ('artists', 'GET', '/artists', None),
+    ('shows', 'GET', '/shows', None),
+    ('venue', 'GET', '/venues/{venue}', None),
+    ('artist', 'GET', '/artists/{artist}', None),
+    ('search_venues', 'POST', '/venues/search', {'search_term': 'hall'}),
+    ('search_artists', 'POST', '/artists/search', {'search_term': 'band'}),
+)
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(share * (len(values) - 1))))]
+
+
+# this function return the latency percentiles (ms) and peak memory (KiB)
+# of one route
+def measure(client, method, url, data, requests):
+    response = client.open(url, method=method, data=data)
+    if response.status_code != 200:
+        raise click.ClickException('{} {} answered {}'.format(method, url, response.status_code))
+
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        client.open(url, method=method, data=data).get_data()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    client.open(url, method=method, data=data).get_data()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'p50_ms': percentile(timings, 0.5),
+        'p95_ms': percentile(timings, 0.95),
+        'p99_ms': percentile(timings, 0.99),
+        'max_ms': max(timings),
+        'peak_kib': peak / 1024,
+    }
+
+
+# this function seed a database of the scale and benchmark every route
+def run_scale(shows, requests, directory):
+    path = os.path.join(directory, 'bench-{}.db'.format(shows))
+    app = create_app(SQLALCHEMY_DATABASE_URI='sqlite:///' + path, SQLALCHEMY_ENGINE_OPTIONS={},
+                     SQLALCHEMY_BINDS={}, WTF_CSRF_ENABLED=False, CACHE_BACKEND=None, LOG_FILE=os.devnull,
+                     DEBUG=False)
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        venue_ids, artist_ids = seed.generate(max(shows // 50, 10), max(shows // 25, 20), shows)
+        click.echo('seeded {} shows in {:.1f}s'.format(shows, time.perf_counter() - started), err=True)
+        search.rebuild_index(models.Venue)
+        search.rebuild_index(models.Artist)
+
+        client = app.test_client()
+        results = []
+        for name, method, url, data in ROUTES:
+            url = url.format(venue=venue_ids[0], artist=artist_ids[0])
+            result = measure(client, method, url, data, requests)
+            result.update(route=name, shows=shows)
+            results.append(result)
+
+        db.session.remove()
+        db.engine.dispose()
+    os.remove(path)
+    return results
+
+
+@click.command()
+@click.option('--shows', 'scales', type=int, multiple=True, help='Shows to seed, repeatable. [default: 1k, 100k, 1M]')
+@click.option('--requests', default=30, show_default=True, help='Timed requests per route.')
+@click.option('--json', 'as_json', is_flag=True, help='Print one JSON object per route instead of a table.')
+def main(scales, requests, as_json):
+    """Benchmark the read routes at several data volumes."""
+    header = '{:>8} {:<15} {:>9} {:>9} {:>9} {:>9} {:>10}'
+    if not as_json:
+        click.echo(header.format('shows', 'route', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms', 'peak KiB'))
+
+    with tempfile.TemporaryDirectory() as directory:
+        for shows in scales or SCALES:
+            for result in run_scale(shows, requests, directory):
+                if as_json:
+                    click.echo(json.dumps(result, sort_keys=True))
+                else:
+                    click.echo('{shows:>8} {route:<15} {p50_ms:>9.2f} {p95_ms:>9.2f} {p99_ms:>9.2f} '
+                               '{max_ms:>9.2f} {peak_kib:>10.0f}'.format(**result))
+
+
+if __name__ == '__main__':
+    main()
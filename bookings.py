@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from sqlalchemy import DDL, event
+
+import models
+from extensions import db
+
+
+# ----------------------------------------------------------------------------#
+# Double-booking detection.
+#
+# A show occupies its venue from start_time to end_time. Two shows of the
+# same venue may not overlap:
+# - on postgres an exclusion constraint over the (start_time, end_time)
+#   range rejects the second one (a gist index, btree_gist for venue_id)
+# - on sqlite a trigger runs the same check before every insert and update
+# Shows without a duration (end_time = start_time, the rows that existed
+# before durations) never conflict.
+#
+# Both the trigger and the queries below only look at the shows of the
+# venue that start less than MAX_DURATION before the range, which is a
+# range scan of ix_show_venue_id_start_time however many shows the venue
+# has had. This is why a show may not last longer than MAX_DURATION.
+# ----------------------------------------------------------------------------#
+
+MAX_DURATION = timedelta(hours=24)
+
+# widest window /api/v1/venues/<id>/availability answers for
+MAX_AVAILABILITY_WINDOW = timedelta(days=31)
+
+CONSTRAINT_NAME = 'ex_show_venue_id_time_range'
+
+# error raised by the sqlite trigger
+OVERLAP_MESSAGE = 'show overlaps another show of the venue'
+
+
+def sqlite_trigger_ddl():
+    window = "datetime(NEW.start_time, '-{} minutes')".format(int(MAX_DURATION.total_seconds() // 60))
+    overlap = ("EXISTS (SELECT 1 FROM show WHERE show.venue_id = NEW.venue_id "
+               "AND show.start_time >= {} AND show.start_time < NEW.end_time "
+               "AND show.end_time > NEW.start_time AND show.end_time > show.start_time{})")
+    return [
+        "CREATE TRIGGER IF NOT EXISTS show_no_overlap_insert BEFORE INSERT ON show "
+        "WHEN NEW.end_time > NEW.start_time AND {} "
+        "BEGIN SELECT RAISE(ABORT, '{}'); END".format(overlap.format(window, ''), OVERLAP_MESSAGE),
+        "CREATE TRIGGER IF NOT EXISTS show_no_overlap_update BEFORE UPDATE OF venue_id, start_time, end_time "
+        "ON show WHEN NEW.end_time > NEW.start_time AND {} "
+        "BEGIN SELECT RAISE(ABORT, '{}'); END".format(overlap.format(window, ' AND show.id != NEW.id'),
+                                                        OVERLAP_MESSAGE),
+    ]
+
+
+# tables built with db.create_all() (local sqlite databases, tests) get the
+# same checks the migration creates
+for _statement in sqlite_trigger_ddl():
+    event.listen(models.Show.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+event.listen(models.Show.__table__, 'after_create', DDL(
+    'CREATE EXTENSION IF NOT EXISTS btree_gist'
+).execute_if(dialect='postgresql'))
+event.listen(models.Show.__table__, 'after_create', DDL(
+    'ALTER TABLE show ADD CONSTRAINT {} EXCLUDE USING gist '
+    '(venue_id WITH =, tsrange(start_time, end_time) WITH &&) '
+    'WHERE (end_time > start_time)'.format(CONSTRAINT_NAME)
+).execute_if(dialect='postgresql'))
+
+
+# this function return the query of the shows of the venue with a duration
+# that overlap [start, end), soonest first
+def overlapping(venue_id, start, end):
+    return db.session.query(models.Show.id, models.Show.start_time, models.Show.end_time) \
+        .filter(models.Show.venue_id == venue_id,
+                models.Show.start_time > start - MAX_DURATION,
+                models.Show.start_time < end,
+                models.Show.end_time > start,
+                models.Show.end_time > models.Show.start_time) \
+        .order_by(models.Show.start_time, models.Show.id)
+
+
+# this function return True when an IntegrityError is the refusal of an
+# overlapping show (the postgres exclusion constraint or the sqlite
+# trigger), not another constraint
+def is_overlap(error):
+    diag = getattr(error.orig, 'diag', None)
+    if diag is not None:
+        return diag.constraint_name == CONSTRAINT_NAME
+    return OVERLAP_MESSAGE in str(error.orig)
+
+
+# this function return the first show the new show would overlap, or None
+def first_conflict(venue_id, start, end):
+    if end <= start:
+        return None
+    return overlapping(venue_id, start, end).first()
+
+
+# this function return the busy and free intervals of a venue between
+# start and end as two lists of (start, end, show id) / (start, end)
+def availability(venue_id, start, end):
+    busy = [(row.start_time, row.end_time, row.id) for row in overlapping(venue_id, start, end)]
+
+    free = []
+    cursor = start
+    for busy_start, busy_end, show_id in busy:
+        if busy_start > cursor:
+            free.append((cursor, busy_start))
+        cursor = max(cursor, busy_end)
+    if cursor < end:
+        free.append((cursor, end))
+    return busy, free
@@ -0,0 +1,206 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from flask import current_app
+
+
+# ----------------------------------------------------------------------------#
+# Data cache of the venue and artist detail pages.
+#
+# The cached value is the page data, not the html, so flashed messages still
+# render. Entries are keyed by entity id, dropped by the write handlers that
+# change them and expire on their own when a cached upcoming show starts.
+#
+# Every key has a generation that invalidate() changes. A page is stored
+# with the generation read before it was built and only served while that
+# generation is current, so a page built from data read before a write
+# and stored after its invalidation is never served.
+#
+# 'filesystem' pickle files in CACHE_DIR shared by every worker of the host
+# 'lru'        in-process LRU, only for a single worker process: the other
+#              workers would keep serving a page another one invalidated
+# None         caching disabled
+# ----------------------------------------------------------------------------#
+
+class LRUCache:
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (expires at, generation, value)
+        # key -> invalidations, one small int per invalidated entity that
+        # outlives the evicted entries; clear() moves the epoch instead
+        self.generations = {}
+        self.epoch = 0
+
+    def generation(self, key):
+        with self.lock:
+            return self.epoch, self.generations.get(key, 0)
+
+    def get(self, key, generation):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time() or entry[1] != generation:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, value, expires_at, generation):
+        with self.lock:
+            if generation != (self.epoch, self.generations.get(key, 0)):
+                return
+            self.entries[key] = (expires_at, generation, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.generations[key] = self.generations.get(key, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.epoch += 1
+
+
+# the generation of a key is the random token of its .generation file and
+# of the epoch file, both rewritten (never incremented) so concurrent
+# writers of several workers need no lock
+class FileSystemCache:
+
+    EPOCH = 'epoch'
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def _write(self, path, data):
+        # write to a temporary file and rename it so readers never see a
+        # partial file
+        fd, temp_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _token(self, path):
+        try:
+            with open(path, 'rb') as f:
+                return f.read().decode()
+        except OSError:
+            return ''
+
+    def generation(self, key):
+        return (self._token(os.path.join(self.directory, self.EPOCH)),
+                self._token(self._path(key) + '.generation'))
+
+    def get(self, key, generation):
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires_at, entry_generation, value = pickle.load(f)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            return None
+        if expires_at <= time.time():
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            return None
+        if entry_generation != generation:
+            return None
+        return value
+
+    def set(self, key, value, expires_at, generation):
+        self._write(self._path(key), pickle.dumps((expires_at, generation, value), pickle.HIGHEST_PROTOCOL))
+
+    # the new generation is written before the entry goes, so a page
+    # stored in between carries the old one
+    def delete(self, key):
+        self._write(self._path(key) + '.generation', uuid.uuid4().hex.encode())
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        self._write(os.path.join(self.directory, self.EPOCH), uuid.uuid4().hex.encode())
+        for name in os.listdir(self.directory):
+            if name == self.EPOCH:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+
+# this function give the app the backend chosen by CACHE_BACKEND
+def init_app(app):
+    if app.config['CACHE_BACKEND'] == 'filesystem':
+        backend = FileSystemCache(app.config['CACHE_DIR'])
+    elif app.config['CACHE_BACKEND']:
+        backend = LRUCache(app.config['CACHE_MAX_ENTRIES'])
+    else:
+        backend = None
+    app.extensions['page_cache'] = backend
+
+
+# this function return the backend of the current app, or None
+def get_backend():
+    return current_app.extensions['page_cache']
+
+
+def venue_key(venue_id):
+    return 'venue:{}'.format(int(venue_id))
+
+
+def artist_key(artist_id):
+    return 'artist:{}'.format(int(artist_id))
+
+
+# this function return the cached value of the key, or build it.
+# build() return (value, expires_at) where expires_at is a datetime after
+# which the value is stale (e.g. the first upcoming show) or None
+def get_or_build(key, build):
+    backend = get_backend()
+    if backend is not None:
+        # read before building, so an invalidation during the build makes
+        # the stored page stale
+        generation = backend.generation(key)
+        value = backend.get(key, generation)
+        if value is not None:
+            return value
+
+    value, expires_at = build()
+
+    if backend is not None:
+        deadline = time.time() + current_app.config['CACHE_DEFAULT_TIMEOUT']
+        if expires_at is not None:
+            deadline = min(deadline, expires_at.timestamp())
+        backend.set(key, value, deadline, generation)
+    return value
+
+
+# this function drop the given keys from the cache and move them to a new
+# generation
+def invalidate(*keys):
+    backend = get_backend()
+    if backend is not None:
+        for key in keys:
+            backend.delete(key)
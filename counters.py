@@ -0,0 +1,112 @@
+from collections import Counter
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, text
+
+import models
+from extensions import db
+
+
+# ----------------------------------------------------------------------------#
+# Derived show counters of venues and artists.
+#
+# upcoming_shows_count / past_shows_count are only changed by atomic
+# "SET x = x + n" updates, never by a python read-modify-write. Every show
+# remembers whether it is counted as upcoming (show.counted_upcoming) so the
+# rollover job knows which shows still have to move to the past count.
+# ----------------------------------------------------------------------------#
+
+# arbitrary key of the postgres advisory lock that serializes rollovers
+ROLLOVER_LOCK_KEY = 7301
+
+COUNTED_TABLES = (('venue', 'venue_id'), ('artist', 'artist_id'))
+
+
+# this function count a new show on its venue and artist, in the caller's
+# transaction. it return True when the show is counted as upcoming
+def record_new_show(show, now=None):
+    now = now or datetime.now()
+    upcoming = show.start_time > now
+    show.counted_upcoming = upcoming
+
+    for model, entity_id in ((models.Venue, show.venue_id), (models.Artist, show.artist_id)):
+        column = model.upcoming_shows_count if upcoming else model.past_shows_count
+        model.query.filter(model.id == entity_id) \
+            .update({column: func.coalesce(column, 0) + 1, model.updated_at: models.utcnow()},
+                    synchronize_session=False)
+
+    return upcoming
+
+
+# this function move every show that started since the last rollover from the
+# upcoming count to the past count and return how many shows moved. The
+# flags are flipped first and the counters moved by exactly the shows that
+# UPDATE ... RETURNING flipped, so a show committed meanwhile is either in
+# both or in neither
+def rollover(now=None):
+    now = now or datetime.now()
+
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': ROLLOVER_LOCK_KEY})
+
+    moved = db.session.execute(text(
+        "UPDATE show SET counted_upcoming = :no "
+        "WHERE counted_upcoming AND start_time <= :now "
+        "RETURNING {}".format(', '.join(fk for table, fk in COUNTED_TABLES))
+    ), {'now': now, 'no': False}).fetchall()
+
+    updated_at = models.utcnow()
+    for index, (table, fk) in enumerate(COUNTED_TABLES):
+        shows = Counter(row[index] for row in moved)
+        if shows:
+            db.session.execute(text(
+                "UPDATE {} SET "
+                "upcoming_shows_count = coalesce(upcoming_shows_count, 0) - :moved, "
+                "past_shows_count = coalesce(past_shows_count, 0) + :moved, "
+                "updated_at = :updated_at "
+                "WHERE id = :id".format(table)
+            ), [{'id': entity_id, 'moved': count, 'updated_at': updated_at} for entity_id, count in shows.items()])
+    db.session.commit()
+    return len(moved)
+
+
+# this function recompute every counter from the show table with one
+# set-based update per table. updated_at only moves on rows whose
+# counters actually changed
+def reconcile(now=None):
+    now = now or datetime.now()
+    params = {'now': now, 'updated_at': models.utcnow()}
+
+    for table, fk in COUNTED_TABLES:
+        upcoming = "(SELECT count(*) FROM show WHERE show.{1} = {0}.id AND show.start_time > :now)".format(table, fk)
+        past = "(SELECT count(*) FROM show WHERE show.{1} = {0}.id AND show.start_time <= :now)".format(table, fk)
+        db.session.execute(text(
+            "UPDATE {0} SET "
+            "updated_at = CASE WHEN coalesce(upcoming_shows_count, -1) = {1} "
+            "AND coalesce(past_shows_count, -1) = {2} THEN updated_at ELSE :updated_at END, "
+            "upcoming_shows_count = {1}, "
+            "past_shows_count = {2}".format(table, upcoming, past)
+        ), params)
+
+    db.session.execute(text(
+        "UPDATE show SET counted_upcoming = (start_time IS NOT NULL AND start_time > :now)"
+    ), params)
+    db.session.commit()
+
+
+@click.command('rollover-counts')
+@with_appcontext
+def rollover_counts_command():
+    """Move shows that have started from the upcoming to the past counts."""
+    moved = rollover()
+    click.echo('{} show(s) moved from upcoming to past.'.format(moved))
+
+
+@click.command('reconcile-counts')
+@with_appcontext
+def reconcile_counts_command():
+    """Recompute all show counters from the show table."""
+    reconcile()
+    click.echo('Show counters reconciled.')
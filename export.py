@@ -0,0 +1,103 @@
+import csv
+import io
+import json
+from datetime import timezone
+
+from flask import Blueprint, current_app, request, abort, stream_with_context
+
+import api
+import models
+
+
+# ----------------------------------------------------------------------------#
+# Streaming exports of the catalog.
+#
+# /export/<venues|artists|shows>.<ndjson|csv> stream every row through a
+# server-side cursor (yield_per) in a generator response, so memory does not
+# grow with the table. ?updated_since=<iso datetime, utc> limits the export
+# to the rows changed since then and ?fields= works like in the api.
+# ----------------------------------------------------------------------------#
+
+export = Blueprint('export', __name__, url_prefix='/export')
+
+# rows fetched from the cursor, and written to the response, at a time
+EXPORT_BATCH_SIZE = 1000
+
+
+# kind -> (model, export fields)
+EXPORTS = {
+    'venues': (models.Venue, dict(api.VENUE_FIELDS, updated_at=(models.Venue.updated_at, api._iso))),
+    'artists': (models.Artist, dict(api.ARTIST_FIELDS, updated_at=(models.Artist.updated_at, api._iso))),
+    'shows': (models.Show, dict(api.SHOW_FIELDS, updated_at=(models.Show.updated_at, api._iso))),
+}
+
+MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def ndjson_lines(items):
+    for item in items:
+        yield json.dumps(item, separators=(',', ':')) + '\n'
+
+
+def csv_lines(items, names):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for item in items:
+        writer.writerow([','.join(value) if isinstance(value, list) else value
+                         for value in (item[name] for name in names)])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # header of an empty export
+    yield buffer.getvalue()
+
+
+# this function join the lines into chunks of EXPORT_BATCH_SIZE rows so the
+# response is not written one small line at a time
+def chunks(lines):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= EXPORT_BATCH_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+@export.route('/<kind>.<file_format>')
+def export_rows(kind, file_format):
+    if kind not in EXPORTS or file_format not in MIMETYPES:
+        abort(404)
+    model, fields = EXPORTS[kind]
+    names = api.selected_fields(fields, fields)
+
+    updated_since = request.args.get('updated_since')
+    import dateutil.parser
+    try:
+        updated_since = dateutil.parser.isoparse(updated_since) if updated_since else None
+    except ValueError:
+        abort(400)
+    if updated_since is not None and updated_since.tzinfo is not None:
+        # updated_at columns are naive utc
+        updated_since = updated_since.astimezone(timezone.utc).replace(tzinfo=None)
+
+    query = api.projection(fields, names)
+    if kind == 'shows':
+        query = query.join(models.Venue, models.Show.venue_id == models.Venue.id) \
+            .join(models.Artist, models.Show.artist_id == models.Artist.id)
+    if updated_since is not None:
+        query = query.filter(model.updated_at >= updated_since)
+    query = query.order_by(model.id).yield_per(EXPORT_BATCH_SIZE)
+
+    items = (api.serialize(row, fields, names) for row in query)
+    lines = ndjson_lines(items) if file_format == 'ndjson' else csv_lines(items, names)
+
+    response = current_app.response_class(stream_with_context(chunks(lines)), mimetype=MIMETYPES[file_format])
+    response.headers['Content-Disposition'] = 'attachment; filename={}.{}'.format(kind, file_format)
+    return response
+
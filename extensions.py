@@ -0,0 +1,10 @@
+from flask_moment import Moment
+
+import routing
+
+# ----------------------------------------------------------------------------#
+# Extensions, bound to the app by create_app().
+# ----------------------------------------------------------------------------#
+
+db = routing.RoutingSQLAlchemy()
+moment = Moment()
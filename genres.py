@@ -0,0 +1,121 @@
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import text
+
+import models
+from extensions import db
+
+
+# ----------------------------------------------------------------------------#
+# Normalized genres of venues and artists.
+#
+# The genre / venue_genre / artist_genre tables are the source of truth for
+# genre filters and facets. The comma-joined genres column is kept as a
+# display and search copy, written together with the association rows.
+# genre.venue_count / genre.artist_count are the precomputed facet counts.
+# ----------------------------------------------------------------------------#
+
+# model -> (facet count column, association table, association fk column)
+FACETS = {
+    models.Venue: (models.Genre.venue_count, models.venue_genres, models.venue_genres.c.venue_id),
+    models.Artist: (models.Genre.artist_count, models.artist_genres, models.artist_genres.c.artist_id),
+}
+
+
+# this function return the genre names of a form value or of a stored
+# genres string, either "Jazz,Swing" or the '{Jazz,"Rock n Roll"}' array
+# literal older rows were saved as
+def parse_genres(value):
+    if not value:
+        return []
+    if not isinstance(value, str):
+        names = value
+    else:
+        names = value.strip().lstrip('{').rstrip('}').split(',')
+
+    result = []
+    for name in names:
+        name = name.strip().strip('"').strip()
+        if name and name not in result:
+            result.append(name)
+    return result
+
+
+# this function return the Genre rows of the names, creating missing ones
+def get_or_create_genres(names):
+    if not names:
+        return []
+    existing = {genre.name: genre for genre in models.Genre.query.filter(models.Genre.name.in_(names)).all()}
+    created = [name for name in names if name not in existing]
+    for name in created:
+        existing[name] = models.Genre(name=name, venue_count=0, artist_count=0)
+        db.session.add(existing[name])
+    if created:
+        db.session.flush()
+    return [existing[name] for name in names]
+
+
+# this function replace the genres of a Venue or Artist and move the facet
+# counts of the genres it gained or lost, in the caller's transaction. The
+# entity's own changes are left for the caller's commit instead of being
+# autoflushed by the lookups (one UPDATE of the row, not one per lookup)
+def set_genres(entity, value):
+    names = parse_genres(value)
+    count_column = FACETS[type(entity)][0]
+
+    with db.session.no_autoflush:
+        old_ids = {genre.id for genre in entity.genre_list}
+        new_genres = get_or_create_genres(names)
+        new_ids = {genre.id for genre in new_genres}
+
+        entity.genres = ','.join(names)
+        entity.genre_list = new_genres
+
+        for ids, delta in ((new_ids - old_ids, 1), (old_ids - new_ids, -1)):
+            if ids:
+                models.Genre.query.filter(models.Genre.id.in_(ids)) \
+                    .update({count_column: count_column + delta}, synchronize_session=False)
+
+
+# this function drop the genres of a Venue or Artist that is about to be
+# deleted, in the caller's transaction
+def clear_genres(model, entity_id):
+    count_column, table, fk = FACETS[model]
+    genre_ids = [row.genre_id for row in db.session.execute(
+        table.select().where(fk == entity_id)
+    ).fetchall()]
+    if genre_ids:
+        models.Genre.query.filter(models.Genre.id.in_(genre_ids)) \
+            .update({count_column: count_column - 1}, synchronize_session=False)
+        db.session.execute(table.delete().where(fk == entity_id))
+
+
+# this function return (name, count) of every genre used by the model
+def facet_counts(model):
+    count_column = FACETS[model][0]
+    return db.session.query(models.Genre.name, count_column) \
+        .filter(count_column > 0) \
+        .order_by(models.Genre.name) \
+        .all()
+
+
+# this function return the id of the genre name, or None
+def genre_id(name):
+    return db.session.query(models.Genre.id).filter(models.Genre.name == name).scalar()
+
+
+# this function recompute the facet counts from the association tables
+def reconcile_facets():
+    for table, column in (('venue_genre', 'venue_count'), ('artist_genre', 'artist_count')):
+        db.session.execute(text(
+            "UPDATE genre SET {1} = (SELECT count(*) FROM {0} WHERE {0}.genre_id = genre.id)".format(table, column)
+        ))
+    db.session.commit()
+
+
+@click.command('reconcile-genres')
+@with_appcontext
+def reconcile_genres_command():
+    """Recompute the per-genre facet counts."""
+    reconcile_facets()
+    click.echo('Genre facet counts reconciled.')
@@ -0,0 +1,155 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, request, session
+from sqlalchemy import func, text
+from werkzeug.http import is_resource_modified
+
+import models
+from extensions import db
+
+
+# ----------------------------------------------------------------------------#
+# HTTP validators of the read pages.
+#
+# Each page gets a Last-Modified and an ETag computed from cheap lookups
+# (max(updated_at) over the updated_at indexes) before anything is
+# rendered, so a revalidation that still matches is answered with 304
+# without building the page.
+#
+# A delete does not move max(updated_at): record_deletion() stamps the
+# table in table_deletion, in the deleting transaction, and that time
+# counts as a modification of every page listing the table.
+#
+# Pages also change without any write when an upcoming show starts, so the
+# start of the latest show that already began counts as a modification.
+# ----------------------------------------------------------------------------#
+
+# this function return a naive UTC datetime of a show start_time, which is
+# stored in local time (or as an aware timestamp on postgres)
+def _as_utc(value):
+    if value is None:
+        return None
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _latest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+# this function record a delete from the model's table in the caller's
+# transaction. Every delete of a venue, artist or show must call it
+def record_deletion(model):
+    db.session.execute(text(
+        "INSERT INTO table_deletion (table_name, deleted_at) VALUES (:table_name, :now) "
+        "ON CONFLICT (table_name) DO UPDATE SET deleted_at = excluded.deleted_at"
+    ), {'table_name': model.__tablename__, 'now': models.utcnow()})
+
+
+# this function return a scalar subquery of max(updated_at) of a model, to
+# be selected together with the other parts of a version
+def last_update(model, *filters):
+    return db.session.query(func.max(model.updated_at)).filter(*filters).label(None)
+
+
+# this function return a scalar subquery of the last delete from the
+# tables of the models (primary key lookups)
+def last_deletion(*tables):
+    return db.session.query(func.max(models.TableDeletion.deleted_at)) \
+        .filter(models.TableDeletion.table_name.in_([model.__tablename__ for model in tables])).label(None)
+
+
+# this function return a scalar subquery of the start of the latest show
+# that already began
+def last_show_start(*filters):
+    return db.session.query(func.max(models.Show.start_time)) \
+        .filter(models.Show.start_time <= datetime.now(), *filters).label(None)
+
+
+# every version below is read with a single statement
+def venues_version():
+    venue_updated, show_updated, deleted, started = db.session.query(
+        last_update(models.Venue), last_update(models.Show), last_deletion(models.Venue, models.Show),
+        last_show_start()
+    ).one()
+    return _latest(venue_updated, show_updated, deleted, _as_utc(started))
+
+
+def artists_version():
+    artist_updated, deleted = db.session.query(last_update(models.Artist), last_deletion(models.Artist)).one()
+    return _latest(artist_updated, deleted)
+
+
+def shows_version():
+    show_updated, venue_updated, artist_updated, deleted = db.session.query(
+        last_update(models.Show), last_update(models.Venue), last_update(models.Artist),
+        last_deletion(models.Show, models.Venue, models.Artist)
+    ).one()
+    return _latest(show_updated, venue_updated, artist_updated, deleted)
+
+
+# the detail pages list the shows of the entity with the name and image of
+# the other side, so those rows count too
+def venue_version(venue_id):
+    shows = db.session.query(func.max(models.Show.updated_at), func.max(models.Artist.updated_at)) \
+        .join(models.Artist, models.Show.artist_id == models.Artist.id) \
+        .filter(models.Show.venue_id == venue_id)
+    venue_updated, show_updated, artist_updated, deleted, started = db.session.query(
+        db.session.query(models.Venue.updated_at).filter(models.Venue.id == venue_id).label(None),
+        *[column.label(None) for column in shows.subquery().c],
+        last_deletion(models.Show, models.Artist),
+        last_show_start(models.Show.venue_id == venue_id)
+    ).one()
+    return _latest(venue_updated, show_updated, artist_updated, deleted, _as_utc(started))
+
+
+def artist_version(artist_id):
+    shows = db.session.query(func.max(models.Show.updated_at), func.max(models.Venue.updated_at)) \
+        .join(models.Venue, models.Show.venue_id == models.Venue.id) \
+        .filter(models.Show.artist_id == artist_id)
+    artist_updated, show_updated, venue_updated, deleted, started = db.session.query(
+        db.session.query(models.Artist.updated_at).filter(models.Artist.id == artist_id).label(None),
+        *[column.label(None) for column in shows.subquery().c],
+        last_deletion(models.Show, models.Venue),
+        last_show_start(models.Show.artist_id == artist_id)
+    ).one()
+    return _latest(artist_updated, show_updated, venue_updated, deleted, _as_utc(started))
+
+
+# this function answer 304 when the client's copy of the page is still
+# current, otherwise render it and attach the validators. last_modified is
+# the value of one of the *_version functions
+def conditional_page(last_modified, render):
+    # pages carrying flashed messages are personal: never validate them
+    if '_flashes' in session:
+        return render()
+
+    # the ETag tells apart changes within the second Last-Modified shows
+    seed = '{}|{}'.format(request.full_path, last_modified)
+    etag = hashlib.sha1(seed.encode()).hexdigest()
+    if last_modified is not None:
+        last_modified = last_modified.replace(microsecond=0)
+
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.make_response(render())
+
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'public, max-age={}'.format(current_app.config['HTTP_CACHE_MAX_AGE'])
+    return response
+
+
+# this decorator validate a view with conditional_page. version is called
+# with the view's url arguments
+def conditional(version):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            return conditional_page(version(**kwargs), lambda: view(**kwargs))
+        return wrapper
+    return decorator
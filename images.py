@@ -0,0 +1,386 @@
+import hashlib
+import http.client
+import io
+import ipaddress
+import os
+import socket
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+from flask import Blueprint, abort, current_app, redirect, request, send_file, url_for
+from werkzeug.utils import import_string
+
+import models
+from extensions import db
+
+
+# ----------------------------------------------------------------------------#
+# Image proxy and thumbnail cache.
+#
+# Pages do not hotlink the image_link of venues and artists: image_url()
+# points at /img/<kind>/<id>/<size>, which fetches the source once, scales
+# it down to one of IMAGE_SIZES (with Pillow, when it is installed; the
+# original is kept otherwise) and keeps the result in IMAGE_CACHE_DIR.
+# The directory is shared by the workers of a host and capped at
+# IMAGE_CACHE_MAX_BYTES, the least recently served files going first.
+#
+# The url carries a hash of the source link, so a cached image never has to
+# be revalidated: a new link is a new url. When the source cannot be
+# fetched the client is sent to it, and it is not tried again for
+# IMAGE_FAILURE_SECONDS.
+# ----------------------------------------------------------------------------#
+
+images = Blueprint('images', __name__)
+
+KINDS = {'venues': models.Venue, 'artists': models.Artist}
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# leading bytes of the formats served -> mimetype; anything else (html,
+# svg, ...) is never served from this origin
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+
+class ImageError(Exception):
+    pass
+
+
+def sniff(content):
+    for signature, mimetype in SIGNATURES:
+        if content.startswith(signature):
+            return mimetype
+    if content[:4] == b'RIFF' and content[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+# this function tell whether the proxy may connect to an address: only
+# public unicast ones, never loopback, private, link-local (the cloud
+# metadata service), multicast or reserved ranges
+def is_public_address(address):
+    address = ipaddress.ip_address(address)
+    if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped is not None:
+        address = address.ipv4_mapped
+    return address.is_global and not address.is_multicast
+
+
+# The links are set by anyone through the forms: the default fetcher
+# checks every address the host resolves to before connecting and the
+# address the socket connected to after, for the link and for every
+# redirect it follows, so no link reaches a host of the internal network
+def _check_host(host, port):
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)}
+    except (OSError, UnicodeError) as error:
+        raise ImageError('could not resolve {}: {}'.format(host, error))
+    refused = sorted(address for address in addresses if not is_public_address(address))
+    if refused:
+        raise ImageError('{} resolves to a non-public address {}'.format(host, refused[0]))
+
+
+def _check_peer(connection):
+    address = connection.sock.getpeername()[0]
+    if not is_public_address(address):
+        connection.close()
+        raise ImageError('{} connected to a non-public address {}'.format(connection.host, address))
+
+
+class _PublicHTTPConnection(http.client.HTTPConnection):
+
+    def connect(self):
+        _check_host(self.host, self.port)
+        super().connect()
+        _check_peer(self)
+
+
+class _PublicHTTPSConnection(http.client.HTTPSConnection):
+
+    def connect(self):
+        _check_host(self.host, self.port)
+        super().connect()
+        _check_peer(self)
+
+
+def _opener():
+    import urllib.request
+
+    class PublicHTTPHandler(urllib.request.HTTPHandler):
+        def http_open(self, req):
+            return self.do_open(_PublicHTTPConnection, req)
+
+    class PublicHTTPSHandler(urllib.request.HTTPSHandler):
+        def https_open(self, req):
+            return self.do_open(_PublicHTTPSConnection, req, context=self._context)
+
+    class RedirectHandler(urllib.request.HTTPRedirectHandler):
+        max_redirections = 3
+
+        def redirect_request(self, req, fp, code, msg, headers, newurl):
+            if urlsplit(newurl).scheme not in ('http', 'https'):
+                raise ImageError('redirect to a non http(s) url: {}'.format(newurl))
+            return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+    # only these handlers: no file:, ftp: or data: urls, and no proxy
+    # from the environment that would connect on the proxy's behalf
+    opener = urllib.request.OpenerDirector()
+    for handler in (PublicHTTPHandler(), PublicHTTPSHandler(), RedirectHandler(),
+                    urllib.request.HTTPDefaultErrorHandler(), urllib.request.HTTPErrorProcessor()):
+        opener.add_handler(handler)
+    return opener
+
+
+# this function is the default IMAGE_FETCHER: it return the bytes at an
+# http(s) url on a public address, at most max_bytes of them
+def fetch_url(url, max_bytes, timeout):
+    import urllib.request
+
+    if urlsplit(url).scheme not in ('http', 'https'):
+        raise ImageError('not an http(s) url: {}'.format(url))
+    fetch_request = urllib.request.Request(url, headers={'User-Agent': 'fyyur-image-proxy'})
+    try:
+        with _opener().open(fetch_request, timeout=timeout) as response:
+            content = response.read(max_bytes + 1)
+    except (OSError, ValueError, http.client.HTTPException) as error:
+        raise ImageError('could not fetch {}: {}'.format(url, error))
+    if len(content) > max_bytes:
+        raise ImageError('{} is larger than {} bytes'.format(url, max_bytes))
+    return content
+
+
+# this function tell whether the host of a link is in IMAGE_ALLOWED_HOSTS
+# (a name, or a .domain for all of its subdomains); any host is when the
+# setting is empty
+def allowed_host(link):
+    allowed = current_app.config['IMAGE_ALLOWED_HOSTS']
+    if not allowed:
+        return True
+    host = (urlsplit(link).hostname or '').lower()
+    return any(host == name.lower() or (name.startswith('.') and host.endswith(name.lower()))
+               for name in allowed)
+
+
+def get_fetcher():
+    fetcher = current_app.config['IMAGE_FETCHER']
+    return import_string(fetcher) if isinstance(fetcher, str) else fetcher
+
+
+# this function scale an image down to fit a box x box square, as a jpeg
+# (or png when it has transparency). Without Pillow the original is kept
+def resize(content, box):
+    try:
+        from PIL import Image
+    except ImportError:
+        return content
+
+    try:
+        image = Image.open(io.BytesIO(content))
+        image.thumbnail((box, box))
+        output = io.BytesIO()
+        if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+            image.save(output, 'PNG', optimize=True)
+        else:
+            image.convert('RGB').save(output, 'JPEG', quality=85, optimize=True, progressive=True)
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        raise ImageError('could not resize the image: {}'.format(error))
+    return output.getvalue()
+
+
+# Files of the cache directory, evicted least recently served first. Serving
+# a file touches its mtime, so the order holds across the workers sharing
+# the directory; the size each worker keeps is an estimate that is
+# corrected by a scan of the directory whenever it goes over the cap.
+class DiskLRU:
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(size for path, mtime, size in self._files())
+
+    def _files(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            if entry.is_file() and not entry.name.startswith('.'):
+                files.append((entry.path, stat.st_mtime, stat.st_size))
+        return files
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    # this function open a cached file and mark it as used, or return None.
+    # The open file stays readable when another worker evicts it meanwhile
+    def open(self, name):
+        path = self.path(name)
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return f
+
+    def put(self, name, content):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(temp_path, self.path(name))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        with self.lock:
+            self.size += len(content)
+            if self.size > self.max_bytes:
+                self._evict()
+        return self.path(name)
+
+    # this function remove the oldest files until the directory is back
+    # under 90% of the cap, so that evictions come in batches
+    def _evict(self):
+        files = sorted(self._files(), key=lambda file: file[1])
+        self.size = sum(size for path, mtime, size in files)
+        for path, mtime, size in files:
+            if self.size <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
+
+
+# the proxy state of one app: its cache directory, opened on first use,
+# the fetches in progress and the sources that failed recently
+class ProxyState:
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._store = None
+        self.lock = threading.Lock()
+        # cache file name -> lock held while one thread fetches it
+        self.pending = {}
+        # source url -> time before which it is not fetched again
+        self.failures = {}
+
+    def store(self):
+        if self._store is None:
+            with self.lock:
+                if self._store is None:
+                    self._store = DiskLRU(self.directory, self.max_bytes)
+        return self._store
+
+    def failed_recently(self, link):
+        with self.lock:
+            return self.failures.get(link, 0) > time.time()
+
+    def record_failure(self, link, seconds):
+        now = time.time()
+        with self.lock:
+            for url in [url for url, until in self.failures.items() if until <= now]:
+                del self.failures[url]
+            self.failures[link] = now + seconds
+
+
+def init_app(app):
+    app.extensions['image_proxy'] = ProxyState(app.config['IMAGE_CACHE_DIR'], app.config['IMAGE_CACHE_MAX_BYTES'])
+
+
+def link_version(link):
+    return hashlib.sha1(link.encode('utf-8')).hexdigest()[:12]
+
+
+# this function return the cached image opened for reading, fetching and
+# resizing it when this is the first request for it. Concurrent requests
+# of the same image wait for a single fetch
+def cached_image(name, link, box):
+    state = current_app.extensions['image_proxy']
+    store = state.store()
+    f = store.open(name)
+    if f is not None:
+        return f
+
+    with state.lock:
+        lock = state.pending.setdefault(name, threading.Lock())
+    with lock:
+        try:
+            f = store.open(name)
+            if f is not None:
+                return f
+            if state.failed_recently(link):
+                raise ImageError('{} failed recently'.format(link))
+            if not allowed_host(link):
+                raise ImageError('{} is not in IMAGE_ALLOWED_HOSTS'.format(link))
+
+            config = current_app.config
+            try:
+                content = get_fetcher()(link, config['IMAGE_MAX_SOURCE_BYTES'], config['IMAGE_FETCH_TIMEOUT'])
+                if sniff(content) is None:
+                    raise ImageError('{} is not a jpeg, png, gif or webp image'.format(link))
+                content = resize(content, box)
+            except ImageError:
+                state.record_failure(link, config['IMAGE_FAILURE_SECONDS'])
+                raise
+            store.put(name, content)
+            # the put may have evicted it right away to make room
+            return store.open(name) or io.BytesIO(content)
+        finally:
+            with state.lock:
+                state.pending.pop(name, None)
+
+
+# this function return the url of an image of a venue or artist at one of
+# IMAGE_SIZES, or the link itself when the proxy is off
+@images.app_template_global()
+def image_url(kind, entity_id, link, size='md'):
+    if not link or not current_app.config['IMAGE_PROXY_ENABLED']:
+        return link
+    return url_for('images.image', kind=kind, entity_id=entity_id, size=size, v=link_version(link))
+
+
+@images.route('/img/<kind>/<int:entity_id>/<size>')
+def image(kind, entity_id, size):
+    model = KINDS.get(kind)
+    box = current_app.config['IMAGE_SIZES'].get(size)
+    if model is None or box is None:
+        abort(404)
+    link = db.session.query(model.image_link).filter(model.id == entity_id).scalar()
+    if not link:
+        abort(404)
+
+    version = link_version(link)
+    try:
+        name = '{}-{}-{}-{}'.format(kind, entity_id, size, version)
+        f = cached_image(name, link, box)
+    except ImageError as error:
+        current_app.logger.warning('image proxy: %s', error)
+        response = redirect(link)
+        response.headers['Cache-Control'] = 'public, max-age={}'.format(current_app.config['IMAGE_FAILURE_SECONDS'])
+        return response
+
+    mimetype = sniff(f.read(12))
+    f.seek(0)
+    # the name holds the link version and size, so it identifies the bytes
+    response = send_file(f, mimetype=mimetype, conditional=True, etag=name)
+    # only the url of the current link is immutable, an outdated ?v= may
+    # get a new image as soon as the link changes again
+    if request.args.get('v') == version:
+        response.headers['Cache-Control'] = IMMUTABLE
+    else:
+        response.headers['Cache-Control'] = 'public, max-age=3600'
+    return response
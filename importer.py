@@ -0,0 +1,297 @@
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import click
+import dateutil.parser
+from flask.cli import with_appcontext
+from sqlalchemy import text
+
+import bookings
+import cache
+import counters
+import genres
+import models
+from extensions import db
+
+
+# ----------------------------------------------------------------------------#
+# Bulk import of venues, artists and shows.
+#
+# `flask import KIND FILE` streams a CSV or JSONL file and writes it in
+# batches: one executemany INSERT per batch, or COPY FROM STDIN on postgres.
+# Show rows may reference their venue and artist by id or by name, names
+# are resolved with one query per batch, and may give their end_time or
+# duration in minutes (see bookings.py: a show that overlaps another show
+# of its venue fails the import). The genre links of every batch are
+# inserted with it, by the ids the insert returned; facet counts and show
+# counters are recomputed once at the end and the whole file is imported in
+# one transaction.
+# ----------------------------------------------------------------------------#
+
+BATCH_SIZE = 1000
+
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y', 'on'}
+
+# kind -> (model, importable columns, boolean columns)
+KINDS = {
+    'venues': (models.Venue, ('name', 'genres', 'address', 'city', 'state', 'phone', 'website_link',
+                              'facebook_link', 'seeking_talent', 'seeking_description', 'image_link'),
+               ('seeking_talent',)),
+    'artists': (models.Artist, ('name', 'genres', 'city', 'state', 'phone', 'website_link',
+                                'facebook_link', 'seeking_venue', 'seeking_description', 'image_link'),
+                ('seeking_venue',)),
+    'shows': (models.Show, ('venue_id', 'artist_id', 'start_time', 'end_time', 'duration'), ()),
+}
+
+
+# this function yield the records of a csv or jsonl file as dicts
+def read_records(stream, file_format):
+    if file_format == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _boolean(value):
+    if isinstance(value, bool) or value is None:
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+# this function return the value of a column of a record: None when it is
+# missing or an empty string, the value itself otherwise (false and 0 too)
+def _value(record, column):
+    value = record.get(column)
+    if isinstance(value, str) and not value.strip():
+        return None
+    return value
+
+
+# this function return the insert row of a venue or artist record
+def entity_row(record, columns, booleans, now):
+    row = {column: _value(record, column) for column in columns}
+    if not row['name']:
+        raise ValueError('missing name')
+    for column in booleans:
+        row[column] = _boolean(row[column])
+    row['genres'] = ','.join(genres.parse_genres(row['genres']))
+    row['upcoming_shows_count'] = 0
+    row['past_shows_count'] = 0
+    row['updated_at'] = now
+    return row
+
+
+# this function return the venue or artist reference of a show record:
+# the int of <name>_id when given, else the <name>_name string
+def _reference(record, name):
+    value = record.get(name + '_id')
+    if value in (None, ''):
+        return record.get(name + '_name') or None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# this function look up the references of a batch that are not in known
+# yet, with one query for the ids and one for the names. known map an id
+# or a name to the entity id
+def resolve(model, references, known):
+    ids = {reference for reference in references if isinstance(reference, int) and reference not in known}
+    names = {reference for reference in references if isinstance(reference, str) and reference not in known}
+    if ids:
+        for (entity_id,) in db.session.query(model.id).filter(model.id.in_(ids)):
+            known[entity_id] = entity_id
+    if names:
+        for entity_id, name in db.session.query(model.id, model.name).filter(model.name.in_(names)):
+            known.setdefault(name, entity_id)
+
+
+# this function return the insert rows of a batch of show records, and the
+# number of records that were skipped (unknown venue or artist, bad time)
+def show_rows(records, venues, artists, now):
+    references = [(_reference(record, 'venue'), _reference(record, 'artist')) for record in records]
+    resolve(models.Venue, [venue for venue, artist in references], venues)
+    resolve(models.Artist, [artist for venue, artist in references], artists)
+
+    rows = []
+    skipped = 0
+    for record, (venue, artist) in zip(records, references):
+        try:
+            start_time = _datetime(record.get('start_time'))
+            rows.append({
+                'venue_id': venues[venue],
+                'artist_id': artists[artist],
+                'start_time': start_time,
+                'end_time': end_time(record, start_time),
+                'counted_upcoming': False,
+                'updated_at': now,
+            })
+        except (KeyError, TypeError, ValueError, OverflowError):
+            skipped += 1
+    return rows, skipped
+
+
+def _datetime(value):
+    return value if isinstance(value, datetime) else dateutil.parser.parse(value)
+
+
+# this function return the end of a show record from its end_time or its
+# duration in minutes. Without either the duration is unknown: the show
+# ends when it starts and never conflicts with another
+def end_time(record, start_time):
+    if record.get('end_time'):
+        end = _datetime(record['end_time'])
+    elif record.get('duration'):
+        end = start_time + timedelta(minutes=float(record['duration']))
+    else:
+        return start_time
+    if not timedelta(0) <= end - start_time <= bookings.MAX_DURATION:
+        raise ValueError('invalid show duration')
+    return end
+
+
+# this function insert one batch of rows into the table and return their
+# ids, in the order of the rows
+def insert_rows(table, rows):
+    if not rows:
+        return []
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql' and connection.dialect.driver == 'psycopg2':
+        return copy_rows(connection, table, rows)
+    result = connection.execute(table.insert().returning(table.c.id, sort_by_parameter_order=True), rows)
+    return [row[0] for row in result]
+
+
+# this function send the rows with COPY FROM STDIN, the fastest way into
+# postgres. COPY has no RETURNING: the ids are taken from the table's
+# sequence first and copied with the rows
+def copy_rows(connection, table, rows):
+    ids = [row[0] for row in connection.execute(text(
+        "SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"
+    ), {'table': table.name, 'count': len(rows)})]
+    rows = [dict(row, id=row_id) for row, row_id in zip(rows, ids)]
+
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['\\N' if row[column] is None else row[column] for column in columns])
+    buffer.seek(0)
+
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            "COPY {} ({}) FROM STDIN WITH (FORMAT csv, NULL '\\N')".format(table.name, ', '.join(columns)),
+            buffer
+        )
+    finally:
+        cursor.close()
+    return ids
+
+
+# this function create the genre links of a batch of imported entities,
+# given as (id, row), with one insert. genre_ids map the genre names seen
+# so far to their id
+def link_genres(model, entities, genre_ids):
+    table, fk = genres.FACETS[model][1:]
+    entities = [(entity_id, genres.parse_genres(row['genres'])) for entity_id, row in entities]
+
+    names = list(dict.fromkeys(name for entity_id, names in entities for name in names
+                               if name not in genre_ids))
+    genre_ids.update((genre.name, genre.id) for genre in genres.get_or_create_genres(names))
+
+    links = [{fk.name: entity_id, 'genre_id': genre_ids[name]}
+             for entity_id, names in entities for name in names]
+    if links:
+        db.session.execute(table.insert(), links)
+
+
+# this function import a file of the kind and return (imported, skipped)
+def import_file(kind, stream, file_format, batch_size=BATCH_SIZE):
+    return import_records(kind, read_records(stream, file_format), batch_size)
+
+
+# this function import an iterable of records of the kind, see import_file
+def import_records(kind, records, batch_size=BATCH_SIZE):
+    model, columns, booleans = KINDS[kind]
+    table = model.__table__
+    now = models.utcnow()
+
+    venues = {}
+    artists = {}
+    genre_ids = {}
+    imported = skipped = 0
+    batch = []
+
+    def flush(records):
+        if kind == 'shows':
+            rows, batch_skipped = show_rows(records, venues, artists, now)
+        else:
+            rows, batch_skipped = [], 0
+            for record in records:
+                try:
+                    rows.append(entity_row(record, columns, booleans, now))
+                except ValueError:
+                    batch_skipped += 1
+        ids = insert_rows(table, rows)
+        if kind != 'shows':
+            # only the rows of this import, not the ones the web app
+            # inserts meanwhile
+            link_genres(model, zip(ids, rows), genre_ids)
+        return len(rows), batch_skipped
+
+    try:
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                counts = flush(batch)
+                imported, skipped = imported + counts[0], skipped + counts[1]
+                batch = []
+        if batch:
+            counts = flush(batch)
+            imported, skipped = imported + counts[0], skipped + counts[1]
+
+        if kind == 'shows':
+            # counters.reconcile() commits the import
+            counters.reconcile()
+        else:
+            # genres.reconcile_facets() commits the import
+            genres.reconcile_facets()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    backend = cache.get_backend()
+    if backend is not None:
+        backend.clear()
+    return imported, skipped
+
+
+@click.command('import')
+@with_appcontext
+@click.argument('kind', type=click.Choice(sorted(KINDS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl']),
+              help='File format, guessed from the extension by default.')
+@click.option('--batch-size', default=BATCH_SIZE, show_default=True, help='Rows per INSERT / COPY.')
+def import_command(kind, path, file_format, batch_size):
+    """Bulk import venues, artists or shows from a CSV or JSONL file."""
+    if file_format is None:
+        file_format = 'csv' if os.path.splitext(path)[1].lower() == '.csv' else 'jsonl'
+
+    started = time.perf_counter()
+    with open(path, newline='', encoding='utf-8') as stream:
+        imported, skipped = import_file(kind, stream, file_format, batch_size)
+    elapsed = time.perf_counter() - started
+
+    click.echo('{} {} imported, {} skipped in {:.2f}s ({:.0f} rows/s).'.format(
+        imported, kind, skipped, elapsed, imported / elapsed if elapsed else 0))
+    if kind != 'shows':
+        click.echo('The web workers add them to their search indexes within SEARCH_INDEX_REFRESH_SECONDS.')
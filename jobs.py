@@ -0,0 +1,265 @@
+import json
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+import counters
+import genres
+import models
+from extensions import db
+
+
+# ----------------------------------------------------------------------------#
+# Background jobs.
+#
+# enqueue() adds a row to the job table in the caller's transaction, so the
+# job exists only if the request that asked for it commits. `flask worker`
+# runs them on a pool of threads:
+# - a job is claimed with SELECT ... FOR UPDATE SKIP LOCKED on postgres, so
+#   workers never wait on each other's rows; other databases (sqlite) claim
+#   with a compare-and-set UPDATE on the status instead
+# - a job that raises is retried with exponential backoff and jitter until
+#   it has run max_attempts times, then kept as failed
+# - a job still running after JOB_LEASE_SECONDS (its worker died) is put
+#   back in the queue. Every claim increments attempts, which fences the
+#   outcome: a run that outlived its lease records nothing once the job
+#   has been claimed again, so it never deletes the next worker's claim
+# Tasks are plain functions registered with @task, called with the
+# payload as keyword arguments inside an app context.
+# ----------------------------------------------------------------------------#
+
+QUEUED = 'queued'
+RUNNING = 'running'
+FAILED = 'failed'
+
+# compare-and-set claims lost to another worker before giving up a poll
+CLAIM_RETRIES = 5
+
+TASKS = {}
+
+
+# this decorator register a function as a task, under its name by default
+def task(name=None):
+    def decorator(function):
+        TASKS[name or function.__name__] = function
+        return function
+    return decorator
+
+
+# this function queue a task in the caller's transaction; it runs once the
+# transaction commits and delay seconds have passed
+def enqueue(name, payload=None, delay=0, max_attempts=None):
+    if name not in TASKS:
+        raise KeyError('unknown task {!r}'.format(name))
+    job = models.Job(
+        name=name,
+        payload=json.dumps(payload or {}),
+        status=QUEUED,
+        attempts=0,
+        max_attempts=max_attempts or current_app.config['JOB_MAX_ATTEMPTS'],
+        run_at=models.utcnow() + timedelta(seconds=delay),
+    )
+    db.session.add(job)
+    return job
+
+
+# this function return the seconds to wait before the next attempt
+def backoff(attempts):
+    delay = min(current_app.config['JOB_BACKOFF_SECONDS'] * 2 ** (attempts - 1),
+                current_app.config['JOB_BACKOFF_MAX_SECONDS'])
+    return delay * random.uniform(0.5, 1.0)
+
+
+# this function mark the next due job as running for the worker and return
+# (id, name, payload, attempts, max_attempts), or None when nothing is due
+def claim(worker):
+    now = models.utcnow()
+    due = db.session.query(models.Job.id) \
+        .filter(models.Job.status == QUEUED, models.Job.run_at <= now) \
+        .order_by(models.Job.run_at, models.Job.id)
+    running = {models.Job.status: RUNNING, models.Job.locked_at: now, models.Job.locked_by: worker,
+               models.Job.attempts: models.Job.attempts + 1}
+
+    for _ in range(CLAIM_RETRIES):
+        if db.engine.dialect.name == 'postgresql':
+            job_id = due.with_for_update(skip_locked=True).limit(1).scalar()
+        else:
+            job_id = due.limit(1).scalar()
+        if job_id is None:
+            db.session.rollback()
+            return None
+
+        claimed = models.Job.query.filter(models.Job.id == job_id, models.Job.status == QUEUED) \
+            .update(running, synchronize_session=False)
+        if claimed:
+            job = db.session.query(models.Job.id, models.Job.name, models.Job.payload,
+                                   models.Job.attempts, models.Job.max_attempts) \
+                .filter(models.Job.id == job_id).one()
+            db.session.commit()
+            return job
+        # another worker took it between the two statements
+        db.session.rollback()
+    return None
+
+
+# this function return a query of the job row while it is still the one
+# the claim returned, i.e. no other worker claimed it since
+def _claimed(job):
+    return models.Job.query.filter(models.Job.id == job.id, models.Job.attempts == job.attempts)
+
+
+def _lost_lease(job):
+    current_app.logger.warning('job %s %s outlived its lease (attempt %s) and was claimed again, '
+                               'its outcome is not recorded', job.id, job.name, job.attempts)
+
+
+# this function run a claimed job and record its outcome; it return True
+# when the job succeeded
+def run(job):
+    started = time.perf_counter()
+    try:
+        TASKS[job.name](**json.loads(job.payload))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        error = traceback.format_exc()
+        values = {models.Job.last_error: error, models.Job.locked_at: None, models.Job.locked_by: None}
+        if job.attempts < job.max_attempts:
+            delay = backoff(job.attempts)
+            values.update({models.Job.status: QUEUED,
+                           models.Job.run_at: models.utcnow() + timedelta(seconds=delay)})
+            current_app.logger.warning('job %s %s failed (attempt %s of %s), retrying in %.0fs',
+                                       job.id, job.name, job.attempts, job.max_attempts, delay)
+        else:
+            values[models.Job.status] = FAILED
+            current_app.logger.error('job %s %s failed after %s attempts:\n%s',
+                                     job.id, job.name, job.attempts, error)
+        if not _claimed(job).update(values, synchronize_session=False):
+            _lost_lease(job)
+        db.session.commit()
+        return False
+
+    if not _claimed(job).delete(synchronize_session=False):
+        _lost_lease(job)
+    db.session.commit()
+    current_app.logger.info('job %s %s done in %.3fs', job.id, job.name, time.perf_counter() - started)
+    return True
+
+
+# this function put the jobs whose worker stopped answering back in the
+# queue and return how many
+def requeue_stale():
+    deadline = models.utcnow() - timedelta(seconds=current_app.config['JOB_LEASE_SECONDS'])
+    count = models.Job.query.filter(models.Job.status == RUNNING, models.Job.locked_at < deadline) \
+        .update({models.Job.status: QUEUED, models.Job.locked_at: None, models.Job.locked_by: None},
+                synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+# this function claim and run jobs until stop is set, or until the queue is
+# empty in burst mode. every job gets its own app context (and session)
+def work(app, worker, stop, burst=False):
+    while not stop.is_set():
+        with app.app_context():
+            try:
+                job = claim(worker)
+                if job is not None:
+                    run(job)
+            except Exception:
+                app.logger.exception('worker %s could not claim or record a job', worker)
+                job = None
+        if job is None:
+            if burst:
+                return
+            stop.wait(app.config['JOB_POLL_INTERVAL'])
+
+
+#  Tasks ----------------------------------------------------------------
+
+@task()
+def rollover_counts():
+    counters.rollover()
+
+
+@task()
+def reconcile_counts():
+    counters.reconcile()
+
+
+@task()
+def reconcile_genres():
+    genres.reconcile_facets()
+
+
+# this task render venue and artist pages so the shared (filesystem) page
+# cache holds them before a visitor asks
+@task()
+def warm_pages(venues=(), artists=()):
+    client = current_app.test_client()
+    for url in ['/venues/{}'.format(venue_id) for venue_id in venues] + \
+               ['/artists/{}'.format(artist_id) for artist_id in artists]:
+        client.get(url)
+
+
+#  Commands ----------------------------------------------------------------
+
+@click.command('worker')
+@with_appcontext
+@click.option('--threads', type=int, help='Jobs run at the same time. [default: JOB_WORKER_THREADS]')
+@click.option('--burst', is_flag=True, help='Exit once the queue is empty.')
+def worker_command(threads, burst):
+    """Run the queued background jobs."""
+    app = current_app._get_current_object()
+    threads = threads or app.config['JOB_WORKER_THREADS']
+    name = '{}:{}'.format(socket.gethostname(), os.getpid())
+    stop = threading.Event()
+
+    def shutdown(signum, frame):
+        click.echo('Stopping after the running jobs...')
+        stop.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    requeue_stale()
+    db.session.remove()
+    pool = [threading.Thread(target=work, args=(app, '{}:{}'.format(name, number), stop, burst))
+            for number in range(threads)]
+    for thread in pool:
+        thread.start()
+    click.echo('Worker {} running {} thread(s).'.format(name, threads))
+
+    # the main thread only looks for jobs of dead workers
+    interval = min(app.config['JOB_LEASE_SECONDS'] / 2, 60)
+    next_check = time.monotonic() + interval
+    while True:
+        alive = [thread for thread in pool if thread.is_alive()]
+        if not alive:
+            break
+        alive[0].join(1.0)
+        if not stop.is_set() and time.monotonic() >= next_check:
+            with app.app_context():
+                requeue_stale()
+            next_check = time.monotonic() + interval
+
+
+@click.command('enqueue')
+@with_appcontext
+@click.argument('name', type=click.Choice(sorted(TASKS)))
+@click.option('--payload', default='{}', help='JSON object of the task arguments.')
+@click.option('--delay', default=0, show_default=True, help='Seconds before the job may run.')
+def enqueue_command(name, payload, delay):
+    """Queue a background job, e.g. from cron."""
+    job = enqueue(name, json.loads(payload), delay=delay)
+    db.session.commit()
+    click.echo('Queued job {} {}.'.format(job.id, name))
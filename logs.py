@@ -0,0 +1,192 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import current_app, g, request, has_app_context, has_request_context
+from flask.logging import default_handler
+
+
+# ----------------------------------------------------------------------------#
+# Structured, non-blocking logging.
+#
+# Request threads only put records on a bounded in-memory queue; a single
+# listener thread formats them as JSON lines and writes them to a size
+# rotated file. When the disk falls behind and the queue is full, records
+# below WARNING are dropped (and counted) instead of blocking the request,
+# a WARNING or worse takes the place of the oldest queued record.
+#
+# Every request gets an id (the X-Request-ID header when the client or the
+# proxy sent one) that is added to its log records and response, and one
+# access record with its route, status, latency and SQL statement count.
+# ----------------------------------------------------------------------------#
+
+# request context fields written when a record has them
+FIELDS = ('request_id', 'method', 'path', 'route', 'status', 'latency_ms', 'sql_count', 'db_ms', 'dropped')
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+MAX_REQUEST_ID_LENGTH = 64
+
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'where': '{}:{}'.format(record.pathname, record.lineno),
+        }
+        for field in FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+# this filter copy the request context on the record while it is still on
+# the request thread, the listener thread has no request context
+class RequestContextFilter(logging.Filter):
+
+    def filter(self, record):
+        if has_request_context():
+            if getattr(record, 'request_id', None) is None:
+                record.request_id = g.get('request_id')
+            if getattr(record, 'route', None) is None:
+                record.route = request.endpoint
+        return True
+
+
+class BoundedQueueHandler(QueueHandler):
+
+    def __init__(self, maxsize):
+        super().__init__(queue.Queue(maxsize))
+        # dropped records, and how many of them a record already reported;
+        # both only change under the lock
+        self.dropped = 0
+        self.reported = 0
+        self.counter_lock = threading.Lock()
+
+    # records are formatted by the listener: only merge the arguments and
+    # render the traceback here, while they still refer to live objects
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    # the record that gets through tells how many were lost before it. The
+    # count is attached before the record is queued (the listener may
+    # write it right away) and taken back if the record is dropped too
+    def enqueue(self, record):
+        with self.counter_lock:
+            record.dropped = (self.dropped - self.reported) or None
+            self.reported = self.dropped
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                pass
+            if record.levelno >= logging.WARNING:
+                try:
+                    evicted = self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+                else:
+                    self.dropped += 1
+                    # the count the evicted record carried moves to this one
+                    record.dropped = ((record.dropped or 0) + (getattr(evicted, 'dropped', None) or 0)) or None
+                    # only this handler puts records: the freed slot is ours
+                    self.queue.put_nowait(record)
+                    return
+            self.reported -= record.dropped or 0
+            self.dropped += 1
+
+
+# records logged in the context of another app (the apps of a process
+# share their logger) are left to that app's handler
+class AppFilter(logging.Filter):
+
+    def __init__(self, app):
+        super().__init__()
+        self.app = app
+
+    def filter(self, record):
+        return not has_app_context() or current_app._get_current_object() is self.app
+
+
+# this function stop the log pipeline of the app, writing what is queued
+def stop(app):
+    handler, listener = app.extensions.pop('logs', (None, None))
+    if handler is None:
+        return
+    app.logger.removeHandler(handler)
+    listener.stop()
+    for file_handler in listener.handlers:
+        file_handler.close()
+
+
+def start_request():
+    header = request.headers.get(REQUEST_ID_HEADER, '')
+    g.request_id = header if 0 < len(header) <= MAX_REQUEST_ID_LENGTH else uuid.uuid4().hex
+    g._log_started = time.perf_counter()
+
+
+# this function write the access record of the request. It runs before
+# metrics.finish_request (after_request functions run in reverse order of
+# registration) and reads the SQL statements metrics counted, if enabled
+def finish_request(response):
+    response.headers[REQUEST_ID_HEADER] = g.request_id
+    if current_app.config['LOG_REQUESTS']:
+        extra = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'latency_ms': round((time.perf_counter() - g._log_started) * 1000, 3),
+        }
+        state = g.get('_metrics')
+        if state is not None:
+            extra['sql_count'] = state[1]
+            extra['db_ms'] = round(state[2] * 1000, 3)
+        current_app.logger.info('%s %s %s', request.method, request.path, response.status_code, extra=extra)
+    return response
+
+
+# this function send the records of the app logger through the queue to
+# the rotated JSON log file of the app, until it stops or the process exits
+def init_app(app):
+    logger = app.logger
+    # flask's stderr handler would write on the request thread
+    logger.removeHandler(default_handler)
+
+    file_handler = RotatingFileHandler(app.config['LOG_FILE'], maxBytes=app.config['LOG_MAX_BYTES'],
+                                       backupCount=app.config['LOG_BACKUP_COUNT'], encoding='utf-8', delay=True)
+    file_handler.setFormatter(JsonFormatter())
+
+    handler = BoundedQueueHandler(app.config['LOG_QUEUE_SIZE'])
+    handler.addFilter(AppFilter(app))
+    handler.addFilter(RequestContextFilter())
+    listener = QueueListener(handler.queue, file_handler)
+    listener.start()
+    app.extensions['logs'] = handler, listener
+    atexit.register(stop, app)
+
+    logger.addHandler(handler)
+    logger.setLevel(app.config['LOG_LEVEL'])
+
+    app.before_request(start_request)
+    app.after_request(finish_request)
@@ -0,0 +1,94 @@
+import json
+from functools import lru_cache
+
+from flask import Blueprint, current_app, render_template, request
+
+import search
+
+# ----------------------------------------------------------------------------#
+# Home page, autocomplete, error pages and template filters.
+#
+# babel and dateutil are imported by the datetime filter on first use.
+# ----------------------------------------------------------------------------#
+
+bp = Blueprint('main', __name__)
+
+
+# ----------------------------------------------------------------------------#
+# Filters.
+# ----------------------------------------------------------------------------#
+
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=None)
+def datetime_locale():
+    import babel
+    import babel.dates
+    return babel.Locale.parse(babel.dates.LC_TIME or 'en_US_POSIX')
+
+
+# babel patterns are compiled once per format
+@lru_cache(maxsize=None)
+def datetime_pattern(format):
+    import babel.dates
+    return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+
+
+# the same show times are rendered over and over (listings, detail pages)
+@lru_cache(maxsize=4096)
+def _format_datetime(value, format):
+    return datetime_pattern(format).apply(value, datetime_locale())
+
+
+# this filter take a datetime (or, for old callers, a date string) and
+# format it without re-parsing it; a show without a start time renders
+# an empty string
+@bp.app_template_filter('datetime')
+def format_datetime(value, format='medium'):
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        import dateutil.parser
+        value = dateutil.parser.parse(value)
+    return _format_datetime(value, format)
+
+
+# ----------------------------------------------------------------------------#
+# Controllers.
+# ----------------------------------------------------------------------------#
+
+@bp.route('/')
+def index():
+    return render_template('pages/home.html')
+
+
+#  Autocomplete ----------------------------------------------------------------
+
+@bp.route('/api/autocomplete')
+def autocomplete():
+    # top matching venue and artist names for the typed prefix
+    prefix = request.args.get('q', '')
+    kind = request.args.get('type')
+    if kind not in ('venue', 'artist'):
+        kind = None
+    limit = min(max(request.args.get('limit', 10, type=int), 1), current_app.config['AUTOCOMPLETE_MAX_RESULTS'])
+
+    results = [{"type": entry_kind, "id": doc_id, "name": name}
+               for entry_kind, doc_id, name in search.get_prefix_index().complete(prefix, limit, kind)]
+
+    return current_app.response_class(json.dumps(results, separators=(',', ':')),
+                                      mimetype='application/json')
+
+
+@bp.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+
+@bp.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500
@@ -0,0 +1,283 @@
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Blueprint, current_app, g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# ----------------------------------------------------------------------------#
+# Request metrics in the Prometheus text format.
+#
+# Every request records its latency, number of SQL statements, time spent
+# in the database and response size under its endpoint. The numbers are
+# kept per process in one registry whose lock is taken once per request,
+# and are served at /metrics.
+#
+# Under several worker processes (gunicorn) a scrape reaches one of them,
+# so with METRICS_DIR set every worker writes its numbers to <pid>.json in
+# that directory every METRICS_WRITE_SECONDS and /metrics adds up the files
+# of all the workers of the host. Like PROMETHEUS_MULTIPROC_DIR, the
+# directory must be emptied before the server starts; the files of workers
+# that exited stay, so the totals never go down.
+#
+# Overhead budget: under 50 microseconds per request plus 15 per SQL
+# statement. Measured: within noise (+-10us) on a ~500us request, and
+# about 10us per statement, most of it SQLAlchemy's event dispatch.
+# ----------------------------------------------------------------------------#
+
+metrics = Blueprint('metrics', __name__)
+
+# upper bounds of the histogram buckets, +Inf is implicit
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# endpoint label of requests that matched no route
+UNMATCHED = '<unmatched>'
+
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = ['{}="{}"'.format(name, _label_value(value)) for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series = {}  # label values -> value
+
+    def inc(self, values, amount=1):
+        self.series[values] = self.series.get(values, 0) + amount
+
+    def merge(self, values, value):
+        self.inc(values, value)
+
+    def render(self):
+        lines = ['# HELP {} {}'.format(self.name, self.help), '# TYPE {} counter'.format(self.name)]
+        for values, value in sorted(self.series.items()):
+            lines.append('{}{} {}'.format(self.name, _labels(self.labels, values), value))
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}  # label values -> [per bucket counts (last is +Inf), sum]
+
+    def observe(self, values, value):
+        series = self.series.get(values)
+        if series is None:
+            series = self.series[values] = [0] * (len(self.buckets) + 1) + [0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def merge(self, values, other):
+        series = self.series.get(values)
+        if series is None:
+            self.series[values] = list(other)
+        else:
+            self.series[values] = [mine + theirs for mine, theirs in zip(series, other)]
+
+    def render(self):
+        lines = ['# HELP {} {}'.format(self.name, self.help), '# TYPE {} histogram'.format(self.name)]
+        for values, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                le = 'le="{}"'.format(bound)
+                lines.append('{}_bucket{} {}'.format(self.name, _labels(self.labels, values, le), cumulative))
+            lines.append('{}_sum{} {}'.format(self.name, _labels(self.labels, values), series[-1]))
+            lines.append('{}_count{} {}'.format(self.name, _labels(self.labels, values), cumulative))
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = Counter('fyyur_requests_total', 'Requests by endpoint, method and status.',
+                                ('endpoint', 'method', 'status'))
+        self.latency = Histogram('fyyur_request_duration_seconds', 'Request latency.',
+                                 ('endpoint', 'method'), LATENCY_BUCKETS)
+        self.queries = Histogram('fyyur_request_queries', 'SQL statements per request.',
+                                 ('endpoint',), QUERY_BUCKETS)
+        self.db_time = Histogram('fyyur_request_db_seconds', 'Time spent in SQL statements per request.',
+                                 ('endpoint',), LATENCY_BUCKETS)
+        self.size = Histogram('fyyur_response_size_bytes', 'Response body size (unstreamed responses).',
+                              ('endpoint',), SIZE_BUCKETS)
+        self.metrics = (self.requests, self.latency, self.queries, self.db_time, self.size)
+        # set by record(), cleared when the numbers are written to METRICS_DIR
+        self.changed = False
+
+    def record(self, endpoint, method, status, seconds, queries, db_seconds, size):
+        with self.lock:
+            self.changed = True
+            self.requests.inc((endpoint, method, status))
+            self.latency.observe((endpoint, method), seconds)
+            self.queries.observe((endpoint,), queries)
+            self.db_time.observe((endpoint,), db_seconds)
+            if size is not None:
+                self.size.observe((endpoint,), size)
+
+    def render(self):
+        with self.lock:
+            lines = []
+            for metric in self.metrics:
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    # this function return the numbers as json-friendly lists:
+    # metric name -> [[label values, value or histogram series], ...]
+    def snapshot(self):
+        with self.lock:
+            return {metric.name: [[list(values), list(value) if isinstance(value, list) else value]
+                                  for values, value in metric.series.items()]
+                    for metric in self.metrics}
+
+    def merge(self, snapshot):
+        with self.lock:
+            for metric in self.metrics:
+                for values, value in snapshot.get(metric.name, ()):
+                    metric.merge(tuple(values), value)
+
+
+registry = Registry()
+
+
+class SharedDirectory:
+
+    def __init__(self, directory, interval):
+        self.directory = directory
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.pid = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, pid):
+        return os.path.join(self.directory, '{}.json'.format(pid))
+
+    # this function start the writer thread of the current process once; a
+    # worker forked from a process that started it starts its own
+    def start(self):
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            threading.Thread(target=self._write_periodically, daemon=True).start()
+            atexit.register(self.write)
+
+    def _write_periodically(self):
+        while True:
+            time.sleep(self.interval)
+            self.write()
+
+    # this function write the numbers of this process when they changed
+    def write(self):
+        with registry.lock:
+            if not registry.changed:
+                return
+            registry.changed = False
+        # write to a temporary file and rename it so readers never see a
+        # partial file
+        temp_path = None
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(registry.snapshot(), f)
+            os.replace(temp_path, self._path(os.getpid()))
+        except OSError:
+            with registry.lock:
+                registry.changed = True
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    # this function render the sum of the numbers of every worker, the
+    # current one counted from memory so its last requests are included
+    def render(self):
+        total = Registry()
+        own = os.path.basename(self._path(os.getpid()))
+        for name in os.listdir(self.directory):
+            if name == own or not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    total.merge(json.load(f))
+            except (OSError, ValueError):
+                continue
+        total.merge(registry.snapshot())
+        return total.render()
+
+
+# the SQL statements of a request are counted on its g._metrics:
+# [started at, statements, seconds in the database]
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and has_request_context():
+        context._metrics_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_started', None)
+    if started is not None:
+        state = g.get('_metrics')
+        if state is not None:
+            state[1] += 1
+            state[2] += time.perf_counter() - started
+
+
+def start_request():
+    g._metrics = [time.perf_counter(), 0, 0.0]
+
+
+def finish_request(response):
+    state = g.pop('_metrics', None)
+    if state is None:
+        return response
+    size = None if response.is_streamed else response.calculate_content_length()
+    registry.record(request.endpoint or UNMATCHED, request.method, response.status_code,
+                    time.perf_counter() - state[0], state[1], state[2], size)
+    shared = current_app.extensions['metrics']
+    if shared is not None:
+        shared.start()
+    return response
+
+
+@metrics.route('/metrics')
+def metrics_page():
+    shared = current_app.extensions['metrics']
+    text = shared.render() if shared is not None else registry.render()
+    return current_app.response_class(text, mimetype='text/plain; version=0.0.4')
+
+
+# this function record the metrics of every request of the app
+def init_app(app):
+    if not app.config['METRICS_ENABLED']:
+        return
+    directory = app.config['METRICS_DIR']
+    app.extensions['metrics'] = SharedDirectory(directory, app.config['METRICS_WRITE_SECONDS']) \
+        if directory else None
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    app.register_blueprint(metrics)
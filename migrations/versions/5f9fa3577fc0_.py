@@ -0,0 +1,86 @@
+"""normalize genres into genre and association tables
+
+Revision ID: 5f9fa3577fc0
+Revises: f267e504e3d2
+Create Date: 2026-10-18 20:51:26.915684
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f9fa3577fc0'
+down_revision = 'f267e504e3d2'
+branch_labels = None
+depends_on = None
+
+
+def parse_genres(value):
+    # "Jazz,Swing" or the '{Jazz,"Rock n Roll"}' array literal of older rows
+    result = []
+    for name in (value or '').strip().lstrip('{').rstrip('}').split(','):
+        name = name.strip().strip('"').strip()
+        if name and name not in result:
+            result.append(name)
+    return result
+
+
+def upgrade():
+    genre = op.create_table('genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.Column('venue_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('artist_count', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    venue_genre = op.create_table('venue_genre',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['genre_id'], ['genre.id'], ),
+    sa.ForeignKeyConstraint(['venue_id'], ['venue.id'], ),
+    sa.PrimaryKeyConstraint('venue_id', 'genre_id')
+    )
+    op.create_index('ix_venue_genre_genre_id_venue_id', 'venue_genre', ['genre_id', 'venue_id'])
+    artist_genre = op.create_table('artist_genre',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['artist.id'], ),
+    sa.ForeignKeyConstraint(['genre_id'], ['genre.id'], ),
+    sa.PrimaryKeyConstraint('artist_id', 'genre_id')
+    )
+    op.create_index('ix_artist_genre_genre_id_artist_id', 'artist_genre', ['genre_id', 'artist_id'])
+
+    # backfill from the comma-joined strings and rewrite them in clean form
+    bind = op.get_bind()
+    genre_ids = {}
+    for table, association, fk, count_column in (('venue', venue_genre, 'venue_id', 'venue_count'),
+                                                 ('artist', artist_genre, 'artist_id', 'artist_count')):
+        links = []
+        rows = bind.execute(sa.text('SELECT id, genres FROM {}'.format(table))).fetchall()
+        for entity_id, value in rows:
+            names = parse_genres(value)
+            for name in names:
+                if name not in genre_ids:
+                    bind.execute(genre.insert().values(name=name))
+                    genre_ids[name] = bind.execute(
+                        sa.text('SELECT id FROM genre WHERE name = :name'), {'name': name}
+                    ).scalar()
+                links.append({fk: entity_id, 'genre_id': genre_ids[name]})
+            bind.execute(sa.text('UPDATE {} SET genres = :genres WHERE id = :id'.format(table)),
+                         {'genres': ','.join(names), 'id': entity_id})
+        if links:
+            op.bulk_insert(association, links)
+        bind.execute(sa.text(
+            'UPDATE genre SET {1} = (SELECT count(*) FROM {0}_genre WHERE {0}_genre.genre_id = genre.id)'
+            .format(table, count_column)
+        ))
+
+
+def downgrade():
+    op.drop_index('ix_artist_genre_genre_id_artist_id', table_name='artist_genre')
+    op.drop_table('artist_genre')
+    op.drop_index('ix_venue_genre_genre_id_venue_id', table_name='venue_genre')
+    op.drop_table('venue_genre')
+    op.drop_table('genre')
@@ -0,0 +1,35 @@
+"""add updated_at to venue, artist and show
+
+Revision ID: 82c7678ba8b7
+Revises: 5f9fa3577fc0
+Create Date: 2026-10-18 20:51:35.846802
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '82c7678ba8b7'
+down_revision = '5f9fa3577fc0'
+branch_labels = None
+depends_on = None
+
+TABLES = ('venue', 'artist', 'show')
+
+
+def upgrade():
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.get_bind().execute(sa.text('UPDATE {} SET updated_at = :now'.format(table)), {'now': now})
+        op.create_index('ix_{}_updated_at'.format(table), table, ['updated_at'])
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index('ix_{}_updated_at'.format(table), table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,29 @@
+"""add table_deletion
+
+Revision ID: 8adf2c6d7d36
+Revises: b3dfabead747
+Create Date: 2026-10-18 20:51:36.466870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8adf2c6d7d36'
+down_revision = 'b3dfabead747'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'table_deletion',
+        sa.Column('table_name', sa.String(length=64), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('table_name')
+    )
+
+
+def downgrade():
+    op.drop_table('table_deletion')
@@ -0,0 +1,66 @@
+"""add show end_time and double-booking checks
+
+Revision ID: b3dfabead747
+Revises: a001d852d917
+Create Date: 2026-10-18 20:51:45.552571
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3dfabead747'
+down_revision = 'a001d852d917'
+branch_labels = None
+depends_on = None
+
+# keep in sync with bookings.MAX_DURATION
+MAX_DURATION_MINUTES = 24 * 60
+
+SQLITE_OVERLAP = (
+    "EXISTS (SELECT 1 FROM show WHERE show.venue_id = NEW.venue_id "
+    "AND show.start_time >= datetime(NEW.start_time, '-{} minutes') AND show.start_time < NEW.end_time "
+    "AND show.end_time > NEW.start_time AND show.end_time > show.start_time{{}})".format(MAX_DURATION_MINUTES)
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    # the duration of the existing shows is unknown: they end when they
+    # start, which never conflicts with anything
+    op.add_column('show', sa.Column('end_time', sa.DateTime(timezone=True), nullable=True))
+    op.execute('UPDATE show SET end_time = start_time')
+    with op.batch_alter_table('show') as batch_op:
+        batch_op.create_check_constraint('ck_show_end_time', 'end_time >= start_time')
+
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        op.execute('ALTER TABLE show ADD CONSTRAINT ex_show_venue_id_time_range EXCLUDE USING gist '
+                   '(venue_id WITH =, tstzrange(start_time, end_time) WITH &&) '
+                   'WHERE (end_time > start_time)')
+
+    elif dialect == 'sqlite':
+        op.execute("CREATE TRIGGER show_no_overlap_insert BEFORE INSERT ON show "
+                   "WHEN NEW.end_time > NEW.start_time AND {} "
+                   "BEGIN SELECT RAISE(ABORT, 'show overlaps another show of the venue'); END"
+                   .format(SQLITE_OVERLAP.format('')))
+        op.execute("CREATE TRIGGER show_no_overlap_update BEFORE UPDATE OF venue_id, start_time, end_time "
+                   "ON show WHEN NEW.end_time > NEW.start_time AND {} "
+                   "BEGIN SELECT RAISE(ABORT, 'show overlaps another show of the venue'); END"
+                   .format(SQLITE_OVERLAP.format(' AND show.id != NEW.id')))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        op.execute('ALTER TABLE show DROP CONSTRAINT ex_show_venue_id_time_range')
+    elif dialect == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS show_no_overlap_insert')
+        op.execute('DROP TRIGGER IF EXISTS show_no_overlap_update')
+
+    with op.batch_alter_table('show') as batch_op:
+        batch_op.drop_constraint('ck_show_end_time', type_='check')
+        batch_op.drop_column('end_time')
@@ -0,0 +1,58 @@
+"""add name search indexes
+
+Revision ID: b847d8b673be
+Revises: 0898ac9abb57
+Create Date: 2026-10-18 20:50:46.609054
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b847d8b673be'
+down_revision = '0898ac9abb57'
+branch_labels = None
+depends_on = None
+
+TABLES = ('venue', 'artist')
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        # trigram GIN indexes serve name ILIKE '%term%' and similarity()
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table in TABLES:
+            op.create_index('ix_{}_name_trgm'.format(table), table, ['name'],
+                            postgresql_using='gin',
+                            postgresql_ops={'name': 'gin_trgm_ops'})
+
+    elif dialect == 'sqlite':
+        # fts5 trigram tables kept in sync by triggers for local databases
+        for table in TABLES:
+            op.execute("CREATE VIRTUAL TABLE {0}_fts USING fts5("
+                       "name, content='{0}', content_rowid='id', tokenize='trigram')".format(table))
+            op.execute("CREATE TRIGGER {0}_fts_ai AFTER INSERT ON {0} BEGIN "
+                       "INSERT INTO {0}_fts(rowid, name) VALUES (new.id, new.name); END".format(table))
+            op.execute("CREATE TRIGGER {0}_fts_ad AFTER DELETE ON {0} BEGIN "
+                       "INSERT INTO {0}_fts({0}_fts, rowid, name) VALUES ('delete', old.id, old.name); END".format(table))
+            op.execute("CREATE TRIGGER {0}_fts_au AFTER UPDATE OF name ON {0} BEGIN "
+                       "INSERT INTO {0}_fts({0}_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+                       "INSERT INTO {0}_fts(rowid, name) VALUES (new.id, new.name); END".format(table))
+            op.execute("INSERT INTO {0}_fts({0}_fts) VALUES ('rebuild')".format(table))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        for table in TABLES:
+            op.drop_index('ix_{}_name_trgm'.format(table), table_name=table)
+
+    elif dialect == 'sqlite':
+        for table in TABLES:
+            for trigger in ('ai', 'ad', 'au'):
+                op.execute('DROP TRIGGER IF EXISTS {}_fts_{}'.format(table, trigger))
+            op.execute('DROP TABLE IF EXISTS {}_fts'.format(table))
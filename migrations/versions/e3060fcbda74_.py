@@ -0,0 +1,45 @@
+"""track which shows are counted as upcoming
+
+Revision ID: e3060fcbda74
+Revises: b847d8b673be
+Create Date: 2026-10-18 20:51:17.967918
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3060fcbda74'
+down_revision = 'b847d8b673be'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('show') as batch_op:
+        batch_op.add_column(sa.Column('counted_upcoming', sa.Boolean(), nullable=False,
+                                      server_default=sa.false()))
+    op.create_index('ix_show_counted_upcoming_start_time', 'show', ['counted_upcoming', 'start_time'])
+
+    # backfill: recompute every counter from the show table
+    params = {'now': datetime.now()}
+    for table, fk in (('venue', 'venue_id'), ('artist', 'artist_id')):
+        op.get_bind().execute(sa.text(
+            "UPDATE {0} SET "
+            "upcoming_shows_count = (SELECT count(*) FROM show "
+            "WHERE show.{1} = {0}.id AND show.start_time > :now), "
+            "past_shows_count = (SELECT count(*) FROM show "
+            "WHERE show.{1} = {0}.id AND show.start_time <= :now)".format(table, fk)
+        ), params)
+    op.get_bind().execute(sa.text(
+        "UPDATE show SET counted_upcoming = (start_time IS NOT NULL AND start_time > :now)"
+    ), params)
+
+
+def downgrade():
+    op.drop_index('ix_show_counted_upcoming_start_time', table_name='show')
+    with op.batch_alter_table('show') as batch_op:
+        batch_op.drop_column('counted_upcoming')
@@ -0,0 +1,38 @@
+"""add indexes for the show, venue and artist access paths
+
+Revision ID: f267e504e3d2
+Revises: e3060fcbda74
+Create Date: 2026-10-18 20:51:22.456285
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f267e504e3d2'
+down_revision = 'e3060fcbda74'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # shows of one venue / artist split by start_time (detail pages, /venues)
+    op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'])
+    op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'])
+    # /shows ordered and filtered by start_time
+    op.create_index('ix_show_start_time', 'show', ['start_time'])
+    # /venues ordered by state and city
+    op.create_index('ix_venue_state_city', 'venue', ['state', 'city'])
+    # case-insensitive name lookups and ordering
+    op.create_index('ix_venue_lower_name', 'venue', [sa.text('lower(name)')])
+    op.create_index('ix_artist_lower_name', 'artist', [sa.text('lower(name)')])
+
+
+def downgrade():
+    op.drop_index('ix_artist_lower_name', table_name='artist')
+    op.drop_index('ix_venue_lower_name', table_name='venue')
+    op.drop_index('ix_venue_state_city', table_name='venue')
+    op.drop_index('ix_show_start_time', table_name='show')
+    op.drop_index('ix_show_artist_id_start_time', table_name='show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='show')
@@ -1,8 +1,43 @@
-from app import db
+from datetime import datetime, timezone
+
+from extensions import db
+
+
+# updated_at columns hold naive UTC datetimes
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+# association tables between venues / artists and their genres
+venue_genres = db.Table(
+    'venue_genre',
+    db.Column('venue_id', db.Integer, db.ForeignKey('venue.id'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id'), primary_key=True),
+    db.Index('ix_venue_genre_genre_id_venue_id', 'genre_id', 'venue_id')
+)
+
+artist_genres = db.Table(
+    'artist_genre',
+    db.Column('artist_id', db.Integer, db.ForeignKey('artist.id'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id'), primary_key=True),
+    db.Index('ix_artist_genre_genre_id_artist_id', 'genre_id', 'artist_id')
+)
+
+
+class Genre(db.Model):
+    __tablename__ = 'genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+    # facet counts, maintained by genres.py
+    venue_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    artist_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
 
 class Venue(db.Model):
     __tablename__ = 'venue'
+    __table_args__ = (
+        db.Index('ix_venue_state_city', 'state', 'city'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -18,8 +53,10 @@ class Venue(db.Model):
     image_link = db.Column(db.String(3000))
     upcoming_shows_count = db.Column(db.Integer)
     past_shows_count = db.Column(db.Integer)
+    updated_at = db.Column(db.DateTime, default=utcnow, onupdate=utcnow, index=True)
 
     shows = db.relationship('Show', backref='venue', lazy=True)
+    genre_list = db.relationship('Genre', secondary=venue_genres, order_by='Genre.name', lazy=True)
     # TODO: DONE: implement any missing fields, as a database migration using Flask-Migrate
 
 
@@ -39,11 +76,22 @@ class Artist(db.Model):
     image_link = db.Column(db.String(500))
     upcoming_shows_count = db.Column(db.Integer)
     past_shows_count = db.Column(db.Integer)
+    updated_at = db.Column(db.DateTime, default=utcnow, onupdate=utcnow, index=True)
 
     shows = db.relationship('Show', backref='artist', lazy=True)
+    genre_list = db.relationship('Genre', secondary=artist_genres, order_by='Genre.name', lazy=True)
     # TODO: DONE: implement any missing fields, as a database migration using Flask-Migrate
 
 
+# time of the last delete from each table (by table name), see
+# http_cache.py: max(updated_at) does not move when a row goes away
+class TableDeletion(db.Model):
+    __tablename__ = 'table_deletion'
+
+    table_name = db.Column(db.String(64), primary_key=True)
+    deleted_at = db.Column(db.DateTime, nullable=False)
+
+
 # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
 class Show(db.Model):
     __tablename__ = 'show'
@@ -52,3 +100,52 @@ class Show(db.Model):
     venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'), nullable=False)
     artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'), nullable=False)
     start_time = db.Column(db.DateTime)
+    # end of the show, see bookings.py. Equal to start_time when the duration
+    # is unknown
+    end_time = db.Column(db.DateTime)
+    # True while the show is counted in upcoming_shows_count, see counters.py
+    counted_upcoming = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    updated_at = db.Column(db.DateTime, default=utcnow, onupdate=utcnow, index=True)
+
+    __table_args__ = (
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_start_time', 'start_time'),
+        db.Index('ix_show_counted_upcoming_start_time', 'counted_upcoming', 'start_time'),
+        db.CheckConstraint('end_time >= start_time', name='ck_show_end_time'),
+    )
+
+    @property
+    def duration(self):
+        if self.start_time is None or self.end_time is None:
+            return None
+        return self.end_time - self.start_time
+
+
+# deferred work run by `flask worker`, see jobs.py. Jobs are deleted once
+# they succeed; failed ones stay for inspection
+class Job(db.Model):
+    __tablename__ = 'job'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False)
+    # JSON object of the task's keyword arguments
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False)
+    # naive UTC, the job is not run before
+    run_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    locked_at = db.Column(db.DateTime)
+    locked_by = db.Column(db.String(120))
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+    )
+
+
+# case-insensitive name lookups and ordering
+db.Index('ix_venue_lower_name', db.func.lower(Venue.name))
+db.Index('ix_artist_lower_name', db.func.lower(Artist.name))
@@ -0,0 +1,71 @@
+import base64
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+import models
+
+
+# ----------------------------------------------------------------------------#
+# Keyset (cursor) pagination.
+#
+# A cursor is the opaque, url-safe encoding of the sort key of the last row
+# of a page; the next page seeks past it instead of counting rows with
+# OFFSET, so every page costs the same. Malformed cursors raise ValueError.
+# ----------------------------------------------------------------------------#
+
+# cursors drop the base64 padding so they can be pasted into urls as-is
+def _encode(*values):
+    raw = '|'.join(str(value) for value in values)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    return base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+
+
+# order of the show pages; start_time is nullable and the shows without
+# one come last on every database
+SHOW_ORDER = (models.Show.start_time.asc().nulls_last(), models.Show.id)
+
+
+# this function build the cursor that points after the given show; an
+# empty start time stands for NULL
+def encode_show_cursor(start_time, show_id):
+    return _encode(start_time.isoformat() if start_time is not None else '', show_id)
+
+
+# this function return the (start_time, id) pair of a show cursor, or None
+def decode_show_cursor(cursor):
+    if not cursor:
+        return None
+    start_time, show_id = _decode(cursor)
+    return datetime.fromisoformat(start_time) if start_time else None, int(show_id)
+
+
+# this function filter a show query, ordered by SHOW_ORDER, to the rows
+# after a decoded show cursor
+def shows_after(query, after):
+    if after is None:
+        return query
+    start_time, show_id = after
+    if start_time is None:
+        return query.filter(models.Show.start_time.is_(None), models.Show.id > show_id)
+    return query.filter(or_(models.Show.start_time > start_time,
+                            and_(models.Show.start_time == start_time,
+                                 models.Show.id > show_id),
+                            models.Show.start_time.is_(None)))
+
+
+# this function build the cursor that points after the given id
+def encode_id_cursor(entity_id):
+    return _encode(entity_id)
+
+
+# this function return the id of an id cursor, or None
+def decode_id_cursor(cursor):
+    if not cursor:
+        return None
+    entity_id, = _decode(cursor)
+    return int(entity_id)
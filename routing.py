@@ -0,0 +1,98 @@
+import time
+
+from flask import current_app, g, request, has_request_context
+from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as BaseSession
+from sqlalchemy import event
+
+
+# ----------------------------------------------------------------------------#
+# Read-replica routing.
+#
+# When SQLALCHEMY_BINDS has a 'replica' engine, the queries of the read-only
+# endpoints below go to it and everything else stays on the primary: other
+# endpoints, any flush, and the requests of a client that committed a write
+# in the last REPLICA_STICKY_SECONDS (so a redirect after a form submission
+# never reads a replica that has not caught up yet).
+#
+# That deadline is a plain cookie, not the signed session, so every worker
+# (and a restarted one) honours it whatever its SECRET_KEY. A client can
+# only set it to stay on the primary, and for at most REPLICA_STICKY_SECONDS.
+# ----------------------------------------------------------------------------#
+
+REPLICA_BIND = 'replica'
+
+# endpoints that never write
+REPLICA_ENDPOINTS = {
+    'venues.venues', 'venues.show_venue', 'venues.search_venues',
+    'artists.artists', 'artists.show_artist', 'artists.search_artists',
+    'shows.shows',
+    'main.autocomplete',
+    'images.image',
+}
+
+# blueprints whose endpoints never write
+REPLICA_BLUEPRINTS = {'api_v1', 'export'}
+
+STICKY_COOKIE = 'primary_until'
+
+
+class RoutingSession(BaseSession):
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if not self._flushing and reads_from_replica():
+            return replica_engine()
+        return super().get_bind(mapper, clause, **kwargs)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def _make_session_factory(self, options):
+        options.setdefault('class_', RoutingSession)
+        return super()._make_session_factory(options)
+
+
+def replica_engine():
+    from extensions import db
+    return db.engines[REPLICA_BIND]
+
+
+# this function return True when the current request reads from the replica
+def reads_from_replica():
+    return has_request_context() and g.get('read_replica', False)
+
+
+# this function pick the database of each request and make a client stick
+# to the primary for a while after each of its commits
+def init_app(app):
+    if REPLICA_BIND not in (app.config.get('SQLALCHEMY_BINDS') or {}):
+        return
+
+    @app.before_request
+    def choose_database():
+        read_only = request.endpoint in REPLICA_ENDPOINTS or request.blueprint in REPLICA_BLUEPRINTS
+        g.read_replica = read_only and not sticky()
+
+    @app.after_request
+    def set_sticky_cookie(response):
+        primary_until = g.pop('primary_until', None)
+        if primary_until is not None:
+            response.set_cookie(STICKY_COOKIE, '{:.3f}'.format(primary_until),
+                                max_age=app.config['REPLICA_STICKY_SECONDS'], httponly=True, samesite='Lax')
+        return response
+
+
+# this function return True while the client's last commit is recent
+def sticky():
+    try:
+        primary_until = float(request.cookies.get(STICKY_COOKIE, 0))
+    except ValueError:
+        return False
+    now = time.time()
+    return now < primary_until <= now + current_app.config['REPLICA_STICKY_SECONDS']
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def stick_to_primary(db_session):
+    if has_request_context() and REPLICA_BIND in (current_app.config.get('SQLALCHEMY_BINDS') or {}):
+        g.primary_until = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
@@ -0,0 +1,462 @@
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import DDL, event, func, text
+from sqlalchemy.exc import SQLAlchemyError
+
+import models
+from extensions import db
+
+
+# ----------------------------------------------------------------------------#
+# Indexed name search for venues and artists.
+#
+# PostgreSQL: ILIKE '%term%' served by a pg_trgm GIN index on name and
+#             ranked by trigram similarity.
+# SQLite:     an FTS5 table with the trigram tokenizer kept in sync by
+#             triggers, ranked by bm25.
+# ----------------------------------------------------------------------------#
+
+# the trigram tokenizer can not match anything shorter than one trigram
+MIN_TRIGRAM_LENGTH = 3
+
+
+# this function return the sqlite statements that create and fill the fts
+# table of the given table and keep it in sync with it
+def sqlite_fts_ddl(table):
+    return [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS {0}_fts USING fts5("
+        "name, content='{0}', content_rowid='id', tokenize='trigram')".format(table),
+        "CREATE TRIGGER IF NOT EXISTS {0}_fts_ai AFTER INSERT ON {0} BEGIN "
+        "INSERT INTO {0}_fts(rowid, name) VALUES (new.id, new.name); END".format(table),
+        "CREATE TRIGGER IF NOT EXISTS {0}_fts_ad AFTER DELETE ON {0} BEGIN "
+        "INSERT INTO {0}_fts({0}_fts, rowid, name) VALUES ('delete', old.id, old.name); END".format(table),
+        "CREATE TRIGGER IF NOT EXISTS {0}_fts_au AFTER UPDATE OF name ON {0} BEGIN "
+        "INSERT INTO {0}_fts({0}_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+        "INSERT INTO {0}_fts(rowid, name) VALUES (new.id, new.name); END".format(table),
+        "INSERT INTO {0}_fts({0}_fts) VALUES ('rebuild')".format(table),
+    ]
+
+
+# tables built with db.create_all() (local sqlite databases, tests) get the
+# same fts table the migration creates
+for _model in (models.Venue, models.Artist):
+    for _statement in sqlite_fts_ddl(_model.__tablename__):
+        event.listen(_model.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+
+
+# this function search the model (Venue or Artist) by a case-insensitive
+# substring of its name and return (total, rows) for the requested page,
+# the best matches first. each row has id, name and upcoming_shows_count
+def search_by_name(model, term, page=1, per_page=20):
+    term = term.strip()
+    if not term:
+        return 0, []
+
+    offset = (page - 1) * per_page
+    dialect = db.engine.dialect.name
+
+    if dialect == 'sqlite' and len(term) >= MIN_TRIGRAM_LENGTH:
+        return _search_sqlite_fts(model, term, offset, per_page)
+
+    # the trigram index serves ILIKE directly on postgres, every other case
+    # falls back to a plain ILIKE
+    pattern = '%{}%'.format(term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+    condition = model.name.ilike(pattern, escape='\\')
+
+    if dialect == 'postgresql':
+        order = [func.similarity(model.name, term).desc(), model.name, model.id]
+    else:
+        order = [func.length(model.name), model.name, model.id]
+
+    total = db.session.query(func.count(model.id)).filter(condition).scalar()
+    rows = db.session.query(model.id, model.name, model.upcoming_shows_count) \
+        .filter(condition) \
+        .order_by(*order) \
+        .offset(offset) \
+        .limit(per_page) \
+        .all()
+    return total, rows
+
+
+def _search_sqlite_fts(model, term, offset, per_page):
+    table = model.__tablename__
+    match = '"{}"'.format(term.replace('"', '""'))
+
+    total = db.session.execute(
+        text("SELECT count(*) FROM {0}_fts WHERE {0}_fts MATCH :match".format(table)),
+        {'match': match}
+    ).scalar()
+    rows = db.session.execute(
+        text("SELECT t.id, t.name, t.upcoming_shows_count "
+             "FROM {0}_fts JOIN {0} AS t ON t.id = {0}_fts.rowid "
+             "WHERE {0}_fts MATCH :match "
+             "ORDER BY {0}_fts.rank, t.id "
+             "LIMIT :limit OFFSET :offset".format(table)),
+        {'match': match, 'limit': per_page, 'offset': offset}
+    ).fetchall()
+    return total, rows
+
+
+# ----------------------------------------------------------------------------#
+# In-process inverted index over name, city, state and genres.
+#
+# Every worker keeps its own index, with the upcoming show count of every
+# doc so a search never goes back to the database. It is built when the
+# worker starts (init_app), updated by the create/edit/delete handlers of
+# that worker and rebuilt in the background every
+# SEARCH_INDEX_REFRESH_SECONDS to pick up the other workers' changes and
+# the moved counters.
+# ----------------------------------------------------------------------------#
+
+SearchHit = namedtuple('SearchHit', ['id', 'name', 'upcoming_shows_count'])
+
+TOKEN_RE = re.compile(r'[^\W_]+')
+
+# a term found in the name ranks above the same term in city/state/genres
+FIELD_WEIGHTS = {'name': 3, 'city': 1, 'state': 1, 'genres': 1}
+
+
+def tokenize(value):
+    return TOKEN_RE.findall((value or '').lower())
+
+
+class InvertedIndex:
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.postings = {}  # term -> {doc id: weight}
+        self.terms = []  # sorted vocabulary for prefix lookups
+        self.doc_terms = {}  # doc id -> {term: weight}
+        self.names = {}  # doc id -> name
+        self.counts = {}  # doc id -> upcoming_shows_count
+
+    @staticmethod
+    def _weights(name, city, state, genres):
+        fields = {'name': name, 'city': city, 'state': state, 'genres': genres}
+        weights = {}
+        for field, value in fields.items():
+            for term in tokenize(value):
+                weights[term] = max(weights.get(term, 0), FIELD_WEIGHTS[field])
+        return weights
+
+    # this function store a doc and return the terms new to the vocabulary
+    def _store(self, doc_id, name, weights, upcoming_shows_count):
+        self.remove(doc_id)
+        new_terms = []
+        for term, weight in weights.items():
+            if term not in self.postings:
+                self.postings[term] = {}
+                new_terms.append(term)
+            self.postings[term][doc_id] = weight
+        self.doc_terms[doc_id] = weights
+        self.names[doc_id] = name
+        self.counts[doc_id] = upcoming_shows_count
+        return new_terms
+
+    def add(self, doc_id, name, city, state, genres, upcoming_shows_count=None):
+        weights = self._weights(name, city, state, genres)
+        with self.lock:
+            for term in self._store(doc_id, name, weights, upcoming_shows_count):
+                insort(self.terms, term)
+
+    # this function add many (id, name, city, state, genres, count) docs and
+    # sort the vocabulary once, instead of an insort per new term
+    def add_many(self, docs):
+        with self.lock:
+            new_terms = []
+            for doc_id, name, city, state, genres, upcoming_shows_count in docs:
+                new_terms.extend(self._store(doc_id, name, self._weights(name, city, state, genres),
+                                             upcoming_shows_count))
+            self.terms.extend(new_terms)
+            self.terms.sort()
+
+    def remove(self, doc_id):
+        with self.lock:
+            for term in self.doc_terms.pop(doc_id, {}):
+                docs = self.postings[term]
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+                    del self.terms[bisect_left(self.terms, term)]
+            self.names.pop(doc_id, None)
+            self.counts.pop(doc_id, None)
+
+    # this function return the hits of the ids still in the index
+    def hits(self, ids):
+        with self.lock:
+            return [SearchHit(doc_id, self.names[doc_id], self.counts[doc_id])
+                    for doc_id in ids if doc_id in self.names]
+
+    # this function return the posting dicts of every term that starts with
+    # the prefix
+    def _prefix_postings(self, prefix):
+        postings = []
+        position = bisect_left(self.terms, prefix)
+        while position < len(self.terms) and self.terms[position].startswith(prefix):
+            postings.append(self.postings[self.terms[position]])
+            position += 1
+        return postings
+
+    # this function return (total, ids) of the docs matching every query
+    # word (as a word prefix), best matches first, ids limited to the page
+    def query(self, term, offset=0, limit=None):
+        words = set(tokenize(term))
+        if not words:
+            return 0, []
+
+        with self.lock:
+            # intersect starting from the rarest word so the candidate set
+            # is as small as possible from the first step
+            word_postings = sorted((self._prefix_postings(word) for word in words),
+                                   key=lambda postings: sum(len(docs) for docs in postings))
+            if not word_postings[0]:
+                return 0, []
+
+            scores = {}
+            for docs in word_postings[0]:
+                for doc_id, weight in docs.items():
+                    if weight > scores.get(doc_id, 0):
+                        scores[doc_id] = weight
+
+            for postings in word_postings[1:]:
+                narrowed = {}
+                for doc_id, score in scores.items():
+                    weight = max(docs.get(doc_id, 0) for docs in postings) if postings else 0
+                    if weight:
+                        narrowed[doc_id] = score + weight
+                scores = narrowed
+                if not scores:
+                    return 0, []
+
+        # scores are small integers: bucket the matches by score and only
+        # sort the buckets the requested page falls in
+        buckets = {}
+        for doc_id, score in scores.items():
+            buckets.setdefault(score, []).append(doc_id)
+
+        end = len(scores) if limit is None else offset + limit
+        ids = []
+        for score in sorted(buckets, reverse=True):
+            if len(ids) >= end:
+                break
+            ids.extend(sorted(buckets[score]))
+        return len(scores), ids[offset:end]
+
+
+SEARCHED = (models.Venue, models.Artist)
+
+PREFIX_INDEX = 'prefix'
+
+
+# the indexes of one app: table name (or PREFIX_INDEX) -> index, the time
+# each was built at and the keys being rebuilt by a background thread
+class Indexes:
+
+    def __init__(self):
+        self.indexes = {}
+        self.built_at = {}
+        self.lock = threading.Lock()
+        self.refreshing = set()
+
+    def store(self, key, index):
+        self.indexes[key] = index
+        self.built_at[key] = time.monotonic()
+        return index
+
+
+def _state():
+    return current_app.extensions['search']
+
+
+# this function return an index, built on the spot if the worker could not
+# build it at start, and rebuilt in the background once it is too old
+def _get(key, build):
+    state = _state()
+    index = state.indexes.get(key)
+    if index is None:
+        with state.lock:
+            index = state.indexes.get(key)
+            if index is None:
+                index = state.store(key, build())
+    elif time.monotonic() - state.built_at[key] > current_app.config['SEARCH_INDEX_REFRESH_SECONDS']:
+        _refresh(state, key, build)
+    return index
+
+
+# this function rebuild an index in a thread while the requests keep using
+# the current one. An edit this worker makes during the rebuild may be
+# missed until the next one
+def _refresh(state, key, build):
+    with state.lock:
+        if key in state.refreshing:
+            return
+        state.refreshing.add(key)
+    app = current_app._get_current_object()
+
+    def refresh():
+        try:
+            with app.app_context():
+                state.store(key, build())
+        except Exception:
+            # tried again after another SEARCH_INDEX_REFRESH_SECONDS
+            state.built_at[key] = time.monotonic()
+            app.logger.exception('could not rebuild the %s search index', key)
+        finally:
+            with state.lock:
+                state.refreshing.discard(key)
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+
+# this function build an index of the model from the db
+def build_index(model):
+    index = InvertedIndex()
+    rows = db.session.query(model.id, model.name, model.city, model.state, model.genres,
+                            model.upcoming_shows_count).all()
+    index.add_many(rows)
+    return index
+
+
+# this function return the index of the model
+def get_index(model):
+    return _get(model.__tablename__, lambda: build_index(model))
+
+
+# this function replace the index of the model with a fresh one
+def rebuild_index(model):
+    return _state().store(model.__tablename__, build_index(model))
+
+
+# this function add or refresh a Venue or Artist in its indexes
+def index_entity(entity):
+    get_index(type(entity)).add(entity.id, entity.name, entity.city, entity.state, entity.genres,
+                                entity.upcoming_shows_count)
+    get_prefix_index().add(type(entity).__tablename__, entity.id, entity.name)
+
+
+# this function drop a Venue or Artist from its indexes
+def unindex_entity(model, entity_id):
+    get_index(model).remove(int(entity_id))
+    get_prefix_index().remove(model.__tablename__, int(entity_id))
+
+
+# this function search the model's in-memory index and return (total, hits)
+# for the requested page, without any query
+def search_index(model, term, page=1, per_page=20):
+    index = get_index(model)
+    total, page_ids = index.query(term, offset=(page - 1) * per_page, limit=per_page)
+    return total, index.hits(page_ids)
+
+
+# this function search with the backend chosen by SEARCH_BACKEND
+def search(model, term, page=1, per_page=20):
+    if current_app.config['SEARCH_BACKEND'] == 'memory':
+        return search_index(model, term, page=page, per_page=per_page)
+    return search_by_name(model, term, page=page, per_page=per_page)
+
+
+# ----------------------------------------------------------------------------#
+# Name prefix index for autocomplete.
+#
+# A sorted array of (key, kind, id) entries, one entry per word start of
+# every venue and artist name, so "mus" finds "The Musical Hop". A lookup
+# is one bisect plus a walk over at most the matching entries.
+# ----------------------------------------------------------------------------#
+
+class PrefixIndex:
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.entries = []  # sorted (key, kind, id)
+        self.doc_keys = {}  # (kind, id) -> keys of the doc's entries
+        self.names = {}  # (kind, id) -> name
+
+    # this function store a doc and return its keys
+    def _store(self, kind, doc_id, name):
+        words = tokenize(name)
+        # "the musical hop" -> "the musical hop", "musical hop", "hop"
+        keys = {' '.join(words[position:]) for position in range(len(words))}
+        self.remove(kind, doc_id)
+        self.doc_keys[(kind, doc_id)] = keys
+        self.names[(kind, doc_id)] = name
+        return keys
+
+    def add(self, kind, doc_id, name):
+        with self.lock:
+            for key in self._store(kind, doc_id, name):
+                insort(self.entries, (key, kind, doc_id))
+
+    # this function add many (id, name) docs of a kind and sort the entries
+    # once, instead of an insort per entry
+    def add_many(self, kind, docs):
+        with self.lock:
+            for doc_id, name in docs:
+                self.entries.extend((key, kind, doc_id) for key in self._store(kind, doc_id, name))
+            self.entries.sort()
+
+    def remove(self, kind, doc_id):
+        with self.lock:
+            for key in self.doc_keys.pop((kind, doc_id), ()):
+                position = bisect_left(self.entries, (key, kind, doc_id))
+                if position < len(self.entries) and self.entries[position] == (key, kind, doc_id):
+                    del self.entries[position]
+            self.names.pop((kind, doc_id), None)
+
+    # this function return up to limit (kind, id, name) of the names having
+    # a word that starts with the prefix, optionally only of one kind
+    def complete(self, prefix, limit=10, kind=None):
+        prefix = ' '.join(tokenize(prefix))
+        if not prefix:
+            return []
+
+        results = []
+        seen = set()
+        with self.lock:
+            position = bisect_left(self.entries, (prefix,))
+            while position < len(self.entries) and len(results) < limit:
+                key, entry_kind, doc_id = self.entries[position]
+                if not key.startswith(prefix):
+                    break
+                position += 1
+                if (kind is not None and entry_kind != kind) or (entry_kind, doc_id) in seen:
+                    continue
+                seen.add((entry_kind, doc_id))
+                results.append((entry_kind, doc_id, self.names[(entry_kind, doc_id)]))
+        return results
+
+
+# this function build the name prefix index of venues and artists from the db
+def build_prefix_index():
+    index = PrefixIndex()
+    for model in SEARCHED:
+        index.add_many(model.__tablename__, db.session.query(model.id, model.name).all())
+    return index
+
+
+def get_prefix_index():
+    return _get(PREFIX_INDEX, build_prefix_index)
+
+
+# this function give the app its indexes and, when build is set (not for
+# the other flask commands), build them before the worker serves its first
+# search; the inverted indexes only with the 'memory' SEARCH_BACKEND. When
+# the database is not ready yet the first search builds them instead
+def init_app(app, build=True):
+    app.extensions['search'] = Indexes()
+    if not build:
+        return
+    with app.app_context():
+        try:
+            if app.config['SEARCH_BACKEND'] == 'memory':
+                for model in SEARCHED:
+                    rebuild_index(model)
+            _state().store(PREFIX_INDEX, build_prefix_index())
+        except SQLAlchemyError as error:
+            app.logger.warning('search indexes not built at startup: %s', error)
+        finally:
+            db.session.remove()
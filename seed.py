@@ -0,0 +1,153 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func
+
+import importer
+import models
+from extensions import db
+
+
+# ----------------------------------------------------------------------------#
+# Synthetic data.
+#
+# `flask seed` fills the database with generated venues, artists and shows
+# shaped like production data, to reproduce its behaviour locally:
+# - a few venues and artists get most of the shows (Zipf-like weights)
+# - most shows are past, the rest spread over the coming months, starting
+#   in the evening on the half hour
+# - genres and states are picked from the form choices and stored the way
+#   the forms store them ("Jazz,Swing")
+# Everything goes through the bulk importer, generated lazily, so a million
+# shows are never held in memory at once.
+# ----------------------------------------------------------------------------#
+
+# exponent of the rank weights: 1 / rank ** s
+VENUE_SKEW = 1.1
+ARTIST_SKEW = 0.8
+
+PAST_SHARE = 0.7
+PAST_DAYS = 3 * 365
+FUTURE_DAYS = 365
+
+WORDS = ('Blue', 'Golden', 'Velvet', 'Electric', 'Silver', 'Midnight', 'Rusty', 'Crimson', 'Wild', 'Lucky',
+         'Hollow', 'Neon', 'Painted', 'Iron', 'Paper', 'Broken', 'Little', 'Grand', 'Lonely', 'Royal')
+VENUE_NOUNS = ('Hall', 'Room', 'Lounge', 'Tavern', 'Theatre', 'Club', 'Bar', 'Garden', 'Warehouse', 'Cellar')
+ARTIST_NOUNS = ('Band', 'Trio', 'Collective', 'Orchestra', 'Brothers', 'Sisters', 'Project', 'Quartet', 'Kids')
+CITIES = ('San Francisco', 'New York', 'Austin', 'Chicago', 'Seattle', 'Nashville', 'New Orleans',
+          'Los Angeles', 'Boston', 'Denver', 'Portland', 'Atlanta', 'Detroit', 'Miami', 'Memphis')
+
+
+# this function return the values of a choices list of the forms, e.g.
+# choices('state') or choices('genres')
+def choices(field):
+    import forms
+
+    return [value for value, label in getattr(forms.VenueForm, field).kwargs['choices']]
+
+
+def _name(rng, nouns, index):
+    return 'The {} {} {} {}'.format(rng.choice(WORDS), rng.choice(WORDS), rng.choice(nouns), index)
+
+
+def _common(rng, index, kind, genre_choices, states):
+    return {
+        'city': rng.choice(CITIES),
+        'state': rng.choice(states),
+        'phone': '{:03d}-{:03d}-{:04d}'.format(rng.randint(200, 999), rng.randint(0, 999), rng.randint(0, 9999)),
+        # one to three genres, most entities have one or two
+        'genres': ','.join(rng.sample(genre_choices, rng.choice((1, 1, 2, 2, 3)))),
+        'website_link': 'https://example.com/{}/{}'.format(kind, index),
+        'facebook_link': 'https://www.facebook.com/fyyur-{}-{}'.format(kind, index),
+        'image_link': 'https://images.example.com/{}/{}.jpg'.format(kind, index),
+    }
+
+
+def venue_records(count, rng):
+    genre_choices, states = choices('genres'), choices('state')
+    for index in range(1, count + 1):
+        record = _common(rng, index, 'venues', genre_choices, states)
+        record['name'] = _name(rng, VENUE_NOUNS, index)
+        record['address'] = '{} {} St'.format(rng.randint(1, 9999), rng.choice(WORDS))
+        record['seeking_talent'] = rng.random() < 0.4
+        if record['seeking_talent']:
+            record['seeking_description'] = 'We are looking for {} acts.'.format(record['genres'].split(',')[0])
+        yield record
+
+
+def artist_records(count, rng):
+    genre_choices, states = choices('genres'), choices('state')
+    for index in range(1, count + 1):
+        record = _common(rng, index, 'artists', genre_choices, states)
+        record['name'] = _name(rng, ARTIST_NOUNS, index)
+        record['seeking_venue'] = rng.random() < 0.3
+        if record['seeking_venue']:
+            record['seeking_description'] = 'Looking for shows in {}.'.format(record['city'])
+        yield record
+
+
+# this function return the cumulative Zipf-like weights of count ranks
+def _skewed(count, skew):
+    weights = []
+    total = 0.0
+    for rank in range(1, count + 1):
+        total += 1.0 / rank ** skew
+        weights.append(total)
+    return weights
+
+
+# this function yield shows between the venue and artist ids, the first
+# ids of each list getting the most shows
+def show_records(count, venue_ids, artist_ids, rng, now=None):
+    now = now or datetime.now()
+    venue_weights = _skewed(len(venue_ids), VENUE_SKEW)
+    artist_weights = _skewed(len(artist_ids), ARTIST_SKEW)
+    for _ in range(count):
+        if rng.random() < PAST_SHARE:
+            day = now - timedelta(days=rng.randint(1, PAST_DAYS))
+        else:
+            day = now + timedelta(days=rng.randint(1, FUTURE_DAYS))
+        start_time = day.replace(hour=rng.randint(18, 23), minute=rng.choice((0, 30)), second=0, microsecond=0)
+        yield {
+            'venue_id': rng.choices(venue_ids, cum_weights=venue_weights)[0],
+            'artist_id': rng.choices(artist_ids, cum_weights=artist_weights)[0],
+            'start_time': start_time,
+        }
+
+
+def _new_ids(model, after):
+    return [row.id for row in db.session.query(model.id).filter(model.id > after).order_by(model.id)]
+
+
+# this function add the generated rows to the database and return the ids
+# of the new venues and artists, busiest first
+def generate(venues, artists, shows, random_seed=0, batch_size=importer.BATCH_SIZE):
+    rng = random.Random(random_seed)
+    last_venue = db.session.query(func.coalesce(func.max(models.Venue.id), 0)).scalar()
+    last_artist = db.session.query(func.coalesce(func.max(models.Artist.id), 0)).scalar()
+
+    importer.import_records('venues', venue_records(venues, rng), batch_size)
+    importer.import_records('artists', artist_records(artists, rng), batch_size)
+    venue_ids = _new_ids(models.Venue, last_venue)
+    artist_ids = _new_ids(models.Artist, last_artist)
+    if shows and venue_ids and artist_ids:
+        importer.import_records('shows', show_records(shows, venue_ids, artist_ids, rng), batch_size)
+    return venue_ids, artist_ids
+
+
+@click.command('seed')
+@with_appcontext
+@click.option('--venues', default=100, show_default=True, help='Venues to generate.')
+@click.option('--artists', default=200, show_default=True, help='Artists to generate.')
+@click.option('--shows', default=1000, show_default=True, help='Shows to generate.')
+@click.option('--random-seed', default=0, show_default=True, help='Seed of the generator, for repeatable data.')
+def seed_command(venues, artists, shows, random_seed):
+    """Add generated venues, artists and shows to the database."""
+    started = time.perf_counter()
+    generate(venues, artists, shows, random_seed)
+    click.echo('{} venues, {} artists and {} shows generated in {:.2f}s.'.format(
+        venues, artists, shows, time.perf_counter() - started))
+    click.echo('The web workers add them to their search indexes within SEARCH_INDEX_REFRESH_SECONDS.')
@@ -0,0 +1,225 @@
+from datetime import datetime, timedelta
+
+from flask import Blueprint, current_app, render_template, request, flash, url_for, abort
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+import bookings
+import cache
+import counters
+import http_cache
+import jobs
+import models
+import pagination
+from extensions import db
+
+# ----------------------------------------------------------------------------#
+# Show pages.
+#
+# The form views import forms (and with it wtforms) on first use.
+# ----------------------------------------------------------------------------#
+
+bp = Blueprint('shows', __name__)
+
+
+#  Shows ----------------------------------------------------------------
+
+@bp.route('/shows')
+@http_cache.conditional(http_cache.shows_version)
+def shows():
+    # displays list of shows at /shows
+    # TODO: replace with real venues data.
+    #       num_shows should be aggregated based on number of upcoming shows per venue.
+    # data = [
+    # {
+    #     "venue_id": 1,
+    #     "venue_name": "The Musical Hop",
+    #     "artist_id": 4,
+    #     "artist_name": "Guns N Petals",
+    #     "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
+    #     "start_time": "2019-05-21T21:30:00.000Z"
+    # },
+    # {
+    #     "venue_id": 3,
+    #     "venue_name": "Park Square Live Music & Coffee",
+    #     "artist_id": 5,
+    #     "artist_name": "Matt Quevedo",
+    #     "artist_image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
+    #     "start_time": "2019-06-15T23:00:00.000Z"
+    # },
+    # {
+    #     "venue_id": 3,
+    #     "venue_name": "Park Square Live Music & Coffee",
+    #     "artist_id": 6,
+    #     "artist_name": "The Wild Sax Band",
+    #     "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
+    #     "start_time": "2035-04-01T20:00:00.000Z"
+    # },
+    # {
+    #     "venue_id": 3,
+    #     "venue_name": "Park Square Live Music & Coffee",
+    #     "artist_id": 6,
+    #     "artist_name": "The Wild Sax Band",
+    #     "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
+    #     "start_time": "2035-04-08T20:00:00.000Z"
+    # },
+    # {
+    #     "venue_id": 3,
+    #     "venue_name": "Park Square Live Music & Coffee",
+    #     "artist_id": 6,
+    #     "artist_name": "The Wild Sax Band",
+    #     "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
+    #     "start_time": "2035-04-15T20:00:00.000Z"
+    # }]
+
+    # optional ?from=YYYY-MM-DD&to=YYYY-MM-DD window, both days inclusive
+    try:
+        date_from = parse_date_arg('from')
+        date_to = parse_date_arg('to')
+        after = pagination.decode_show_cursor(request.args.get('cursor'))
+    except ValueError:
+        abort(400)
+
+    # one joined query that fetches only the columns the page renders
+    query = db.session.query(
+        models.Show.id,
+        models.Show.venue_id,
+        models.Venue.name.label('venue_name'),
+        models.Show.artist_id,
+        models.Artist.name.label('artist_name'),
+        models.Artist.image_link.label('artist_image_link'),
+        models.Show.start_time
+    ).join(models.Venue, models.Show.venue_id == models.Venue.id) \
+        .join(models.Artist, models.Show.artist_id == models.Artist.id)
+
+    if date_from is not None:
+        query = query.filter(models.Show.start_time >= date_from)
+    if date_to is not None:
+        query = query.filter(models.Show.start_time < date_to + timedelta(days=1))
+
+    # keyset pagination on (start_time, id): seek past the last row of the
+    # previous page instead of counting rows with OFFSET
+    query = pagination.shows_after(query, after)
+
+    per_page = current_app.config['SHOWS_PER_PAGE']
+    rows = query.order_by(*pagination.SHOW_ORDER).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = pagination.encode_show_cursor(rows[-1].start_time, rows[-1].id)
+
+    data = []
+    for show in rows:
+        data.append(
+            {
+                "venue_id": show.venue_id,
+                "venue_name": show.venue_name,
+                "artist_id": show.artist_id,
+                "artist_name": show.artist_name,
+                "artist_image_link": show.artist_image_link,
+                "start_time": show.start_time
+            }
+        )
+
+    next_url = None
+    if next_cursor is not None:
+        next_url = url_for('shows.shows', cursor=next_cursor,
+                           **{key: request.args[key] for key in ('from', 'to') if request.args.get(key)})
+
+    return render_template('pages/shows.html', shows=data, next_url=next_url)
+
+
+# this function parse an optional YYYY-MM-DD query argument
+def parse_date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d')
+
+
+@bp.route('/shows/create')
+def create_shows():
+    # renders form. do not touch.
+    from forms import ShowForm
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+
+@bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    # TODO: insert form data as a new Show record in the db, instead
+
+    from forms import ShowForm
+    form = ShowForm()
+
+    try:
+        venue_id = form.venue_id.data
+        artist_id = form.artist_id.data
+        start_time = form.start_time.data
+        end_time = start_time + timedelta(minutes=form.duration.data)
+        if not timedelta(0) < end_time - start_time <= bookings.MAX_DURATION:
+            raise ValueError('invalid duration')
+
+        show = models.Show(
+            venue_id=venue_id,
+            artist_id=artist_id,
+            start_time=start_time,
+            end_time=end_time
+        )
+
+        # count the show on its venue and artist with atomic updates
+        db.session.add(show)
+        counters.record_new_show(show)
+        # a worker renders the two pages again for the cache the web
+        # workers share, this request does not wait for it
+        if current_app.config['CACHE_BACKEND'] == 'filesystem':
+            jobs.enqueue('warm_pages', {'venues': [int(venue_id)], 'artists': [int(artist_id)]})
+        db.session.commit()
+        cache.invalidate(cache.venue_key(venue_id), cache.artist_key(artist_id))
+
+        flash('Show was successfully listed!')
+    except IntegrityError as error:
+        # the database refused the show: it overlaps another show of the
+        # venue, or the venue or artist does not exist
+        db.session.rollback()
+        if not bookings.is_overlap(error):
+            flash('An error occurred. Show could not be listed.')
+        else:
+            # name the show it overlaps when it can still be looked up
+            try:
+                conflict = bookings.first_conflict(venue_id, start_time, end_time)
+            except SQLAlchemyError:
+                db.session.rollback()
+                current_app.logger.exception('could not look up the show overlapping the new one')
+                conflict = None
+            if conflict is None:
+                flash('The venue is not available at that time. Show could not be listed.')
+            else:
+                flash('The venue is already booked from {:%Y-%m-%d %H:%M} to {:%Y-%m-%d %H:%M}. '
+                      'Show could not be listed.'.format(conflict.start_time, conflict.end_time))
+    except:
+        flash('An error occurred. Show could not be listed.')
+        db.session.rollback()
+    finally:
+        db.session.close()
+
+    return render_template('pages/home.html')
+
+
+# this function return (rows, exact count) of one side of a detail page:
+# upcoming shows soonest first or past shows latest first, at most limit
+# rows of query. owner is the filter on the venue or artist; the count
+# is a separate index-only scan of (venue_id / artist_id, start_time),
+# only run when the side has more than limit shows
+def split_shows(query, owner, upcoming, now, limit):
+    side = models.Show.start_time > now if upcoming else models.Show.start_time <= now
+    if upcoming:
+        order = (models.Show.start_time, models.Show.id)
+    else:
+        order = (models.Show.start_time.desc(), models.Show.id.desc())
+
+    rows = query.filter(owner, side).order_by(*order).limit(limit).all()
+    if len(rows) < limit:
+        return rows, len(rows)
+    return rows, db.session.query(func.count()).select_from(models.Show).filter(owner, side).scalar()
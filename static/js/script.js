@@ -2,3 +2,32 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// fill the datalist of the navbar search inputs from /api/autocomplete
+document.querySelectorAll('input[data-autocomplete]').forEach(function (input) {
+  var list = document.getElementById(input.getAttribute('list'));
+  var pending = null;
+
+  input.addEventListener('input', function () {
+    var prefix = input.value.trim();
+    if (pending) {
+      pending.abort();
+    }
+    if (!prefix) {
+      list.innerHTML = '';
+      return;
+    }
+    pending = new XMLHttpRequest();
+    pending.open('GET', '/api/autocomplete?type=' + input.dataset.autocomplete +
+      '&q=' + encodeURIComponent(prefix));
+    pending.onload = function () {
+      list.innerHTML = '';
+      JSON.parse(this.responseText).forEach(function (result) {
+        var option = document.createElement('option');
+        option.value = result.name;
+        list.appendChild(option);
+      });
+    };
+    pending.send();
+  });
+});
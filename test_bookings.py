@@ -0,0 +1,106 @@
+import os
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+import bookings
+import models
+from app import create_app
+from extensions import db
+
+EIGHT_PM = datetime(2035, 4, 1, 20, 0)
+
+
+class BookingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app(SQLALCHEMY_DATABASE_URI='sqlite://', SQLALCHEMY_ENGINE_OPTIONS={},
+                              SQLALCHEMY_BINDS={}, WTF_CSRF_ENABLED=False, CACHE_BACKEND=None,
+                              LOG_FILE=os.devnull, TESTING=True)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        for name in ('Main Hall', 'Side Hall'):
+            db.session.add(models.Venue(name=name, upcoming_shows_count=0, past_shows_count=0))
+        db.session.add(models.Artist(name='The Band', upcoming_shows_count=0, past_shows_count=0))
+        db.session.commit()
+        self.add_show(1, EIGHT_PM, EIGHT_PM + timedelta(hours=2))
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def add_show(self, venue_id, start_time, end_time):
+        db.session.add(models.Show(venue_id=venue_id, artist_id=1, start_time=start_time, end_time=end_time))
+        db.session.commit()
+
+    def test_database_refuses_overlapping_shows(self):
+        with self.assertRaises(IntegrityError) as refused:
+            self.add_show(1, EIGHT_PM + timedelta(hours=1), EIGHT_PM + timedelta(hours=3))
+        db.session.rollback()
+        self.assertTrue(bookings.is_overlap(refused.exception))
+
+        # another constraint is not taken for an overlap
+        with self.assertRaises(IntegrityError) as refused:
+            self.add_show(2, EIGHT_PM, EIGHT_PM - timedelta(hours=1))
+        db.session.rollback()
+        self.assertFalse(bookings.is_overlap(refused.exception))
+
+        # back to back, another venue or without a duration is fine
+        self.add_show(1, EIGHT_PM + timedelta(hours=2), EIGHT_PM + timedelta(hours=3))
+        self.add_show(2, EIGHT_PM, EIGHT_PM + timedelta(hours=2))
+        self.add_show(1, EIGHT_PM + timedelta(hours=1), EIGHT_PM + timedelta(hours=1))
+        self.assertEqual(models.Show.query.count(), 4)
+
+        # moving a show onto another one is refused too
+        with self.assertRaises(IntegrityError):
+            models.Show.query.filter(models.Show.venue_id == 2) \
+                .update({models.Show.venue_id: 1}, synchronize_session=False)
+            db.session.commit()
+        db.session.rollback()
+
+    def test_form_names_the_conflicting_show(self):
+        response = self.client.post('/shows/create', data={
+            'venue_id': '1', 'artist_id': '1', 'start_time': '2035-04-01 21:00', 'duration': '120'})
+        self.assertIn('already booked from 2035-04-01 20:00 to 2035-04-01 22:00', response.get_data(as_text=True))
+        self.assertEqual(models.Show.query.count(), 1)
+
+        response = self.client.post('/shows/create', data={
+            'venue_id': '1', 'artist_id': '1', 'start_time': '2035-04-01 22:00', 'duration': '60'})
+        self.assertIn('Show was successfully listed!', response.get_data(as_text=True))
+        self.assertEqual(models.Show.query.count(), 2)
+
+    def test_form_survives_a_failed_conflict_lookup(self):
+        with mock.patch('bookings.first_conflict', side_effect=OperationalError('SELECT', {}, Exception('gone'))):
+            response = self.client.post('/shows/create', data={
+                'venue_id': '1', 'artist_id': '1', 'start_time': '2035-04-01 21:00', 'duration': '120'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('The venue is not available at that time', response.get_data(as_text=True))
+        self.assertEqual(models.Show.query.count(), 1)
+
+    def test_availability(self):
+        response = self.client.get('/api/v1/venues/1/availability?from=2035-04-01T18:00&to=2035-04-02')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()['data']
+        self.assertEqual(data['busy'], [
+            {'start_time': '2035-04-01T20:00:00', 'end_time': '2035-04-01T22:00:00', 'show_id': 1}])
+        self.assertEqual(data['free'], [
+            {'start_time': '2035-04-01T18:00:00', 'end_time': '2035-04-01T20:00:00'},
+            {'start_time': '2035-04-01T22:00:00', 'end_time': '2035-04-02T00:00:00'}])
+
+        # a show that started before the range still counts
+        busy, free = bookings.availability(1, EIGHT_PM + timedelta(hours=1), EIGHT_PM + timedelta(hours=4))
+        self.assertEqual([show_id for start, end, show_id in busy], [1])
+
+        self.assertEqual(self.client.get('/api/v1/venues/9/availability?from=2035-04-01&to=2035-04-02')
+                         .status_code, 404)
+        for query in ('from=2035-04-02&to=2035-04-01', 'from=2035-01-01&to=2035-06-01', 'from=soon&to=later', ''):
+            self.assertEqual(self.client.get('/api/v1/venues/1/availability?' + query).status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+
+import cache
+from app import create_app
+
+
+class PageCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.apps = {backend: create_app(SQLALCHEMY_DATABASE_URI='sqlite://', SQLALCHEMY_ENGINE_OPTIONS={},
+                                         SQLALCHEMY_BINDS={}, CACHE_BACKEND=backend, CACHE_DIR=self.directory.name,
+                                         LOG_FILE=os.devnull, TESTING=True)
+                     for backend in ('lru', 'filesystem')}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_page_built_before_an_invalidation_is_not_served(self):
+        for backend, app in self.apps.items():
+            with self.subTest(backend=backend), app.app_context():
+                builds = []
+
+                # a write commits and invalidates while the page is built
+                def build_during_write():
+                    builds.append('old')
+                    cache.invalidate('venue:1')
+                    return 'old page', None
+
+                def build():
+                    builds.append('new')
+                    return 'new page', None
+
+                self.assertEqual(cache.get_or_build('venue:1', build_during_write), 'old page')
+                self.assertEqual(cache.get_or_build('venue:1', build), 'new page')
+                self.assertEqual(cache.get_or_build('venue:1', build), 'new page')
+                self.assertEqual(builds, ['old', 'new'])
+
+                cache.get_backend().clear()
+                self.assertEqual(cache.get_or_build('venue:1', lambda: ('cleared', None)), 'cleared')
+
+    def test_filesystem_invalidation_reaches_every_worker(self):
+        workers = [create_app(SQLALCHEMY_DATABASE_URI='sqlite://', SQLALCHEMY_ENGINE_OPTIONS={},
+                              SQLALCHEMY_BINDS={}, CACHE_BACKEND='filesystem', CACHE_DIR=self.directory.name,
+                              LOG_FILE=os.devnull, TESTING=True) for _ in range(2)]
+        with workers[0].app_context():
+            self.assertEqual(cache.get_or_build('artist:1', lambda: ('first', None)), 'first')
+        with workers[1].app_context():
+            self.assertEqual(cache.get_or_build('artist:1', lambda: ('second', None)), 'first')
+            cache.invalidate('artist:1')
+        with workers[0].app_context():
+            self.assertEqual(cache.get_or_build('artist:1', lambda: ('rebuilt', None)), 'rebuilt')
+
+
+if __name__ == '__main__':
+    unittest.main()
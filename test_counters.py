@@ -0,0 +1,53 @@
+import os
+import unittest
+from datetime import datetime, timedelta
+
+import counters
+import models
+from app import create_app
+from extensions import db
+
+
+class CountersTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app(SQLALCHEMY_DATABASE_URI='sqlite://', SQLALCHEMY_ENGINE_OPTIONS={},
+                              SQLALCHEMY_BINDS={}, CACHE_BACKEND=None, LOG_FILE=os.devnull, TESTING=True)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        for name in ('First Hall', 'Second Hall'):
+            db.session.add(models.Venue(name=name, upcoming_shows_count=0, past_shows_count=0))
+        db.session.add(models.Artist(name='The Band', upcoming_shows_count=0, past_shows_count=0))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def counts(self, model):
+        return [(row.upcoming_shows_count, row.past_shows_count) for row in model.query.order_by(model.id)]
+
+    def test_rollover_moves_the_started_shows(self):
+        now = datetime(2035, 4, 1, 20, 0)
+        for venue_id, hours in ((1, -3), (1, -2), (2, -1), (2, 1)):
+            show = models.Show(venue_id=venue_id, artist_id=1, start_time=now + timedelta(hours=hours))
+            db.session.add(show)
+            counters.record_new_show(show, now - timedelta(days=1))
+        db.session.commit()
+        self.assertEqual(self.counts(models.Venue), [(2, 0), (2, 0)])
+
+        self.assertEqual(counters.rollover(now), 3)
+        self.assertEqual(self.counts(models.Venue), [(0, 2), (1, 1)])
+        self.assertEqual(self.counts(models.Artist), [(1, 3)])
+
+        # nothing left to move, and the counters agree with a full recount
+        self.assertEqual(counters.rollover(now), 0)
+        counters.reconcile(now)
+        self.assertEqual(self.counts(models.Venue), [(0, 2), (1, 1)])
+        self.assertEqual(self.counts(models.Artist), [(1, 3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import unittest
+from datetime import timedelta
+
+import models
+from app import create_app
+from extensions import db
+
+
+class HttpCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app(SQLALCHEMY_DATABASE_URI='sqlite://', SQLALCHEMY_ENGINE_OPTIONS={},
+                              SQLALCHEMY_BINDS={}, CACHE_BACKEND=None, LOG_FILE=os.devnull, TESTING=True)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        for name in ('Kept Hall', 'Deleted Hall'):
+            db.session.add(models.Venue(name=name, city='Austin', state='TX',
+                                        upcoming_shows_count=0, past_shows_count=0))
+        db.session.commit()
+        # the rows were written an hour ago
+        models.Venue.query.update({models.Venue.updated_at: models.utcnow() - timedelta(hours=1)})
+        db.session.commit()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def test_delete_modifies_the_list(self):
+        first = self.client.get('/venues')
+        self.assertEqual(first.status_code, 200)
+        validators = {'If-Modified-Since': first.headers['Last-Modified'], 'If-None-Match': first.headers['ETag']}
+        self.assertEqual(self.client.get('/venues', headers=validators).status_code, 304)
+
+        self.app.test_client().delete('/venues/2')
+        self.assertEqual(models.Venue.query.count(), 1)
+
+        # a CDN revalidating with either validator gets the new list
+        for name, value in validators.items():
+            response = self.client.get('/venues', headers={name: value})
+            self.assertEqual(response.status_code, 200, name)
+            self.assertNotIn('/venues/2', response.get_data(as_text=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
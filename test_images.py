@@ -0,0 +1,169 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import images
+import models
+from app import create_app
+from extensions import db
+from test_query_budget import PIXEL
+
+HOST = 'http://images.example.com'
+
+
+# stand-in for the image hosts: /pixel.gif is an image, /page.html is not,
+# anything else is missing. Every url fetched is counted
+def fetch(url, max_bytes, timeout):
+    fetch.hits.append(url[len(HOST):])
+    if url == HOST + '/pixel.gif':
+        return PIXEL
+    if url == HOST + '/page.html':
+        return b'<script>alert(1)</script>'
+    raise images.ImageError('{} is missing'.format(url))
+
+
+fetch.hits = []
+
+
+# a server on the loopback interface, that the default fetcher must not reach
+class InternalService(BaseHTTPRequestHandler):
+    hits = []
+
+    def do_GET(self):
+        self.hits.append(self.path)
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/gif')
+        self.send_header('Content-Length', str(len(PIXEL)))
+        self.end_headers()
+        self.wfile.write(PIXEL)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ImageProxyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        del fetch.hits[:]
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.app = create_app(SQLALCHEMY_DATABASE_URI='sqlite://', SQLALCHEMY_ENGINE_OPTIONS={},
+                              SQLALCHEMY_BINDS={}, CACHE_BACKEND=None, LOG_FILE=os.devnull, TESTING=True,
+                              IMAGE_CACHE_DIR=self.cache_dir.name, IMAGE_FETCHER=fetch)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        for name, path in (('Pixel Hall', '/pixel.gif'), ('Html Hall', '/page.html'), ('Gone Hall', '/gone.jpg')):
+            db.session.add(models.Venue(name=name, image_link=HOST + path,
+                                        upcoming_shows_count=0, past_shows_count=0))
+        db.session.commit()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+        self.cache_dir.cleanup()
+
+    def test_source_is_fetched_once(self):
+        with self.app.test_request_context():
+            url = images.image_url('venues', 1, HOST + '/pixel.gif', 'sm')
+        for _ in range(3):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.mimetype, 'image/gif')
+            self.assertEqual(response.headers['Cache-Control'], images.IMMUTABLE)
+        self.assertEqual(fetch.hits, ['/pixel.gif'])
+
+        # a url without the current version is not immutable
+        response = self.client.get('/img/venues/1/sm')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('immutable', response.headers['Cache-Control'])
+
+    def test_image_evicted_while_served(self):
+        first = self.client.get('/img/venues/1/md')
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers['ETag']
+        opened = images.DiskLRU.open
+
+        # another worker evicts the file right after this one opened it
+        def open_then_evict(store, name):
+            f = opened(store, name)
+            if f is not None:
+                os.remove(store.path(name))
+            return f
+
+        with mock.patch.object(images.DiskLRU, 'open', open_then_evict):
+            response = self.client.get('/img/venues/1/md')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_data(), first.get_data())
+        self.assertEqual(fetch.hits, ['/pixel.gif'])
+
+        # served again from a fresh fetch, with the same validator
+        response = self.client.get('/img/venues/1/md', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_failed_source_redirects_without_refetching(self):
+        for _ in range(2):
+            response = self.client.get('/img/venues/3/md')
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(response.headers['Location'], HOST + '/gone.jpg')
+        self.assertEqual(fetch.hits, ['/gone.jpg'])
+
+    def test_non_images_are_not_served(self):
+        response = self.client.get('/img/venues/2/md')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(os.listdir(self.cache_dir.name), [])
+
+    def test_unknown_kind_or_size(self):
+        self.assertEqual(self.client.get('/img/shows/1/md').status_code, 404)
+        self.assertEqual(self.client.get('/img/venues/1/huge').status_code, 404)
+        self.assertEqual(self.client.get('/img/venues/99/md').status_code, 404)
+
+    def test_cache_evicts_least_recently_served(self):
+        store = images.DiskLRU(os.path.join(self.cache_dir.name, 'lru'), max_bytes=350)
+        for name in ('a', 'b', 'c'):
+            store.put(name, b'x' * 100)
+            # mtimes of the files must differ
+            past = time.time() - 10 + len(os.listdir(store.directory))
+            os.utime(store.path(name), (past, past))
+        served = store.open('a')
+        self.assertIsNotNone(served)
+        served.close()
+        store.put('d', b'x' * 100)
+
+        self.assertEqual(sorted(os.listdir(store.directory)), ['a', 'c', 'd'])
+        self.assertLessEqual(store.size, 350)
+
+    def test_allowed_hosts(self):
+        self.app.config['IMAGE_ALLOWED_HOSTS'] = ('.cdn.example.com',)
+        response = self.client.get('/img/venues/1/md')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(fetch.hits, [])
+
+    def test_default_fetcher_refuses_internal_addresses(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), InternalService)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            for url in ('http://127.0.0.1:{}/pixel.gif'.format(server.server_address[1]),
+                        'http://localhost:{}/pixel.gif'.format(server.server_address[1]),
+                        'file:///etc/passwd'):
+                with self.assertRaises(images.ImageError):
+                    images.fetch_url(url, 1024, 1)
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(InternalService.hits, [])
+
+        for address in ('10.0.0.1', '172.16.0.1', '192.168.1.1', '169.254.169.254', '0.0.0.0',
+                        '100.64.0.1', '224.0.0.1', '::1', 'fe80::1', 'fc00::1', '::ffff:127.0.0.1'):
+            self.assertFalse(images.is_public_address(address), address)
+        self.assertTrue(images.is_public_address('93.184.216.34'))
+        self.assertTrue(images.is_public_address('2606:2800:220:1::1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import io
+import json
+import os
+import unittest
+
+import importer
+import models
+from app import create_app
+from extensions import db
+
+ARTISTS = [
+    {'name': 'Quiet Band', 'genres': 'Jazz,Folk', 'seeking_venue': False, 'phone': ''},
+    {'name': 'Loud Band', 'genres': ['Rock'], 'seeking_venue': 'yes'},
+    {'name': 'Unknown Band'},
+    {'name': ''},
+]
+
+
+class ImporterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app(SQLALCHEMY_DATABASE_URI='sqlite://', SQLALCHEMY_ENGINE_OPTIONS={},
+                              SQLALCHEMY_BINDS={}, CACHE_BACKEND=None, LOG_FILE=os.devnull, TESTING=True)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def test_import_jsonl(self):
+        # a row the web app inserted before the import, without genre links
+        db.session.add(models.Artist(name='Web Band', genres='Blues', upcoming_shows_count=0, past_shows_count=0))
+        db.session.commit()
+
+        stream = io.StringIO(''.join(json.dumps(record) + '\n' for record in ARTISTS))
+        self.assertEqual(importer.import_file('artists', stream, 'jsonl', batch_size=2), (3, 1))
+
+        artists = {artist.name: artist for artist in models.Artist.query}
+        self.assertIs(artists['Quiet Band'].seeking_venue, False)
+        self.assertIsNone(artists['Quiet Band'].phone)
+        self.assertIs(artists['Loud Band'].seeking_venue, True)
+        self.assertIsNone(artists['Unknown Band'].seeking_venue)
+
+        self.assertEqual({name: [genre.name for genre in artist.genre_list] for name, artist in artists.items()}, {
+            'Web Band': [], 'Quiet Band': ['Folk', 'Jazz'], 'Loud Band': ['Rock'], 'Unknown Band': []})
+        self.assertEqual({genre.name: genre.artist_count for genre in models.Genre.query},
+                         {'Folk': 1, 'Jazz': 1, 'Rock': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
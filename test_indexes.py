@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+from flask_migrate import Migrate, upgrade
+from sqlalchemy import create_engine, inspect, text
+
+from app import create_app
+from extensions import db
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# index name -> (table, columns)
+COLUMN_INDEXES = {
+    'ix_show_venue_id_start_time': ('show', ['venue_id', 'start_time']),
+    'ix_show_artist_id_start_time': ('show', ['artist_id', 'start_time']),
+    'ix_show_start_time': ('show', ['start_time']),
+    'ix_venue_state_city': ('venue', ['state', 'city']),
+}
+
+# index name -> (table, expression)
+EXPRESSION_INDEXES = {
+    'ix_venue_lower_name': ('venue', 'lower(name)'),
+    'ix_artist_lower_name': ('artist', 'lower(name)'),
+}
+
+
+class IndexesTestCase(unittest.TestCase):
+
+    # run against a throwaway sqlite database instead of the local postgres one
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.app = create_app(SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(cls.directory.name, 'migrated.db'),
+                             SQLALCHEMY_ENGINE_OPTIONS={}, SQLALCHEMY_BINDS={}, CACHE_BACKEND=None,
+                             LOG_FILE=os.devnull)
+        Migrate(cls.app, db)
+
+    @classmethod
+    def tearDownClass(cls):
+        with cls.app.app_context():
+            db.engine.dispose()
+        cls.directory.cleanup()
+
+    def assert_indexes(self, engine):
+        inspector = inspect(engine)
+        for name, (table, columns) in COLUMN_INDEXES.items():
+            indexes = {index['name']: index['column_names'] for index in inspector.get_indexes(table)}
+            self.assertIn(name, indexes)
+            self.assertEqual(indexes[name], columns)
+
+        with engine.connect() as connection:
+            for name, (table, expression) in EXPRESSION_INDEXES.items():
+                sql = connection.execute(
+                    text("SELECT sql FROM sqlite_master WHERE type = 'index' "
+                         "AND name = :name AND tbl_name = :table"),
+                    {'name': name, 'table': table}
+                ).scalar()
+                self.assertIsNotNone(sql, name)
+                self.assertIn(expression, sql.lower())
+
+    def test_migrations_create_indexes(self):
+        with self.app.app_context():
+            upgrade(directory=MIGRATIONS_DIR)
+            self.assert_indexes(db.engine)
+
+    def test_models_declare_indexes(self):
+        engine = create_engine('sqlite:///' + os.path.join(self.directory.name, 'create_all.db'))
+        db.metadata.create_all(engine)
+        self.assert_indexes(engine)
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    unittest.main()
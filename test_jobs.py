@@ -0,0 +1,187 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from datetime import timedelta
+
+import jobs
+import models
+from app import create_app
+from extensions import db
+
+calls = []
+
+
+@jobs.task('test_record')
+def record(**payload):
+    calls.append(payload)
+
+
+@jobs.task('test_fail')
+def fail():
+    raise RuntimeError('always fails')
+
+
+class JobQueueTestCase(unittest.TestCase):
+
+    def setUp(self):
+        del calls[:]
+        self.directory = tempfile.TemporaryDirectory()
+        # a file, so the threads of test_concurrent_claims get their own
+        # connections
+        self.app = create_app(SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(self.directory.name, 'jobs.db'),
+                              SQLALCHEMY_ENGINE_OPTIONS={}, SQLALCHEMY_BINDS={}, CACHE_BACKEND=None,
+                              LOG_FILE=os.devnull, TESTING=True, JOB_MAX_ATTEMPTS=3, JOB_BACKOFF_SECONDS=10,
+                              JOB_BACKOFF_MAX_SECONDS=15, JOB_LEASE_SECONDS=60)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+        self.directory.cleanup()
+
+    def enqueue(self, name, payload=None, **options):
+        job = jobs.enqueue(name, payload, **options)
+        db.session.commit()
+        return job.id
+
+    def job(self, job_id):
+        db.session.expire_all()
+        return db.session.get(models.Job, job_id)
+
+    def make_due(self, job_id):
+        models.Job.query.filter(models.Job.id == job_id).update({models.Job.run_at: models.utcnow()})
+        db.session.commit()
+
+    def test_claim_and_run(self):
+        later = self.enqueue('test_record', {'venues': [2]}, delay=60)
+        job_id = self.enqueue('test_record', {'venues': [1]})
+
+        claimed = jobs.claim('worker-1')
+        self.assertEqual((claimed.id, claimed.name, json.loads(claimed.payload), claimed.attempts),
+                         (job_id, 'test_record', {'venues': [1]}, 1))
+        job = self.job(job_id)
+        self.assertEqual((job.status, job.locked_by), (jobs.RUNNING, 'worker-1'))
+        self.assertIsNotNone(job.locked_at)
+
+        # the other job is not due yet and a running job is not claimed again
+        self.assertIsNone(jobs.claim('worker-2'))
+
+        self.assertTrue(jobs.run(claimed))
+        self.assertEqual(calls, [{'venues': [1]}])
+        self.assertIsNone(self.job(job_id))
+        self.assertEqual(self.job(later).status, jobs.QUEUED)
+
+    def test_failed_job_is_retried_with_backoff(self):
+        job_id = self.enqueue('test_fail')
+        started = models.utcnow()
+
+        self.assertFalse(jobs.run(jobs.claim('worker-1')))
+        job = self.job(job_id)
+        self.assertEqual((job.status, job.attempts, job.locked_at, job.locked_by), (jobs.QUEUED, 1, None, None))
+        self.assertIn('always fails', job.last_error)
+        # first retry after JOB_BACKOFF_SECONDS, less up to half for jitter
+        self.assertGreaterEqual(job.run_at, started + timedelta(seconds=5))
+        self.assertLessEqual(job.run_at, models.utcnow() + timedelta(seconds=10))
+        self.assertIsNone(jobs.claim('worker-1'))
+
+        self.make_due(job_id)
+        self.assertFalse(jobs.run(jobs.claim('worker-1')))
+        job = self.job(job_id)
+        self.assertEqual((job.status, job.attempts), (jobs.QUEUED, 2))
+        # the second delay is doubled, then capped by JOB_BACKOFF_MAX_SECONDS
+        self.assertLessEqual(job.run_at, models.utcnow() + timedelta(seconds=15))
+
+    def test_job_fails_after_max_attempts(self):
+        job_id = self.enqueue('test_fail', max_attempts=2)
+        for attempt in range(2):
+            self.make_due(job_id)
+            self.assertFalse(jobs.run(jobs.claim('worker-1')))
+
+        job = self.job(job_id)
+        self.assertEqual((job.status, job.attempts), (jobs.FAILED, 2))
+        self.make_due(job_id)
+        self.assertIsNone(jobs.claim('worker-1'))
+
+        # enqueue defaults to JOB_MAX_ATTEMPTS
+        self.assertEqual(self.job(self.enqueue('test_fail')).max_attempts, 3)
+
+    def test_stale_lease_is_requeued(self):
+        stale = self.enqueue('test_record')
+        fresh = self.enqueue('test_record')
+        jobs.claim('dead-worker')
+        jobs.claim('live-worker')
+        models.Job.query.filter(models.Job.id == stale) \
+            .update({models.Job.locked_at: models.utcnow() - timedelta(seconds=61)})
+        db.session.commit()
+
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual((self.job(stale).status, self.job(stale).locked_by), (jobs.QUEUED, None))
+        self.assertEqual(self.job(fresh).status, jobs.RUNNING)
+
+        # the requeued job runs again, its attempt counted
+        claimed = jobs.claim('worker-1')
+        self.assertEqual((claimed.id, claimed.attempts), (stale, 2))
+
+    def test_run_that_outlived_its_lease_keeps_the_new_claim(self):
+        for name, succeeded in (('test_record', True), ('test_fail', False)):
+            with self.subTest(task=name):
+                job_id = self.enqueue(name)
+                slow = jobs.claim('slow-worker')
+                models.Job.query.filter(models.Job.id == job_id) \
+                    .update({models.Job.locked_at: models.utcnow() - timedelta(seconds=61)})
+                db.session.commit()
+                self.assertEqual(jobs.requeue_stale(), 1)
+                again = jobs.claim('worker-2')
+
+                # the slow run finishing, or failing, leaves worker-2's claim alone
+                self.assertEqual(jobs.run(slow), succeeded)
+                job = self.job(job_id)
+                self.assertEqual((job.status, job.attempts, job.locked_by, job.last_error),
+                                 (jobs.RUNNING, 2, 'worker-2', None))
+
+                jobs.run(again)
+                self.assertNotEqual(getattr(self.job(job_id), 'locked_by', None), 'worker-2')
+
+    def test_concurrent_claims(self):
+        job_ids = [self.enqueue('test_record', {'number': number}) for number in range(30)]
+        db.session.remove()
+        claimed = []
+
+        def worker(name):
+            with self.app.app_context():
+                while True:
+                    job = jobs.claim(name)
+                    if job is not None:
+                        claimed.append(job.id)
+                    elif not models.Job.query.filter(models.Job.status == jobs.QUEUED).count():
+                        return
+                    db.session.remove()
+
+        threads = [threading.Thread(target=worker, args=('worker-{}'.format(number),)) for number in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # every job claimed by exactly one worker
+        self.assertEqual(sorted(claimed), job_ids)
+
+    def test_worker_command_runs_the_queue(self):
+        for number in range(3):
+            self.enqueue('test_record', {'number': number})
+        self.enqueue('test_fail', max_attempts=1)
+        db.session.remove()
+
+        result = self.app.test_cli_runner().invoke(jobs.worker_command, ['--threads', '2', '--burst'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(sorted(call['number'] for call in calls), [0, 1, 2])
+        self.assertEqual([job.status for job in models.Job.query], [jobs.FAILED])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import logging
+import threading
+import unittest
+
+import logs
+
+
+def record(level, message):
+    return logging.LogRecord('app', level, __file__, 1, message, None, None)
+
+
+class BoundedQueueHandlerTestCase(unittest.TestCase):
+
+    def drain(self, handler):
+        records = []
+        while not handler.queue.empty():
+            records.append(handler.queue.get_nowait())
+        return records
+
+    def test_full_queue_drops_and_reports(self):
+        handler = logs.BoundedQueueHandler(2)
+        for number in range(4):
+            handler.handle(record(logging.INFO, 'info {}'.format(number)))
+        # a warning takes the place of the oldest record
+        handler.handle(record(logging.WARNING, 'warning'))
+        self.assertEqual(handler.dropped, 3)
+
+        queued = self.drain(handler)
+        self.assertEqual([(entry.msg, entry.dropped) for entry in queued],
+                         [('info 1', None), ('warning', 2)])
+
+        # the next record that gets through reports the evicted one
+        handler.handle(record(logging.INFO, 'after'))
+        self.assertEqual([(entry.msg, entry.dropped) for entry in self.drain(handler)], [('after', 1)])
+
+    def test_every_drop_is_reported_once(self):
+        handler = logs.BoundedQueueHandler(50)
+        written = []
+        stop = threading.Event()
+
+        # a listener that falls behind
+        def listen():
+            while not stop.is_set() or not handler.queue.empty():
+                written.extend(self.drain(handler))
+                stop.wait(0.001)
+
+        listener = threading.Thread(target=listen)
+        listener.start()
+        threads = [threading.Thread(target=lambda: [handler.handle(record(level, 'x'))
+                                                    for level in (logging.INFO, logging.ERROR) * 500])
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stop.set()
+        listener.join()
+        # one more record carries the drops not reported yet
+        handler.handle(record(logging.ERROR, 'last'))
+        written.extend(self.drain(handler))
+
+        self.assertGreater(handler.dropped, 0)
+        self.assertEqual(len(written) + handler.dropped, 8 * 1000 + 1)
+        self.assertEqual(sum(entry.dropped or 0 for entry in written), handler.dropped)
+
+
+if __name__ == '__main__':
+    unittest.main()
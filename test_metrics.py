@@ -0,0 +1,68 @@
+import json
+import os
+import re
+import tempfile
+import unittest
+
+import metrics
+from app import create_app
+
+INDEX_REQUESTS = 'fyyur_requests_total{endpoint="main.index",method="GET",status="200"}'
+INDEX_LATENCY = 'fyyur_request_duration_seconds_count{endpoint="main.index",method="GET"}'
+
+
+def value(text, series):
+    match = re.search('^' + re.escape(series) + r' (\S+)$', text, re.M)
+    return float(match.group(1)) if match else 0
+
+
+class MetricsDirectoryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = create_app(SQLALCHEMY_DATABASE_URI='sqlite://', SQLALCHEMY_ENGINE_OPTIONS={},
+                              SQLALCHEMY_BINDS={}, CACHE_BACKEND=None, LOG_FILE=os.devnull, TESTING=True,
+                              METRICS_DIR=self.directory.name)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def scrape(self):
+        return self.client.get('/metrics').get_data(as_text=True)
+
+    def test_metrics_of_every_worker_are_added_up(self):
+        # the registry is per process, earlier tests may have counted requests
+        before = self.scrape()
+        self.client.get('/')
+
+        other = metrics.Registry()
+        other.record('main.index', 'GET', 200, 0.01, 0, 0.0, 100)
+        other.record('main.index', 'GET', 200, 0.02, 0, 0.0, 100)
+        with open(os.path.join(self.directory.name, '1.json'), 'w') as f:
+            json.dump(other.snapshot(), f)
+        # a file being written by another worker is skipped
+        with open(os.path.join(self.directory.name, '.tmp123'), 'w') as f:
+            f.write('{"fyyur_')
+
+        after = self.scrape()
+        self.assertEqual(value(after, INDEX_REQUESTS), value(before, INDEX_REQUESTS) + 3)
+        self.assertEqual(value(after, INDEX_LATENCY), value(before, INDEX_LATENCY) + 3)
+
+    def test_worker_writes_its_own_file(self):
+        self.client.get('/')
+        shared = self.app.extensions['metrics']
+        shared.write()
+        path = os.path.join(self.directory.name, '{}.json'.format(os.getpid()))
+        with open(path) as f:
+            written = json.load(f)
+        requests = {tuple(values): count for values, count in written['fyyur_requests_total']}
+        self.assertGreaterEqual(requests[('main.index', 'GET', 200)], 1)
+
+        # its own file is not counted on top of its live numbers
+        scraped = value(self.scrape(), INDEX_REQUESTS)
+        self.assertEqual(scraped, metrics.registry.requests.series[('main.index', 'GET', 200)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import unittest
+from datetime import datetime, timedelta
+
+import models
+from app import create_app
+from extensions import db
+
+EIGHT_PM = datetime(2035, 4, 1, 20, 0)
+
+
+class ShowPagesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app(SQLALCHEMY_DATABASE_URI='sqlite://', SQLALCHEMY_ENGINE_OPTIONS={},
+                              SQLALCHEMY_BINDS={}, CACHE_BACKEND=None, LOG_FILE=os.devnull, TESTING=True,
+                              SHOWS_PER_PAGE=2)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        db.session.add(models.Venue(name='Main Hall', upcoming_shows_count=0, past_shows_count=0))
+        db.session.add(models.Artist(name='The Band', upcoming_shows_count=0, past_shows_count=0))
+        # two shows without a start time, between and after the dated ones
+        for start_time in (EIGHT_PM, None, EIGHT_PM, EIGHT_PM + timedelta(days=1), None):
+            db.session.add(models.Show(venue_id=1, artist_id=1, start_time=start_time, end_time=start_time))
+        db.session.commit()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def test_api_pages_end_with_the_shows_without_start_time(self):
+        ids = []
+        url = '/api/v1/shows?limit=2&fields=id'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            body = response.get_json()
+            ids.extend(show['id'] for show in body['data'])
+            url = '/api/v1/shows?limit=2&fields=id&cursor=' + body['next_cursor'] if body['next_cursor'] else None
+        self.assertEqual(ids, [1, 3, 4, 2, 5])
+
+    def test_html_pages_follow_the_cursor_past_a_null_start_time(self):
+        pages = 0
+        url = '/shows'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages += 1
+            text = response.get_data(as_text=True)
+            url = '/shows?cursor=' + text.split('cursor=')[1].split('"')[0] if 'cursor=' in text else None
+        self.assertEqual(pages, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
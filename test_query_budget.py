@@ -0,0 +1,150 @@
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import models
+import search
+import seed
+from app import create_app
+from extensions import db
+
+# seeded volumes: pages that issue a query per row blow their budget
+VENUES = 200
+ARTISTS = 400
+SHOWS = 4000
+
+VENUE_FORM = {'name': 'The Budget Hall', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St',
+              'phone': '123-123-1234', 'genres': ['Jazz', 'Folk'], 'facebook_link': '',
+              'image_link': '', 'website_link': '', 'seeking_description': ''}
+# a 1x1 gif, in place of the image links of the seeded rows
+PIXEL = (b'GIF89a\x01\x00\x01\x00\x80\x00\x00\xff\xff\xff\x00\x00\x00!\xf9\x04\x01\x00\x00\x00\x00'
+         b',\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;')
+
+ARTIST_FORM = {'name': 'The Budget Band', 'city': 'Austin', 'state': 'TX', 'phone': '123-123-1234',
+               'genres': ['Jazz'], 'facebook_link': '', 'image_link': '', 'website_link': '',
+               'seeking_description': ''}
+
+# endpoint -> (method, url, form data, expected status, max SQL statements)
+# every route of the app must be listed here
+BUDGETS = {
+    'main.index': ('GET', '/', None, 200, 0),
+    'main.autocomplete': ('GET', '/api/autocomplete?q=the', None, 200, 0),
+    'venues.venues': ('GET', '/venues', None, 200, 3),
+    'venues.search_venues': ('POST', '/venues/search', {'search_term': 'hall'}, 200, 0),
+    'venues.show_venue': ('GET', '/venues/1', None, 200, 7),
+    'venues.create_venue_form': ('GET', '/venues/create', None, 200, 0),
+    'venues.create_venue_submission': ('POST', '/venues/create', VENUE_FORM, 200, 5),
+    'venues.edit_venue': ('GET', '/venues/1/edit', None, 200, 1),
+    'venues.edit_venue_submission': ('POST', '/venues/1/edit', VENUE_FORM, 302, 10),
+    'venues.delete_venue': ('DELETE', '/venues/{spare_venue}', None, 302, 5),
+    'artists.artists': ('GET', '/artists', None, 200, 3),
+    'artists.search_artists': ('POST', '/artists/search', {'search_term': 'band'}, 200, 0),
+    'artists.show_artist': ('GET', '/artists/1', None, 200, 7),
+    'artists.create_artist_form': ('GET', '/artists/create', None, 200, 0),
+    'artists.create_artist_submission': ('POST', '/artists/create', ARTIST_FORM, 200, 5),
+    'artists.edit_artist': ('GET', '/artists/1/edit', None, 200, 1),
+    'artists.edit_artist_submission': ('POST', '/artists/1/edit', ARTIST_FORM, 302, 10),
+    'shows.shows': ('GET', '/shows', None, 200, 2),
+    'shows.create_shows': ('GET', '/shows/create', None, 200, 0),
+    'shows.create_show_submission': ('POST', '/shows/create',
+                                     {'venue_id': '2', 'artist_id': '2', 'start_time': '2035-01-01 20:00',
+                                      'duration': '90'},
+                                     200, 3),
+    'api_v1.venues': ('GET', '/api/v1/venues', None, 200, 1),
+    'api_v1.venue': ('GET', '/api/v1/venues/1', None, 200, 1),
+    'api_v1.venue_availability': ('GET', '/api/v1/venues/1/availability?from=2035-01-01&to=2035-01-08',
+                                  None, 200, 2),
+    'api_v1.artists': ('GET', '/api/v1/artists', None, 200, 1),
+    'api_v1.artist': ('GET', '/api/v1/artists/1', None, 200, 1),
+    'api_v1.shows': ('GET', '/api/v1/shows', None, 200, 1),
+    'api_v1.show': ('GET', '/api/v1/shows/1', None, 200, 1),
+    'export.export_rows': ('GET', '/export/shows.ndjson', None, 200, 1),
+    'assets.asset': ('GET', '/assets/css/unbuilt.css', None, 404, 0),
+    'images.image': ('GET', '/img/venues/1/sm', None, 200, 1),
+    'metrics.metrics_page': ('GET', '/metrics', None, 200, 0),
+}
+
+
+# this function load the seeded volumes with `flask seed`'s generator
+def seed_database():
+    seed.generate(VENUES, ARTISTS, SHOWS, random_seed=20)
+
+    # a venue without shows for the delete route
+    spare = models.Venue(name='Spare Venue', city='Nowhere', state='CA', upcoming_shows_count=0, past_shows_count=0)
+    db.session.add(spare)
+    db.session.commit()
+    return spare.id
+
+
+class QueryBudgetTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.image_dir = tempfile.TemporaryDirectory()
+        cls.app = create_app(SQLALCHEMY_DATABASE_URI='sqlite://', SQLALCHEMY_ENGINE_OPTIONS={}, SQLALCHEMY_BINDS={},
+                             WTF_CSRF_ENABLED=False, CACHE_BACKEND=None, LOG_FILE=os.devnull, DEBUG=False, TESTING=True,
+                             IMAGE_CACHE_DIR=cls.image_dir.name, IMAGE_FETCHER=lambda url, max_bytes, timeout: PIXEL)
+        cls.context = cls.app.app_context()
+        cls.context.push()
+        db.create_all()
+        cls.spare_venue = seed_database()
+
+        # a worker builds its search indexes when it starts, here once the
+        # rows exist
+        search.init_app(cls.app)
+
+        cls.client = cls.app.test_client()
+        cls.statements = []
+        event.listen(Engine, 'before_cursor_execute', cls.count_statement)
+
+    @classmethod
+    def tearDownClass(cls):
+        event.remove(Engine, 'before_cursor_execute', cls.count_statement)
+        db.session.remove()
+        db.drop_all()
+        cls.context.pop()
+        cls.image_dir.cleanup()
+
+    @classmethod
+    def count_statement(cls, conn, cursor, statement, parameters, context, executemany):
+        cls.statements.append(statement)
+
+    def request(self, method, url, data):
+        del self.statements[:]
+        response = self.client.open(url.format(spare_venue=self.spare_venue), method=method, data=data)
+        return response, list(self.statements)
+
+    def test_every_route_has_a_budget(self):
+        endpoints = {rule.endpoint for rule in self.app.url_map.iter_rules() if rule.endpoint != 'static'}
+        self.assertEqual(sorted(endpoints - set(BUDGETS)), [])
+
+    def test_routes_stay_within_budget(self):
+        for endpoint, (method, url, data, status, budget) in sorted(BUDGETS.items()):
+            with self.subTest(endpoint=endpoint):
+                response, statements = self.request(method, url, data)
+                self.assertEqual(response.status_code, status)
+                self.assertLessEqual(len(statements), budget, '{} {} ran {} statements:\n{}'.format(
+                    method, url, len(statements), '\n'.join(statements)))
+
+    def test_list_pages_do_not_grow_with_rows(self):
+        # the next page of /shows costs the same as the first
+        first, first_statements = self.request('GET', '/shows', None)
+        cursor = first.get_data(as_text=True).split('cursor=')[1].split('"')[0]
+        second, second_statements = self.request('GET', '/shows?cursor=' + cursor, None)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(len(second_statements), len(first_statements))
+
+    def test_search_pages_start_at_one(self):
+        first = self.client.get('/venues/search?search_term=hall&page=1').get_data(as_text=True)
+        self.assertIn('page=2', first)
+        for page in ('0', '-3'):
+            with self.subTest(page=page):
+                response = self.client.get('/venues/search?search_term=hall&page=' + page)
+                self.assertEqual(response.get_data(as_text=True), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import time
+import unittest
+
+import routing
+from app import create_app
+from extensions import db
+
+VENUE_FORM = {'name': 'The Written Hall', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St',
+              'phone': '123-123-1234', 'genres': ['Jazz'], 'facebook_link': '', 'image_link': '',
+              'website_link': '', 'seeking_description': ''}
+
+
+class ReplicaRoutingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        primary, replica = (os.path.join(self.directory.name, name + '.db') for name in ('primary', 'replica'))
+        # two workers, each with its own SECRET_KEY; the replica never
+        # catches up so a read shows which database it went to
+        self.apps = [create_app(SQLALCHEMY_DATABASE_URI='sqlite:///' + primary, SQLALCHEMY_ENGINE_OPTIONS={},
+                                SQLALCHEMY_BINDS={routing.REPLICA_BIND: 'sqlite:///' + replica},
+                                SECRET_KEY=os.urandom(32), WTF_CSRF_ENABLED=False, CACHE_BACKEND=None,
+                                LOG_FILE=os.devnull, TESTING=True)
+                     for _ in range(2)]
+        with self.apps[0].app_context():
+            db.create_all()
+            db.metadata.create_all(routing.replica_engine())
+
+    def tearDown(self):
+        for app in self.apps:
+            with app.app_context():
+                db.engines[routing.REPLICA_BIND].dispose()
+                db.engine.dispose()
+        # init_app registered an empty metadata for the bind on the shared
+        # db, which create_all() of the apps without it would trip on
+        db.metadatas.pop(routing.REPLICA_BIND, None)
+        self.directory.cleanup()
+
+    def venue_names(self, client):
+        return [venue['name'] for venue in client.get('/api/v1/venues').get_json()['data']]
+
+    def test_writer_reads_the_primary_on_every_worker(self):
+        writer = self.apps[0].test_client()
+        response = writer.post('/venues/create', data=VENUE_FORM)
+        self.assertIn('successfully listed', response.get_data(as_text=True))
+        cookie = writer.get_cookie(routing.STICKY_COOKIE)
+        self.assertIsNotNone(cookie)
+
+        # the other worker honours the cookie although it cannot read the
+        # session signed by the first one
+        other = self.apps[1].test_client()
+        other.set_cookie(routing.STICKY_COOKIE, cookie.value)
+        self.assertEqual(self.venue_names(other), ['The Written Hall'])
+
+        # other clients read the replica
+        self.assertEqual(self.venue_names(self.apps[1].test_client()), [])
+
+        # a deadline past REPLICA_STICKY_SECONDS, or garbage, is ignored
+        for value in (str(time.time() + 3600), 'soon'):
+            with self.subTest(value=value):
+                forged = self.apps[1].test_client()
+                forged.set_cookie(routing.STICKY_COOKIE, value)
+                self.assertEqual(self.venue_names(forged), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
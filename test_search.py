@@ -0,0 +1,54 @@
+import os
+import random
+import unittest
+
+import models
+import search
+from app import create_app
+from extensions import db
+
+WORDS = ('blue', 'note', 'hall', 'musical', 'hop', 'park', 'square', 'live', 'room', 'the', 'jazz', 'club')
+NAMES = 3000
+
+
+class IndexBuildTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app(SQLALCHEMY_DATABASE_URI='sqlite://', SQLALCHEMY_ENGINE_OPTIONS={},
+                              SQLALCHEMY_BINDS={}, CACHE_BACKEND=None, LOG_FILE=os.devnull, TESTING=True)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        choose = random.Random(7).sample
+        db.session.execute(models.Venue.__table__.insert(), [
+            {'name': '{} {}'.format(' '.join(choose(WORDS, 3)), number), 'city': 'Austin', 'state': 'TX',
+             'genres': 'Jazz,Folk', 'upcoming_shows_count': number % 5} for number in range(NAMES)])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def test_bulk_built_indexes_are_sorted(self):
+        prefix_index = search.build_prefix_index()
+        self.assertEqual(prefix_index.entries, sorted(prefix_index.entries))
+        self.assertEqual(len(prefix_index.names), NAMES)
+
+        index = search.build_index(models.Venue)
+        self.assertEqual(index.terms, sorted(index.postings))
+        total, ids = index.query('blue no')
+        self.assertEqual(total, len([name for name in index.names.values()
+                                     if {'blue', 'note'} <= set(name.split())]))
+
+        # single adds and removes keep the order
+        prefix_index.add('artist', 1, 'Zebra Blue Quartet')
+        prefix_index.remove('venue', 1)
+        index.add(NAMES + 1, 'Aardvark Lounge', 'Austin', 'TX', 'Jazz', 0)
+        self.assertEqual(prefix_index.entries, sorted(prefix_index.entries))
+        self.assertEqual(index.terms, sorted(index.postings))
+        self.assertEqual(prefix_index.complete('zebra'), [('artist', 1, 'Zebra Blue Quartet')])
+
+
+if __name__ == '__main__':
+    unittest.main()
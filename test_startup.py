@@ -0,0 +1,78 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# seconds create_app() may take on a cold interpreter, on top of importing
+# the frameworks every worker needs anyway. Generous so a loaded machine
+# does not fail it, a regression (an eager heavy import, a query at start)
+# still does; IMPORT_TIME_BUDGET overrides it and CI skips it
+IMPORT_TIME_BUDGET = float(os.environ.get('IMPORT_TIME_BUDGET', 1.0))
+
+# modules a web worker must not load until a request needs them
+LAZY_MODULES = ('babel', 'dateutil', 'wtforms', 'flask_wtf', 'alembic', 'flask_migrate', 'importer')
+
+STARTUP = '''
+import json, sys, time
+import flask, flask_moment, flask_sqlalchemy, jinja2, sqlalchemy.orm
+started = time.perf_counter()
+from app import create_app
+create_app()
+print(json.dumps({
+    "seconds": time.perf_counter() - started,
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+''' % (LAZY_MODULES,)
+
+
+class StartupTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        env = dict(os.environ, DATABASE_URL='sqlite://', LOG_FILE=os.devnull)
+        output = subprocess.check_output([sys.executable, '-c', STARTUP], cwd=ROOT, env=env)
+        cls.result = json.loads(output.decode().strip().splitlines()[-1])
+
+    # a cold worker only pays for what it needs: the heavy modules are
+    # imported by the first request (or command) that uses them
+    def test_heavy_modules_are_lazy(self):
+        self.assertEqual(self.result['loaded'], [])
+
+    @unittest.skipIf(os.environ.get('CI'), 'wall-clock budget, not measured on shared CI machines')
+    def test_import_time_budget(self):
+        self.assertLess(self.result['seconds'], IMPORT_TIME_BUDGET,
+                        'create_app() took {:.3f}s'.format(self.result['seconds']))
+
+    def test_apps_do_not_share_state(self):
+        import logs
+        from app import create_app
+
+        with tempfile.TemporaryDirectory() as directory:
+            apps = [create_app(SQLALCHEMY_DATABASE_URI='sqlite://', SQLALCHEMY_ENGINE_OPTIONS={},
+                               SQLALCHEMY_BINDS={}, CACHE_BACKEND=backend,
+                               IMAGE_CACHE_DIR=os.path.join(directory, name),
+                               LOG_FILE=os.path.join(directory, name + '.log'))
+                    for name, backend in (('first', 'lru'), ('second', None))]
+            self.assertIsNotNone(apps[0].extensions['page_cache'])
+            self.assertIsNone(apps[1].extensions['page_cache'])
+            self.assertIsNot(apps[0].extensions['search'], apps[1].extensions['search'])
+            self.assertNotEqual(apps[0].extensions['image_proxy'].directory,
+                                apps[1].extensions['image_proxy'].directory)
+
+            for app in apps:
+                with app.app_context():
+                    app.logger.warning('logged by %s', app.config['LOG_FILE'])
+            for app in apps:
+                logs.stop(app)
+                with open(app.config['LOG_FILE']) as f:
+                    messages = [json.loads(line)['message'] for line in f]
+                self.assertEqual([message for message in messages if message.startswith('logged by')],
+                                 ['logged by ' + app.config['LOG_FILE']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,423 @@
+from datetime import datetime
+from itertools import groupby
+
+from flask import Blueprint, current_app, render_template, request, flash, redirect, url_for, abort
+from sqlalchemy import func, and_
+
+import cache
+import genres
+import http_cache
+import models
+import search
+import shows
+from extensions import db
+
+# ----------------------------------------------------------------------------#
+# Venue pages.
+#
+# The form views import forms (and with it wtforms) on first use.
+# ----------------------------------------------------------------------------#
+
+bp = Blueprint('venues', __name__)
+
+
+#  Venues ----------------------------------------------------------------
+
+@bp.route('/venues')
+@http_cache.conditional(http_cache.venues_version)
+def venues():
+    # TODO: replace with real venues data.
+    #       num_shows should be aggregated based on number of upcoming shows per venue.
+    # data = [{
+    #     "city": "San Francisco",
+    #     "state": "CA",
+    #     "venues": [{
+    #         "id": 1,
+    #         "name": "The Musical Hop",
+    #         "num_upcoming_shows": 0,
+    #     }, {
+    #         "id": 3,
+    #         "name": "Park Square Live Music & Coffee",
+    #         "num_upcoming_shows": 1,
+    #     }]
+    # }, {
+    #     "city": "New York",
+    #     "state": "NY",
+    #     "venues": [{
+    #         "id": 2,
+    #         "name": "The Dueling Pianos Bar",
+    #         "num_upcoming_shows": 0,
+    #     }]
+    # }]
+
+    # one grouped query: venue columns plus a live count of upcoming shows,
+    # ordered so that venues of the same area come out next to each other
+    query = db.session.query(
+        models.Venue.id,
+        models.Venue.name,
+        models.Venue.city,
+        models.Venue.state,
+        func.count(models.Show.id).label('num_upcoming_shows')
+    ).outerjoin(models.Show, and_(models.Show.venue_id == models.Venue.id,
+                                  models.Show.start_time > datetime.now()))
+
+    # optional ?genre= filter through the venue_genre index
+    genre = request.args.get('genre')
+    if genre:
+        query = query.join(models.venue_genres, models.venue_genres.c.venue_id == models.Venue.id) \
+            .filter(models.venue_genres.c.genre_id == genres.genre_id(genre))
+
+    rows = query.group_by(models.Venue.id, models.Venue.name, models.Venue.city, models.Venue.state) \
+        .order_by(models.Venue.state, models.Venue.city, models.Venue.name, models.Venue.id) \
+        .all()
+
+    # group the sorted rows by area in a single pass
+    data = []
+    for (state, city), area_venues in groupby(rows, key=lambda row: (row.state, row.city)):
+        data.append({
+            "city": city,
+            "state": state,
+            "venues": [{
+                "id": venue.id,
+                "name": venue.name,
+                "num_upcoming_shows": venue.num_upcoming_shows,
+            } for venue in area_venues]
+        })
+
+    return render_template('pages/venues.html', areas=data, genre=genre,
+                           facets=genres.facet_counts(models.Venue))
+
+
+@bp.route('/venues/search', methods=['GET', 'POST'])
+def search_venues():
+    # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+    # seach for Hop should return "The Musical Hop".
+    # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
+
+    # relevance-ordered page of matches from the indexed search backend,
+    # the next pages are plain GET links
+    tag = request.values.get('search_term', '')
+    # page 0 or below is the first page, so next_url is page 2
+    page = max(request.values.get('page', 1, type=int), 1)
+    per_page = current_app.config['SEARCH_RESULTS_PER_PAGE']
+    total, rows = search.search(models.Venue, tag, page=page, per_page=per_page)
+
+    data = []
+    for row in rows:
+        data.append({
+            "id": row.id,
+            "name": row.name,
+            "num_upcoming_shows": row.upcoming_shows_count,
+        })
+
+    response = {
+        "count": total,
+        "data": data
+    }
+
+    next_url = None
+    if page * per_page < total:
+        next_url = url_for('venues.search_venues', search_term=tag, page=page + 1)
+
+    return render_template('pages/search_venues.html', results=response,
+                           search_term=tag, next_url=next_url)
+
+
+@bp.route('/venues/<int:venue_id>')
+@http_cache.conditional(http_cache.venue_version)
+def show_venue(venue_id):
+    # shows the venue page with the given venue_id
+    # TODO: replace with real venue data from the venues table, using venue_id
+    # data1 = {
+    #     "id": 1,
+    #     "name": "The Musical Hop",
+    #     "genres": ["Jazz", "Reggae", "Swing", "Classical", "Folk"],
+    #     "address": "1015 Folsom Street",
+    #     "city": "San Francisco",
+    #     "state": "CA",
+    #     "phone": "123-123-1234",
+    #     "website": "https://www.themusicalhop.com",
+    #     "facebook_link": "https://www.facebook.com/TheMusicalHop",
+    #     "seeking_talent": True,
+    #     "seeking_description": "We are on the lookout for a local artist to play every two weeks. Please call us.",
+    #     "image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60",
+    #     "past_shows": [{
+    #         "artist_id": 4,
+    #         "artist_name": "Guns N Petals",
+    #         "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
+    #         "start_time": "2019-05-21T21:30:00.000Z"
+    #     }],
+    #     "upcoming_shows": [],
+    #     "past_shows_count": 1,
+    #     "upcoming_shows_count": 0,
+    # }
+    # data2 = {
+    #     "id": 2,
+    #     "name": "The Dueling Pianos Bar",
+    #     "genres": ["Classical", "R&B", "Hip-Hop"],
+    #     "address": "335 Delancey Street",
+    #     "city": "New York",
+    #     "state": "NY",
+    #     "phone": "914-003-1132",
+    #     "website": "https://www.theduelingpianos.com",
+    #     "facebook_link": "https://www.facebook.com/theduelingpianos",
+    #     "seeking_talent": False,
+    #     "image_link": "https://images.unsplash.com/photo-1497032205916-ac775f0649ae?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=750&q=80",
+    #     "past_shows": [],
+    #     "upcoming_shows": [],
+    #     "past_shows_count": 0,
+    #     "upcoming_shows_count": 0,
+    # }
+    # data3 = {
+    #     "id": 3,
+    #     "name": "Park Square Live Music & Coffee",
+    #     "genres": ["Rock n Roll", "Jazz", "Classical", "Folk"],
+    #     "address": "34 Whiskey Moore Ave",
+    #     "city": "San Francisco",
+    #     "state": "CA",
+    #     "phone": "415-000-1234",
+    #     "website": "https://www.parksquarelivemusicandcoffee.com",
+    #     "facebook_link": "https://www.facebook.com/ParkSquareLiveMusicAndCoffee",
+    #     "seeking_talent": False,
+    #     "image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
+    #     "past_shows": [{
+    #         "artist_id": 5,
+    #         "artist_name": "Matt Quevedo",
+    #         "artist_image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
+    #         "start_time": "2019-06-15T23:00:00.000Z"
+    #     }],
+    #     "upcoming_shows": [{
+    #         "artist_id": 6,
+    #         "artist_name": "The Wild Sax Band",
+    #         "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
+    #         "start_time": "2035-04-01T20:00:00.000Z"
+    #     }, {
+    #         "artist_id": 6,
+    #         "artist_name": "The Wild Sax Band",
+    #         "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
+    #         "start_time": "2035-04-08T20:00:00.000Z"
+    #     }, {
+    #         "artist_id": 6,
+    #         "artist_name": "The Wild Sax Band",
+    #         "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
+    #         "start_time": "2035-04-15T20:00:00.000Z"
+    #     }],
+    #     "past_shows_count": 1,
+    #     "upcoming_shows_count": 1,
+    # }
+    # data = list(filter(lambda d: d['id'] ==
+    #                              venue_id, [data1, data2, data3]))[0]
+
+    data = cache.get_or_build(cache.venue_key(venue_id), lambda: build_venue_page(venue_id))
+    return render_template('pages/show_venue.html', venue=data)
+
+
+# this function return the venue page data and when it goes stale
+def build_venue_page(venue_id):
+    venue = models.Venue.query.get(venue_id)
+    if venue is None:
+        abort(404)
+
+    columns = (models.Show.artist_id,
+               models.Artist.name.label('artist_name'),
+               models.Artist.image_link.label('artist_image_link'),
+               models.Show.start_time)
+
+    now = datetime.now()
+
+    def venue_shows(upcoming, limit):
+        query = db.session.query(*columns) \
+            .join(models.Artist, models.Show.artist_id == models.Artist.id)
+        return shows.split_shows(query, models.Show.venue_id == venue_id, upcoming, now, limit)
+
+    upcoming_rows, upcoming_count = venue_shows(True, current_app.config['DETAIL_UPCOMING_SHOWS_LIMIT'])
+    past_rows, past_count = venue_shows(False, current_app.config['DETAIL_PAST_SHOWS_LIMIT'])
+
+    # the cached page is stale once its first upcoming show starts
+    expires_at = upcoming_rows[0].start_time if upcoming_rows else None
+
+    data = venue_data(venue,
+                      [artist_info(row) for row in past_rows], past_count,
+                      [artist_info(row) for row in upcoming_rows], upcoming_count)
+    return data, expires_at
+
+
+# this function drop the cached page of a venue and of the artists that
+# played there, since their pages show the venue name and image
+def invalidate_venue_pages(venue_id):
+    artist_ids = db.session.query(models.Show.artist_id) \
+        .filter(models.Show.venue_id == venue_id).distinct().all()
+    cache.invalidate(cache.venue_key(venue_id), *[cache.artist_key(row.artist_id) for row in artist_ids])
+
+
+# this function return show info that needed for the venue page
+def artist_info(row):
+    return {
+        "artist_id": row.artist_id,
+        "artist_name": row.artist_name,
+        "artist_image_link": row.artist_image_link,
+        "start_time": row.start_time
+    }
+
+
+# this function return venue data
+def venue_data(venue, past_shows, past_shows_count, upcoming_shows, upcoming_shows_count):
+    return {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": [genre.name for genre in venue.genre_list],
+        "city": venue.city,
+        "address": venue.address,
+        "state": venue.state,
+        "phone": venue.phone,
+        "website": venue.website_link,
+        "facebook_link": venue.facebook_link,
+        "seeking_talent": venue.seeking_talent,
+        "seeking_description": venue.seeking_description,
+        "image_link": venue.image_link,
+        "past_shows": past_shows,
+        "upcoming_shows": upcoming_shows,
+        "past_shows_count": past_shows_count,
+        "upcoming_shows_count": upcoming_shows_count,
+    }
+
+
+#  Create Venue ----------------------------------------------------------------
+@bp.route('/venues/create', methods=['GET'])
+def create_venue_form():
+    from forms import VenueForm
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+
+@bp.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+    # TODO: insert form data as a new Venue record in the db, instead
+    # TODO: modify data to be the data object returned from db insertion
+
+    from forms import VenueForm
+    form = VenueForm()
+
+    try:
+        name = form.name.data
+        city = form.city.data
+        state = form.state.data
+        phone = form.phone.data
+        website_link = form.website_link.data
+        facebook_link = form.facebook_link.data
+        address = form.address.data
+        seeking_talent = True if form.seeking_talent.data == 'Yes' else False
+        seeking_description = form.seeking_description.data
+        image_link = form.image_link.data
+
+        venue = models.Venue(
+            name=name,
+            city=city,
+            state=state,
+            phone=phone,
+            website_link=website_link,
+            facebook_link=facebook_link,
+            seeking_talent=seeking_talent,
+            seeking_description=seeking_description,
+            image_link=image_link,
+            address=address,
+            upcoming_shows_count=0,  # default for new venue
+            past_shows_count=0  # default for new venue
+        )
+
+        db.session.add(venue)
+        genres.set_genres(venue, form.genres.data)
+        db.session.commit()
+        search.index_entity(venue)
+
+        flash('Venue ' + name + ' was successfully listed!')
+    except:
+        flash('An error occurred. Venue ' + form.name.data + ' could not be listed.')
+        db.session.rollback()
+    finally:
+        db.session.close()
+
+    return render_template('pages/home.html')
+
+
+@bp.route('/venues/<venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+    # TODO: Complete this endpoint for taking a venue_id, and using
+    # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+    name = models.Venue.query.get(venue_id).name
+    try:
+        genres.clear_genres(models.Venue, venue_id)
+        models.Venue.query.filter_by(id=venue_id).delete()
+        http_cache.record_deletion(models.Venue)
+        db.session.commit()
+        search.unindex_entity(models.Venue, venue_id)
+        invalidate_venue_pages(venue_id)
+        flash('Venue ' + name + ' was successfully deleted!')
+    except:
+        db.session.rollback()
+        flash('An error occurred. Venue ' + name + ' could not be deleted.')
+    finally:
+        db.session.close()
+
+    # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+    # clicking that button delete it from the db then redirect the user to the homepage
+    return redirect(url_for('venues.venues'))
+
+
+#  Update ----------------------------------------------------------------
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    from forms import VenueForm
+    form = VenueForm()
+
+    venue = models.Venue.query.get(venue_id)
+    venue = {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": venue.genres,
+        "address": venue.address,
+        "city": venue.city,
+        "state": venue.state,
+        "phone": venue.phone,
+        "website": venue.website_link,
+        "facebook_link": venue.facebook_link,
+        "seeking_talent": venue.seeking_talent,
+        "seeking_description": venue.seeking_description,
+        "image_link": venue.image_link
+    }
+    # TODO: populate form with values from venue with ID <venue_id>
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    # TODO: take values from the form submitted, and update existing
+    from forms import VenueForm
+    form = VenueForm()
+    venue = models.Venue.query.get(venue_id)
+
+    try:
+        venue.name = form.name.data
+        genres.set_genres(venue, form.genres.data)
+        venue.city = form.city.data
+        venue.state = form.state.data
+        venue.phone = form.phone.data
+        venue.website_link = form.website_link.data
+        venue.facebook_link = form.facebook_link.data
+        venue.address = form.address.data
+        venue.seeking_talent = True if form.seeking_talent.data == 'Yes' else False
+        venue.seeking_description = form.seeking_description.data
+        venue.image_link = form.image_link.data
+
+        db.session.add(venue)
+        db.session.commit()
+        search.index_entity(venue)
+        invalidate_venue_pages(venue_id)
+
+        flash('Venue ' + venue.name + ' was successfully updated!')
+    except:
+        flash('An error occurred. Venue ' + venue.name + ' could not be updated.')
+        db.session.rollback()
+    finally:
+        db.session.close()
+    return redirect(url_for('venues.show_venue', venue_id=venue_id))